@@ -0,0 +1,205 @@
+"""
+Batch price-alert evaluation for watchlist items.
+
+Active alerts are kept in per-symbol sorted threshold indexes so that a quote
+refresh only touches the symbols that changed, and each lookup is a bisect
+rather than a scan over every alert.
+"""
+import bisect
+import logging
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+from app import app, db
+from models import PriceAlert
+from stock_utils import register_quote_listener, get_cached_quote
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rebuild the index from the database at most this often, so alerts created
+# in other worker processes are picked up
+ALERT_INDEX_TTL = 60
+
+
+class AlertIndex:
+    """Sorted (threshold, alert_id) lists per symbol and alert type"""
+
+    def __init__(self):
+        self._thresholds = {}  # (symbol, alert_type) -> sorted list of thresholds
+        self._alert_ids = {}   # (symbol, alert_type) -> alert ids aligned with _thresholds
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def is_stale(self):
+        return time.time() - self._loaded_at >= ALERT_INDEX_TTL
+
+    def load(self, alerts):
+        """Replace the index contents with (alert_id, symbol, alert_type, threshold) rows"""
+        thresholds = {}
+        alert_ids = {}
+        for alert_id, symbol, alert_type, threshold in sorted(alerts, key=lambda a: a[3]):
+            key = (symbol, alert_type)
+            thresholds.setdefault(key, []).append(threshold)
+            alert_ids.setdefault(key, []).append(alert_id)
+
+        with self._lock:
+            self._thresholds = thresholds
+            self._alert_ids = alert_ids
+            self._loaded_at = time.time()
+
+    def add(self, alert_id, symbol, alert_type, threshold):
+        key = (symbol, alert_type)
+        with self._lock:
+            thresholds = self._thresholds.setdefault(key, [])
+            alert_ids = self._alert_ids.setdefault(key, [])
+            start = bisect.bisect_left(thresholds, threshold)
+            position = bisect.bisect_right(thresholds, threshold)
+            # A reload may already have indexed it again
+            if alert_id in alert_ids[start:position]:
+                return
+            thresholds.insert(position, threshold)
+            alert_ids.insert(position, alert_id)
+
+    def remove(self, alert_id, symbol, alert_type, threshold):
+        key = (symbol, alert_type)
+        with self._lock:
+            thresholds = self._thresholds.get(key, [])
+            alert_ids = self._alert_ids.get(key, [])
+            start = bisect.bisect_left(thresholds, threshold)
+            end = bisect.bisect_right(thresholds, threshold)
+            for position in range(start, end):
+                if alert_ids[position] == alert_id:
+                    del thresholds[position]
+                    del alert_ids[position]
+                    return
+
+    def _pop_range(self, key, start, end):
+        """Remove and return (alert_id, alert_type, threshold) for entries [start, end) of a key (lock must be held)"""
+        alert_ids = self._alert_ids.get(key)
+        if not alert_ids or start >= end:
+            return []
+        matched = [(alert_id, key[1], threshold)
+                   for alert_id, threshold in zip(alert_ids[start:end], self._thresholds[key][start:end])]
+        del alert_ids[start:end]
+        del self._thresholds[key][start:end]
+        return matched
+
+    def pop_triggered(self, symbol, price, change_percent):
+        """Remove and return (alert_id, alert_type, threshold) for every alert for symbol crossed by this quote
+
+        The caller puts them back with add() if recording the trigger fails.
+        """
+        triggered = []
+        with self._lock:
+            above = self._thresholds.get((symbol, 'above'), [])
+            triggered += self._pop_range((symbol, 'above'), 0, bisect.bisect_right(above, price))
+
+            below = self._thresholds.get((symbol, 'below'), [])
+            triggered += self._pop_range((symbol, 'below'), bisect.bisect_left(below, price), len(below))
+
+            if change_percent is not None:
+                moves = self._thresholds.get((symbol, 'percent_move'), [])
+                triggered += self._pop_range(
+                    (symbol, 'percent_move'), 0, bisect.bisect_right(moves, abs(change_percent))
+                )
+        return triggered
+
+
+alert_index = AlertIndex()
+
+
+def reload_alert_index():
+    """Load all active, untriggered alerts from the database into the index"""
+    rows = db.session.query(
+        PriceAlert.id, PriceAlert.symbol, PriceAlert.alert_type, PriceAlert.threshold
+    ).filter(PriceAlert.is_active.is_(True)).all()
+    alert_index.load(rows)
+    logger.info(f"Loaded {len(rows)} active price alerts into index")
+
+
+def evaluate_alerts(changed_quotes):
+    """Evaluate alerts for the symbols in {symbol: quote} and persist any that fired"""
+    if not changed_quotes:
+        return []
+
+    popped = []  # (symbol, index entry) removed from the index by this evaluation
+    with app.app_context():
+        try:
+            if alert_index.is_stale():
+                reload_alert_index()
+
+            now = datetime.utcnow()
+            fired = []
+            for symbol, quote in changed_quotes.items():
+                triggered = alert_index.pop_triggered(symbol, quote['price'], quote.get('change_percent'))
+                if not triggered:
+                    continue
+                popped.extend((symbol, entry) for entry in triggered)
+                alert_ids = [alert_id for alert_id, _, _ in triggered]
+
+                updated_ids = _mark_triggered(alert_ids, now, quote)
+                if updated_ids:
+                    fired.extend(updated_ids)
+                    logger.info(f"Triggered {len(updated_ids)} price alert(s) for {symbol} at {quote['price']}")
+
+            db.session.commit()
+            return fired
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error evaluating price alerts: {str(e)}")
+            # Nothing was recorded, so the popped alerts are still active
+            for symbol, (alert_id, alert_type, threshold) in popped:
+                alert_index.add(alert_id, symbol, alert_type, threshold)
+            return []
+
+
+def _mark_triggered(alert_ids, now, quote):
+    """Record the trigger on those of the alerts still active and return their ids
+
+    Only alerts that are still active are marked, so two workers evaluating
+    the same refresh don't both record (and report) the trigger.
+    """
+    statement = update(PriceAlert).where(
+        PriceAlert.id.in_(alert_ids),
+        PriceAlert.is_active.is_(True)
+    ).values(
+        is_active=False,
+        triggered_at=now,
+        triggered_price=quote['price'],
+        triggered_change_percent=quote.get('change_percent')
+    ).execution_options(synchronize_session=False)
+
+    if db.engine.dialect.update_returning:
+        return db.session.scalars(statement.returning(PriceAlert.id)).all()
+
+    # Without RETURNING, the rows this transaction marked are the ones it stamped with now
+    db.session.execute(statement)
+    return db.session.scalars(select(PriceAlert.id).where(
+        PriceAlert.id.in_(alert_ids),
+        PriceAlert.triggered_at == now
+    )).all()
+
+
+def add_alert_to_index(alert):
+    """Index a newly created alert and evaluate it against the last cached quote"""
+    # A stale index is rebuilt from the database on the next evaluation,
+    # which already includes this alert
+    if not alert_index.is_stale():
+        alert_index.add(alert.id, alert.symbol, alert.alert_type, alert.threshold)
+
+    quote = get_cached_quote(alert.symbol)
+    if quote is not None:
+        evaluate_alerts({alert.symbol: quote})
+
+
+def remove_alert_from_index(alert):
+    """Drop an alert from the index, e.g. when it is deleted"""
+    alert_index.remove(alert.id, alert.symbol, alert.alert_type, alert.threshold)
+
+
+register_quote_listener(evaluate_alerts)
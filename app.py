@@ -1,12 +1,20 @@
 import os
 import logging
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from flask_login import LoginManager
 from flask_wtf.csrf import CSRFProtect
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Engine
 from werkzeug.middleware.proxy_fix import ProxyFix
 
+from db_profiles import engine_options, apply_sqlite_pragmas
+import metrics
+import profiling
+import tracing
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,56 +29,141 @@ db = SQLAlchemy(model_class=Base)
 # Initialize CSRF protection
 csrf = CSRFProtect()
 
-# Create Flask app
+# Schema migrations (Alembic); apply them with `flask --app main upgrade-db`
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+# Setup Flask-Login
+login_manager = LoginManager()
+login_manager.login_view = 'login'
+login_manager.login_message_category = 'info'
+
+# Create Flask app; create_app() configures it
 app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")  # Use environment variable in production
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)  # For proper URL generation
 
-# Configure SQLite database
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///investment_dashboard.db")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+def create_app(config=None):
+    """
+    Configure the application and register its extensions, models and routes.
 
-# Ensure Flask can handle connections properly
-app.config["SERVER_NAME"] = None  # Allow any host
-app.config["APPLICATION_ROOT"] = "/"
-app.config["PREFERRED_URL_SCHEME"] = "http"
+    The app is a process-wide singleton that routes and background jobs
+    import directly, so the first call configures it and later calls return
+    it unchanged. Nothing here touches the database (the schema is managed
+    by the upgrade-db command), and heavy libraries such as yfinance,
+    pandas, fpdf, openpyxl and Alembic are imported when first used.
 
-# Initialize database with app
-db.init_app(app)
+    Args:
+        config: Settings applied over the defaults read from the environment
 
-# Initialize CSRF protection
-csrf.init_app(app)
+    Returns:
+        Flask: The application
 
-# Setup Flask-Login
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
-login_manager.login_message_category = 'info'
+    Raises:
+        RuntimeError: If the app is already configured and config differs from its settings
+    """
+    if 'sqlalchemy' in app.extensions:
+        changed = sorted(key for key, value in (config or {}).items() if app.config.get(key) != value)
+        if changed:
+            raise RuntimeError(f"create_app() already configured the app; cannot change {', '.join(changed)}")
+        return app
+
+    app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")  # Use environment variable in production
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)  # For proper URL generation
+
+    # Configure SQLite database
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///investment_dashboard.db")
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+
+    # Server-Sent Events quote streams hold a connection open per client, so they
+    # are only enabled when serving with an async worker class (gunicorn_config.py)
+    app.config["QUOTE_STREAM_ENABLED"] = os.environ.get("QUOTE_STREAM_ENABLED", "").lower() in ("1", "true", "yes")
+
+    # Bearer token Prometheus must send to read /metrics; the endpoint is off without one
+    app.config["METRICS_TOKEN"] = os.environ.get("METRICS_TOKEN", "")
+
+    # Ensure Flask can handle connections properly
+    app.config["SERVER_NAME"] = None  # Allow any host
+    app.config["APPLICATION_ROOT"] = "/"
+    app.config["PREFERRED_URL_SCHEME"] = "http"
+
+    app.config.update(config or {})
+
+    # Engine settings tuned for the database in use
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config["SQLALCHEMY_DATABASE_URI"]))
+    event.listen(Engine, "connect", apply_sqlite_pragmas)
+
+    # Initialize database with app
+    db.init_app(app)
+
+    # Initialize CSRF protection
+    csrf.init_app(app)
+
+    login_manager.init_app(app)
+
+    # Request metrics, registered ahead of the routes' own request hooks
+    metrics.init_app(app)
+
+    # Opt-in request profiling (off unless PROFILE_SAMPLE_RATE or PROFILE_TOKEN is set)
+    profiling.init_app(app)
+
+    # Opt-in request tracing (off unless TRACE_FILE is set) and the trace-critical-path command
+    tracing.init_app(app)
+
+    # The flask CLI's db commands need Flask-Migrate; serving doesn't
+    if click.get_current_context(silent=True) is not None:
+        init_migrate()
+
+    # Import models
+    with app.app_context():
+        try:
+            from models import User
+            # User loader function for Flask-Login
+            @login_manager.user_loader
+            def load_user(user_id):
+                return User.query.get(int(user_id))
+
+        except Exception as e:
+            logger.error(f"Error initializing database: {str(e)}")
+
+    # Import routes after models are defined
+    with app.app_context():
+        try:
+            import routes
+            logger.info("Routes registered successfully")
+        except Exception as e:
+            logger.error(f"Error registering routes: {str(e)}")
+
+    return app
+
+
+def init_migrate():
+    """Register Flask-Migrate, which imports Alembic, for migrations and the db commands"""
+    if 'migrate' not in app.extensions:
+        from flask_migrate import Migrate
+        Migrate(app, db, directory=MIGRATIONS_DIR)
+
+# Revisions matching the schemas db.create_all() built before migrations
+# existed: the original four tables, and those plus price_alert
+BASELINE_REVISION = '0001'
+PRICE_ALERT_REVISION = '0001a'
+
+def upgrade_database():
+    """Bring the database schema up to date by running pending migrations
+
+    Runs once per deployment before the app serves requests (see the
+    upgrade-db command and gunicorn_config.on_starting), not on import.
+    """
+    from flask_migrate import upgrade, stamp
+
+    init_migrate()
+    inspector = inspect(db.engine)
+    if inspector.has_table('user') and not inspector.has_table('alembic_version'):
+        # Adopt a database created by db.create_all() before migrations existed
+        revision = PRICE_ALERT_REVISION if inspector.has_table('price_alert') else BASELINE_REVISION
+        stamp(revision=revision)
+        logger.info(f"Stamped existing database at baseline revision {revision}")
+    upgrade()
 
-# Import models and create tables
-with app.app_context():
-    try:
-        import models
-        db.create_all()
-        logger.info("Database tables created successfully")
-        
-        from models import User
-        # User loader function for Flask-Login
-        @login_manager.user_loader
-        def load_user(user_id):
-            return User.query.get(int(user_id))
-            
-    except Exception as e:
-        logger.error(f"Error initializing database: {str(e)}")
-
-# Import routes after models are defined
-with app.app_context():
-    try:
-        import routes
-        logger.info("Routes registered successfully")
-    except Exception as e:
-        logger.error(f"Error registering routes: {str(e)}")
+@app.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Create or upgrade the database schema."""
+    upgrade_database()
+    logger.info("Database schema is up to date")
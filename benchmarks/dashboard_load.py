@@ -0,0 +1,144 @@
+"""
+Compare dashboard throughput of sync and gevent gunicorn workers.
+
+Starts gunicorn against the simulated provider once per worker class, with
+the same number of workers, registers a pool of users with portfolio and
+watchlist items, then runs N concurrent virtual users for a fixed duration.
+Each virtual user repeatedly loads the dashboard the way a browser does:
+the /dashboard shell followed by /api/portfolio and /api/watchlist.
+
+The quote cache TTL is shortened (SIM_QUOTE_CACHE_TTL) so requests keep
+reaching the provider instead of being served from a warm cache.
+
+Usage: python benchmarks/dashboard_load.py [--users 50,200] [--duration 20] [--workers 2]
+"""
+import argparse
+import os
+import resource
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SYMBOLS = [
+    "RELIANCE", "TCS", "HDFCBANK", "INFY", "HINDUNILVR", "ICICIBANK", "SBIN", "BHARTIARTL",
+    "KOTAKBANK", "ITC", "BAJFINANCE", "WIPRO", "AXISBANK", "LT", "ASIANPAINT", "MARUTI",
+    "SUNPHARMA", "TITAN", "NTPC", "TATAMOTORS", "POWERGRID", "HCLTECH", "TECHM", "CIPLA"
+]
+DASHBOARD_REQUESTS = ["/dashboard", "/api/portfolio", "/api/watchlist"]
+
+
+def start_server(worker_class, workers, port, quote_ttl):
+    env = dict(
+        os.environ,
+        DATABASE_URL="sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"),
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        GUNICORN_WORKERS=str(workers),
+        GUNICORN_WORKER_CLASS=worker_class,
+        SIM_PROVIDER_LATENCY=os.environ.get("SIM_PROVIDER_LATENCY", "0.3"),
+        SIM_QUOTE_CACHE_TTL=str(quote_ttl),
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn_config.py", "benchmarks.sim_app:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(base_url + "/login", timeout=1)
+            return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("gunicorn did not start")
+
+
+def create_user(base_url, index):
+    """Register a user holding five symbols and watching five more; returns a logged-in opener"""
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+
+    def post(path, **fields):
+        opener.open(base_url + path, urllib.parse.urlencode(fields).encode(), timeout=60)
+
+    username = f"loaduser{index}"
+    post("/register", username=username, email=f"{username}@example.com", password="benchpass", confirm_password="benchpass")
+    post("/login", username=username, password="benchpass")
+    for offset in range(10):
+        symbol = SYMBOLS[(index * 3 + offset) % len(SYMBOLS)]
+        if offset < 5:
+            post("/portfolio/add", symbol=symbol, quantity="10", buy_price="100", exchange="NSE")
+        else:
+            post("/watchlist/add", symbol=symbol, exchange="NSE", notes="")
+    return opener
+
+
+def virtual_user(opener, base_url, stop_at, results):
+    """Load the dashboard until stop_at, recording each full page load time or an error"""
+    while time.perf_counter() < stop_at:
+        started = time.perf_counter()
+        try:
+            for path in DASHBOARD_REQUESTS:
+                opener.open(base_url + path, timeout=60).read()
+            results.append(time.perf_counter() - started)
+        except OSError:
+            results.append(None)
+
+
+def run_load(base_url, openers, users, duration):
+    results = []
+    stop_at = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=virtual_user, args=(openers[i % len(openers)], base_url, stop_at, results))
+        for i in range(users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies = sorted(r for r in results if r is not None)
+    errors = len(results) - len(latencies)
+    # Loads still in flight at stop_at finish late, so divide by the real elapsed time
+    elapsed = duration + max(0.0, time.perf_counter() - stop_at)
+    p50 = statistics.median(latencies) if latencies else float("nan")
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) >= 20 else float("nan")
+    return len(latencies) / elapsed, p50, p95, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", default="50,200")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--accounts", type=int, default=20)
+    parser.add_argument("--quote-ttl", type=float, default=1.0)
+    parser.add_argument("--worker-classes", default="sync,gevent")
+    parser.add_argument("--port", type=int, default=5057)
+    args = parser.parse_args()
+
+    user_counts = [int(count) for count in args.users.split(",")]
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, max(user_counts) * 4 + 256)), hard))
+
+    print(f"{'worker':>8} {'users':>6} {'dashboards/s':>13} {'p50 (s)':>8} {'p95 (s)':>8} {'errors':>7}")
+    for worker_class in args.worker_classes.split(","):
+        process, base_url = start_server(worker_class, args.workers, args.port, args.quote_ttl)
+        try:
+            openers = [create_user(base_url, index) for index in range(args.accounts)]
+            for users in user_counts:
+                throughput, p50, p95, errors = run_load(base_url, openers, users, args.duration)
+                print(f"{worker_class:>8} {users:>6} {throughput:>13.1f} {p50:>8.2f} {p95:>8.2f} {errors:>7}")
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
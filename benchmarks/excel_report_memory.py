@@ -0,0 +1,81 @@
+"""
+Measure Excel report time and peak memory in regular and write-only mode.
+
+Renders synthetic reports of growing size to a temp file, once with a
+regular workbook and once with write-only worksheets (by moving
+report_generator.EXCEL_WRITE_ONLY_ROWS), timing each render and then
+rendering it again under tracemalloc for the peak Python memory it
+allocated. Each report also carries ten years of daily history.
+
+Regular workbooks keep a cell object per value, so they are skipped above
+--regular-max-rows to keep the run short.
+
+Usage: python benchmarks/excel_report_memory.py [--rows 1000,10000,100000] [--regular-max-rows 10000]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import report_generator  # noqa: E402
+from benchmarks.report_rendering import make_report_data  # noqa: E402
+
+HISTORY_DAYS = 3650
+
+
+def make_large_report_data(rows):
+    data = make_report_data(rows)
+    for item in data['portfolio']:
+        item['exchange'] = 'NSE'
+        item['date_added'] = date(2024, 1, 2)
+    start = date.today() - timedelta(days=HISTORY_DAYS)
+    data['history'] = [
+        {'date': start + timedelta(days=day), 'interval': 'daily', 'value': 100000.0 + day, 'change_percent': 0.1}
+        for day in range(HISTORY_DAYS)
+    ]
+    return data
+
+
+def render(data, write_only):
+    report_generator.EXCEL_WRITE_ONLY_ROWS = -1 if write_only else float('inf')
+    path = os.path.join(tempfile.gettempdir(), f"bench_report_{os.getpid()}.xlsx")
+    started = time.perf_counter()
+    if not report_generator.generate_monthly_report_excel(data, path):
+        raise RuntimeError("Excel report failed")
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(path)
+    os.remove(path)
+    return elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="1000,10000,100000")
+    parser.add_argument("--regular-max-rows", type=int, default=10000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    print(f"{'rows':>7} {'mode':<11} {'seconds':>8} {'peak MB':>8} {'file MB':>8}")
+    for rows in (int(value) for value in args.rows.split(',')):
+        data = make_large_report_data(rows)
+        for write_only in (False, True):
+            mode = 'write-only' if write_only else 'regular'
+            if not write_only and rows > args.regular_max_rows:
+                print(f"{rows:>7} {mode:<11} {'skipped':>8}")
+                continue
+            elapsed, size = render(data, write_only)
+            tracemalloc.start()
+            render(data, write_only)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{rows:>7} {mode:<11} {elapsed:>8.2f} {peak / 1e6:>8.1f} {size / 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
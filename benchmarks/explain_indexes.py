@@ -0,0 +1,161 @@
+"""
+Check that the dashboard's hot queries use the composite indexes at scale.
+
+Migrates a fresh SQLite database, fills it with about 1M portfolio lots and
+1M history rows spread over many users, then runs EXPLAIN QUERY PLAN on the
+queries the dashboard and watchlist routes issue. Each plan must search an
+index rather than scan its table, and ordered history reads must not need
+a temporary sort. The queries are then timed with and without the indexes.
+
+Exits with status 1 if any plan does not use an index.
+tests/test_explain_indexes.py checks the same plans under pytest on a
+smaller database.
+
+Usage: python benchmarks/explain_indexes.py [--rows 1000000] [--users 10000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, create_app, db, upgrade_database  # noqa: E402
+from models import PortfolioItem, WatchlistItem, PortfolioHistory, PriceAlert  # noqa: E402
+
+SYMBOLS = ["RELIANCE", "TCS", "HDFCBANK", "INFY", "ITC", "SBIN", "LT", "WIPRO", "TITAN", "NTPC"]
+INDEXES = [
+    "uq_portfolio_history_user_id_date",
+    "ix_portfolio_item_user_id_symbol",
+    "ix_watchlist_item_user_id_symbol",
+    "ix_price_alert_user_id_triggered_at",
+]
+
+
+def hot_queries(user_id):
+    """The queries the dashboard, watchlist and snapshot code issue, by name"""
+    today = date(2020, 1, 1) + timedelta(days=50)
+    return {
+        "portfolio rows": PortfolioItem.query.filter_by(user_id=user_id),
+        "watchlist rows": WatchlistItem.query.filter_by(user_id=user_id),
+        "watchlist duplicate check": WatchlistItem.query.filter_by(user_id=user_id, symbol="TCS").limit(1),
+        "today's snapshot": PortfolioHistory.query.filter_by(user_id=user_id, date=today).limit(1),
+        "performance history": PortfolioHistory.query.filter_by(user_id=user_id).order_by(PortfolioHistory.date),
+        "triggered alerts": PriceAlert.query.filter(
+            PriceAlert.user_id == user_id, PriceAlert.triggered_at.isnot(None)
+        ).order_by(PriceAlert.triggered_at.desc()).limit(10),
+    }
+
+
+def seed(rows, users):
+    """
+    Bulk load rows with the raw DBAPI connection, which is much faster than the ORM.
+
+    New users are numbered after any already in the database.
+
+    Returns:
+        range: IDs of the new users
+    """
+    connection = db.engine.raw_connection()
+    cursor = connection.cursor()
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM user")
+    first = cursor.fetchone()[0] + 1
+    user_ids = range(first, first + users)
+    cursor.executemany(
+        "INSERT INTO user (id, username, email, password_hash) VALUES (?, ?, ?, 'x')",
+        [(i, f"user{i}", f"user{i}@example.com") for i in user_ids]
+    )
+    cursor.executemany(
+        "INSERT INTO portfolio_item (symbol, quantity, buy_price, exchange, user_id) VALUES (?, 10, 100, 'NSE', ?)",
+        ((random.choice(SYMBOLS), random.choice(user_ids)) for _ in range(rows))
+    )
+    # One row per user per day, so the unique (user_id, date) index holds
+    days = rows // users
+    cursor.executemany(
+        "INSERT INTO portfolio_history (user_id, date, total_value) VALUES (?, ?, 1000)",
+        ((user_id, (date(2020, 1, 1) + timedelta(days=day)).isoformat())
+         for day in range(days) for user_id in user_ids)
+    )
+    cursor.executemany(
+        "INSERT INTO watchlist_item (symbol, exchange, user_id) VALUES (?, 'NSE', ?)",
+        ((random.choice(SYMBOLS), random.choice(user_ids)) for _ in range(rows // 5))
+    )
+    cursor.executemany(
+        "INSERT INTO price_alert (user_id, watchlist_item_id, symbol, alert_type, threshold, is_active, triggered_at) "
+        "VALUES (?, 1, 'TCS', 'above', 100, 0, ?)",
+        ((random.choice(user_ids), f"2026-01-{random.randint(1, 28):02d} 10:00:00") for _ in range(rows // 5))
+    )
+    cursor.execute("ANALYZE")
+    connection.commit()
+    connection.close()
+    return user_ids
+
+
+def explain(query):
+    """EXPLAIN QUERY PLAN details for an ORM query"""
+    sql = str(query.statement.compile(db.engine, compile_kwargs={"literal_binds": True}))
+    return [row[-1] for row in db.session.execute(db.text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+def plan_uses_indexes(plan):
+    """Whether every table access in a plan searches an index and nothing needs a temporary sort"""
+    uses_index = all(
+        "USING INDEX" in step or "USING COVERING INDEX" in step or "PRIMARY KEY" in step
+        for step in plan if step.startswith(("SEARCH", "SCAN"))
+    )
+    sorts = any("TEMP B-TREE" in step for step in plan)
+    return uses_index and not sorts
+
+
+def time_queries(user_ids, repeat=200):
+    """Average milliseconds per query over a sample of users"""
+    timings = {}
+    for name in hot_queries(1):
+        started = time.perf_counter()
+        for user_id in user_ids[:repeat]:
+            hot_queries(user_id)[name].all()
+        timings[name] = (time.perf_counter() - started) * 1000 / min(repeat, len(user_ids))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=10000)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    create_app()
+
+    failures = 0
+    with app.app_context():
+        upgrade_database()
+        started = time.perf_counter()
+        user_ids = seed(args.rows, args.users)
+        print(f"Seeded {args.rows} lots and history rows in {time.perf_counter() - started:.1f}s\n")
+
+        for name, query in hot_queries(user_ids[len(user_ids) // 2]).items():
+            plan = explain(query)
+            ok = plan_uses_indexes(plan)
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {name}: {'; '.join(plan)}")
+
+        sample = random.sample(user_ids, min(args.users, 200))
+        indexed = time_queries(sample)
+        for index in INDEXES:
+            db.session.execute(db.text(f"DROP INDEX {index}"))
+        db.session.commit()
+        unindexed = time_queries(sample, repeat=20)
+
+    print(f"\n{'query':<28} {'indexed (ms)':>13} {'no index (ms)':>14}")
+    for name in indexed:
+        print(f"{name:<28} {indexed[name]:>13.3f} {unindexed[name]:>14.3f}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
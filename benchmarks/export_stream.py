@@ -0,0 +1,75 @@
+"""
+Measure a large streaming export through /export/history.<format>.
+
+Fills a fresh SQLite database with one user's portfolio history, then reads
+the export with the Flask test client without buffering and reports the time
+to the first chunk, the total time and the peak Python memory allocated.
+
+Usage: python benchmarks/export_stream.py [--rows 300000] [--format csv]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from app import create_app, db, upgrade_database  # noqa: E402
+from models import User, PortfolioHistory  # noqa: E402
+
+app = create_app({"WTF_CSRF_ENABLED": False})
+
+with app.app_context():
+    upgrade_database()
+
+
+def seed_history(rows):
+    with app.app_context():
+        user_id = User.query.filter_by(username="exportbench").first().id
+        start = date(1000, 1, 1)
+        for offset in range(0, rows, 10000):
+            db.session.bulk_insert_mappings(PortfolioHistory, [
+                dict(user_id=user_id, date=start + timedelta(days=i), total_value=100000.0 + i,
+                     daily_change=1.0, daily_change_percent=0.001)
+                for i in range(offset, min(offset + 10000, rows))
+            ])
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=300000)
+    parser.add_argument("--format", default="csv", choices=["csv", "ndjson"])
+    args = parser.parse_args()
+
+    client = app.test_client()
+    client.post("/register", data=dict(username="exportbench", email="exportbench@example.com", password="benchpass", confirm_password="benchpass"))
+    client.post("/login", data=dict(username="exportbench", password="benchpass"))
+    seed_history(args.rows)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get(f"/export/history.{args.format}", buffered=False)
+    chunks = iter(response.response)
+    size = len(next(chunks))
+    first_chunk = time.perf_counter() - started
+    for chunk in chunks:
+        size += len(chunk)
+    elapsed = time.perf_counter() - started
+    response.close()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"rows                {args.rows}")
+    print(f"body size (MB)      {size / 1e6:.1f}")
+    print(f"first chunk (ms)    {first_chunk * 1000:.1f}")
+    print(f"total (s)           {elapsed:.2f}")
+    print(f"peak alloc (MB)     {peak / 1e6:.1f}")
+
+
+if __name__ == "__main__":
+    main()
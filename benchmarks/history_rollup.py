@@ -0,0 +1,104 @@
+"""
+Measure history table size and chart read cost before and after compaction.
+
+Migrates a fresh SQLite database and fills it with years of daily portfolio
+snapshots for many users. The chart series for each range is read for a
+sample of users (including loading the daily rows, as a dashboard request
+does), then every user's history is compacted into weekly and monthly
+rollups and the reads are timed again.
+
+Usage: python benchmarks/history_rollup.py [--users 300] [--years 10]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from app import create_app, db, upgrade_database  # noqa: E402
+from models import PortfolioHistory, PortfolioHistoryWeekly, PortfolioHistoryMonthly  # noqa: E402
+from history_rollup import PERFORMANCE_RANGES, compact_all_history, get_history_series  # noqa: E402
+from user_data import get_user_data  # noqa: E402
+
+app = create_app()
+
+
+def seed(users, days):
+    """Bulk load one snapshot per user per day, ending yesterday"""
+    connection = db.engine.raw_connection()
+    cursor = connection.cursor()
+    cursor.executemany(
+        "INSERT INTO user (id, username, email, password_hash) VALUES (?, ?, ?, 'x')",
+        [(i, f"user{i}", f"user{i}@example.com") for i in range(1, users + 1)]
+    )
+    start = date.today() - timedelta(days=days)
+    cursor.executemany(
+        "INSERT INTO portfolio_history (user_id, date, total_value, daily_change, daily_change_percent) "
+        "VALUES (?, ?, ?, 0, 0)",
+        ((user_id, (start + timedelta(days=day)).isoformat(), 100000 + random.uniform(-5000, 5000))
+         for user_id in range(1, users + 1) for day in range(days))
+    )
+    connection.commit()
+    connection.close()
+
+
+def time_reads(user_ids):
+    """Average milliseconds and points per chart range, reading in a fresh app context each time"""
+    results = {}
+    for range_name in PERFORMANCE_RANGES:
+        points = 0
+        started = time.perf_counter()
+        for user_id in user_ids:
+            # A new app context gets a new flask.g, so nothing is memoized between reads
+            with app.app_context():
+                _, series = get_history_series(user_id, get_user_data(user_id).history(), range_name)
+                points += len(series)
+        results[range_name] = ((time.perf_counter() - started) * 1000 / len(user_ids), points // len(user_ids))
+    return results
+
+
+def table_sizes():
+    return {model.__tablename__: model.query.count()
+            for model in (PortfolioHistory, PortfolioHistoryWeekly, PortfolioHistoryMonthly)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--years", type=int, default=10)
+    args = parser.parse_args()
+
+    with app.app_context():
+        upgrade_database()
+        started = time.perf_counter()
+        seed(args.users, args.years * 365)
+        print(f"Seeded {args.users} users x {args.years} years in {time.perf_counter() - started:.1f}s")
+
+        sample = random.sample(range(1, args.users + 1), min(args.users, 50))
+        before_sizes = table_sizes()
+        before = time_reads(sample)
+
+        started = time.perf_counter()
+        compacted = compact_all_history()
+        print(f"Compacted {compacted} daily rows in {time.perf_counter() - started:.1f}s\n")
+
+        after_sizes = table_sizes()
+        after = time_reads(sample)
+
+    print(f"{'table':<28} {'before':>9} {'after':>9}")
+    for table in before_sizes:
+        print(f"{table:<28} {before_sizes[table]:>9} {after_sizes[table]:>9}")
+
+    print(f"\n{'range':<6} {'before (ms)':>12} {'points':>7} {'after (ms)':>11} {'points':>7}")
+    for range_name in PERFORMANCE_RANGES:
+        print(f"{range_name:<6} {before[range_name][0]:>12.2f} {before[range_name][1]:>7} "
+              f"{after[range_name][0]:>11.2f} {after[range_name][1]:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Time a large broker CSV import through POST /portfolio/import.
+
+Generates a holdings CSV with a few invalid rows mixed in, uploads it with
+the Flask test client against a fresh SQLite database and reports the import
+time and the peak Python memory allocated while importing.
+
+Usage: python benchmarks/import_csv.py [--rows 50000]
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+
+from app import create_app, upgrade_database  # noqa: E402
+from models import PortfolioItem  # noqa: E402
+from stock_utils import get_instrument_symbols  # noqa: E402
+
+app = create_app({"WTF_CSRF_ENABLED": False})
+
+with app.app_context():
+    upgrade_database()
+
+
+def build_csv(rows):
+    """Holdings CSV with one invalid row in every hundred"""
+    symbols = sorted(get_instrument_symbols())
+    lines = ["Instrument,Qty.,Avg. cost,Exchange"]
+    for i in range(rows):
+        if i % 100 == 99:
+            lines.append(f"NOTASYMBOL{i},1,1,NSE")
+        else:
+            lines.append(f"{random.choice(symbols)},{random.randint(1, 500)},{random.uniform(10, 5000):.2f},NSE")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    args = parser.parse_args()
+
+    data = build_csv(args.rows)
+    client = app.test_client()
+    client.post("/register", data=dict(username="importbench", email="importbench@example.com", password="benchpass", confirm_password="benchpass"))
+    client.post("/login", data=dict(username="importbench", password="benchpass"))
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.post(
+        "/portfolio/import",
+        data={"csv_file": (io.BytesIO(data), "holdings.csv")},
+        content_type="multipart/form-data"
+    )
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    with app.app_context():
+        imported = PortfolioItem.query.count()
+
+    print(f"status {response.status_code}")
+    print(f"rows            {args.rows}")
+    print(f"file size (MB)  {len(data) / 1e6:.1f}")
+    print(f"imported        {imported}")
+    print(f"seconds         {elapsed:.2f}")
+    print(f"rows/s          {args.rows / elapsed:,.0f}")
+    print(f"peak alloc (MB) {peak / 1e6:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Track application startup time with python -X importtime.
+
+Imports the app (main by default) in fresh interpreters, prints the median
+total import time and the modules that took longest, and fails if any of
+the heavy libraries that are meant to load on first use (yfinance, pandas,
+fpdf, openpyxl, Alembic) was imported at startup, or if the total is over
+the budget. Run it in CI to catch startup regressions.
+
+Usage: python benchmarks/import_time.py [--module main] [--runs 5] [--budget-ms 1000] [--top 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only imported when a quote is fetched, a report rendered or a migration run
+DEFERRED_MODULES = ["yfinance", "pandas", "fpdf", "openpyxl", "alembic", "flask_migrate"]
+
+
+def import_times(module):
+    """Import the module in a fresh interpreter and return {module: cumulative microseconds} and the top-level total"""
+    env = dict(os.environ, DATABASE_URL="sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr}")
+
+    modules = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or line.endswith("| imported package"):
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative_us)
+        # Nested imports are indented past the one space after the bar;
+        # top-level ones add up to the whole import
+        if not name.startswith("  "):
+            total += int(cumulative_us)
+    return modules, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1000)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    total_ms = statistics.median(total for _, total in runs) / 1000
+    modules = runs[-1][0]
+
+    print(f"import {args.module}: {total_ms:.0f} ms (median of {args.runs}, budget {args.budget_ms:.0f} ms)\n")
+    print(f"{'cumulative ms':>13}  module")
+    for name, cumulative in sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{cumulative / 1000:>13.1f}  {name}")
+
+    loaded = [name for name in DEFERRED_MODULES if name in modules]
+    failed = False
+    if loaded:
+        print(f"\nFAIL: imported at startup: {', '.join(loaded)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"\nFAIL: import took {total_ms:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("\nStartup import budget OK")
+
+
+if __name__ == "__main__":
+    main()
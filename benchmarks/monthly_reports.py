@@ -0,0 +1,103 @@
+"""
+Measure month-end batch report throughput.
+
+Migrates a fresh SQLite database with many users, each holding a few of a
+shared pool of symbols and a few months of daily history, then runs the
+monthly report batch against the simulated provider with each worker
+count. Prints the provider calls and symbols fetched (each symbol should be
+fetched once per run, however many users hold it) and the throughput from
+the manifest.
+
+Usage: python benchmarks/monthly_reports.py [--users 200] [--holdings 15] [--symbols 100] [--workers 1,2]
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.setdefault("SIM_PROVIDER_LATENCY", "0.2")
+
+from benchmarks import simulated_provider  # noqa: E402
+
+simulated_provider.install()
+
+import stock_utils  # noqa: E402
+from app import create_app, db, upgrade_database  # noqa: E402
+from report_batch import generate_monthly_reports  # noqa: E402
+
+app = create_app()
+
+HISTORY_DAYS = 120
+
+provider_calls = []
+
+
+def counting_download(tickers, *args, **kwargs):
+    provider_calls.append(tickers.split() if isinstance(tickers, str) else list(tickers))
+    return simulated_provider.download(tickers, *args, **kwargs)
+
+
+def seed(users, holdings, symbols):
+    connection = db.engine.raw_connection()
+    cursor = connection.cursor()
+    pool = [f"SYM{i}" for i in range(symbols)]
+    cursor.executemany(
+        "INSERT INTO user (id, username, email, password_hash) VALUES (?, ?, ?, 'x')",
+        [(i, f"user{i}", f"user{i}@example.com") for i in range(1, users + 1)]
+    )
+    cursor.executemany(
+        "INSERT INTO portfolio_item (user_id, symbol, quantity, buy_price, exchange, date_added) "
+        "VALUES (?, ?, ?, ?, 'NSE', '2024-01-02 00:00:00')",
+        [(user_id, symbol, random.randint(1, 100), random.uniform(100, 3000))
+         for user_id in range(1, users + 1) for symbol in random.sample(pool, holdings)]
+    )
+    start = date.today() - timedelta(days=HISTORY_DAYS)
+    cursor.executemany(
+        "INSERT INTO portfolio_history (user_id, date, total_value, daily_change, daily_change_percent) "
+        "VALUES (?, ?, ?, 0, 0)",
+        [(user_id, (start + timedelta(days=day)).isoformat(), 100000 + random.uniform(-5000, 5000))
+         for user_id in range(1, users + 1) for day in range(HISTORY_DAYS)]
+    )
+    connection.commit()
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--holdings", type=int, default=15)
+    parser.add_argument("--symbols", type=int, default=100)
+    parser.add_argument("--workers", default="1,2")
+    args = parser.parse_args()
+
+    stock_utils.yf.download = counting_download
+    # Without the durable quote table, later runs can't read prices the first one stored
+    stock_utils.set_quote_store(None)
+    # Keep the per-report log lines out of the output
+    logging.disable(logging.INFO)
+
+    with app.app_context():
+        upgrade_database()
+        seed(args.users, args.holdings, args.symbols)
+
+        print(f"{args.users} users x {args.holdings} holdings of {args.symbols} symbols, {os.cpu_count()} CPUs\n")
+        print(f"{'workers':>7} {'provider calls':>15} {'symbols fetched':>16} {'reports':>8} {'seconds':>8} "
+              f"{'reports/s':>10} {'per core':>9}")
+        for workers in (int(value) for value in args.workers.split(',')):
+            # Start each run from an empty quote cache so it prices everything itself
+            stock_utils._quote_cache.clear()
+            provider_calls.clear()
+            manifest = generate_monthly_reports(tempfile.mkdtemp(), workers=workers)
+            fetched = sum(len(tickers) for tickers in provider_calls)
+            print(f"{workers:>7} {len(provider_calls):>15} {fetched:>16} {len(manifest['reports']):>8} "
+                  f"{manifest['elapsed_seconds']:>8.1f} {manifest['reports_per_second']:>10.2f} "
+                  f"{manifest['reports_per_second_per_core']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
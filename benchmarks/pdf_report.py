@@ -0,0 +1,68 @@
+"""
+Measure PDF report render time for growing portfolios.
+
+Renders synthetic reports (with ten years of daily history for the value
+chart) of 50, 1,000 and 10,000 holdings in memory. The first render in
+the process includes parsing the Unicode font; later ones reuse it.
+
+For comparison, reports up to --list-max-rows are also rendered with
+FPDF's own glyph list instead of report_generator._GlyphSubset, whose
+output cost grows with the square of the text length.
+
+Usage: python benchmarks/pdf_report.py [--rows 50,1000,10000] [--runs 3] [--list-max-rows 1000]
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import report_generator  # noqa: E402
+from benchmarks.excel_report_memory import make_large_report_data  # noqa: E402
+
+
+def render(data):
+    started = time.perf_counter()
+    content = report_generator.generate_monthly_report_pdf(data)
+    if not content:
+        raise RuntimeError("PDF report failed")
+    return (time.perf_counter() - started) * 1000, content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="50,1000,10000")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--list-max-rows", type=int, default=1000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    regular, _ = report_generator._find_pdf_fonts()
+    print(f"Font: {regular or 'core Helvetica'}")
+    first_ms, _ = render(make_large_report_data(1))
+    print(f"First render in process (font parsing included): {first_ms:.0f} ms\n")
+
+    print(f"{'rows':>6} {'median ms':>10} {'pages':>6} {'KB':>7} {'FPDF list ms':>13}")
+    for rows in (int(value) for value in args.rows.split(',')):
+        data = make_large_report_data(rows)
+        timings = []
+        for _ in range(args.runs):
+            ms, content = render(data)
+            timings.append(ms)
+        pages = content.count(b'/Type /Page\n')
+
+        list_ms = ''
+        if rows <= args.list_max_rows:
+            report_generator._GlyphSubset, glyph_subset = list, report_generator._GlyphSubset
+            try:
+                list_ms = f"{render(data)[0]:.0f}"
+            finally:
+                report_generator._GlyphSubset = glyph_subset
+        print(f"{rows:>6} {statistics.median(timings):>10.0f} {pages:>6} {len(content) / 1024:>7.0f} {list_ms:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Count the SQL statements each page and API route issues per request.
+
+Migrates a fresh SQLite database, logs in a user holding a few portfolio
+lots, watchlist items, alerts and daily snapshots, then requests each route
+with the Flask test client against the simulated provider and counts the
+statements the engine executes: pages, JSON and quote APIs, exports and the
+quote stream's setup, then the form and API requests that add, sync, import
+and delete data. Quotes are warmed first so provider calls do not add
+alert-check queries to the counts.
+
+Exits with status 1 if any route issues more statements than its budget.
+tests/test_query_counts.py checks the same budgets under pytest.
+
+Usage: python benchmarks/query_counts.py
+"""
+import io
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event  # noqa: E402
+
+from app import app, create_app, db, upgrade_database  # noqa: E402
+from models import User, PortfolioHistory, PortfolioItem, PriceAlert, WatchlistItem  # noqa: E402
+from stock_utils import refresh_quotes  # noqa: E402
+
+SYMBOLS = ["RELIANCE", "TCS", "INFY", "ITC", "SBIN"]
+
+# Maximum statements per request, including the Flask-Login user load.
+# The portfolio APIs allow one more for saving the day's first snapshot.
+BUDGETS = {
+    "/dashboard": 5,
+    "/portfolio": 2,
+    "/watchlist": 3,
+    "/api/dashboard": 6,
+    "/api/portfolio": 4,
+    "/api/portfolio/performance?range=1m": 2,
+    "/api/watchlist": 3,
+    "/stock/quotes?symbols=TCS,INFY": 1,
+    "/stock/quotes/changes": 2,
+    "/stock/price/TCS": 1,
+    "/stock/daily-change/TCS": 1,
+    "/stream/quotes": 2,
+    "/export/portfolio.csv": 2,
+    "/export/watchlist.ndjson": 2,
+    "/export/history.csv": 4,
+    "/reports": 2,
+}
+
+# Requests that change data, each counted once, in this order:
+# label -> (method, path, function returning the request's arguments, budget).
+# Paths are formatted with the IDs of the user's newest lot, watchlist item and alert.
+WRITE_BUDGETS = {
+    "add lot": ("POST", "/portfolio/add", lambda: dict(
+        data=dict(symbol="WIPRO", quantity="1", buy_price="100", exchange="NSE")), 2),
+    "add watchlist item": ("POST", "/watchlist/add", lambda: dict(
+        data=dict(symbol="WIPRO", exchange="NSE", notes="")), 3),
+    "add alert": ("POST", "/watchlist/alert/add/{item_id}", lambda: dict(
+        data=dict(alert_type="below", threshold="1")), 5),
+    "delete alert": ("POST", "/watchlist/alert/delete/{alert_id}", dict, 3),
+    "sync portfolio": ("POST", "/api/portfolio/sync", lambda: dict(json={"lots": [
+        dict(symbol=symbol, quantity=10, buy_price=100) for symbol in SYMBOLS
+    ] + [dict(symbol="WIPRO", quantity=2, buy_price=100), dict(symbol="LT", quantity=1, buy_price=100)]}), 5),
+    "import CSV": ("POST", "/portfolio/import", lambda: dict(
+        data={"csv_file": (io.BytesIO(b"Symbol,Quantity,Buy Price\nTCS,1,90\nITC,2,80\nNTPC,3,70\n"), "lots.csv")},
+        content_type="multipart/form-data"), 3),
+    "delete lot": ("POST", "/portfolio/delete/{lot_id}", dict, 3),
+    "delete watchlist item": ("POST", "/watchlist/delete/{item_id}", dict, 5),
+}
+
+
+def seed(client):
+    """Create the user's lots, watchlist, alerts and a week of snapshots, ending yesterday; returns the user's ID"""
+    client.post("/register", data=dict(username="querybench", email="querybench@example.com", password="benchpass", confirm_password="benchpass"))
+    client.post("/login", data=dict(username="querybench", password="benchpass"))
+    for symbol in SYMBOLS:
+        client.post("/portfolio/add", data=dict(symbol=symbol, quantity="10", buy_price="100", exchange="NSE"))
+        client.post("/watchlist/add", data=dict(symbol=symbol, exchange="NSE", notes=""))
+
+    with app.app_context():
+        user_id = User.query.filter_by(username="querybench").first().id
+        # The database may hold other users' items, so look up this user's own
+        item_id = WatchlistItem.query.filter_by(user_id=user_id).order_by(WatchlistItem.id).first().id
+    client.post(f"/watchlist/alert/add/{item_id}", data=dict(alert_type="above", threshold="100000"))
+
+    with app.app_context():
+        # The watchlist budgets only mean something with the alert join loading a row
+        if PriceAlert.query.filter_by(user_id=user_id, watchlist_item_id=item_id).count() != 1:
+            raise RuntimeError("Seeding the price alert failed")
+        today = date.today()
+        db.session.bulk_insert_mappings(PortfolioHistory, [
+            dict(user_id=user_id, date=today - timedelta(days=days), total_value=1000.0 + days)
+            for days in range(1, 8)
+        ])
+        db.session.commit()
+    return user_id
+
+
+def count_queries(client, path, requests=2, method="GET", request_args=dict):
+    """
+    Make a request a few times and count the statements each one executes.
+
+    The first /api/portfolio call of the day also saves a snapshot, so by
+    default both a first and a repeat request are counted. Response bodies
+    are read, so streamed exports are counted in full; event streams are
+    only opened.
+
+    Args:
+        client: Logged-in Flask test client
+        path: Route to request
+        requests: Number of requests
+        method: HTTP method
+        request_args: Function returning keyword arguments for the request (data, json, ...)
+
+    Returns:
+        tuple: (statement count per request, infinite if it failed; the last request's statements)
+    """
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        counts = []
+        for _ in range(requests):
+            statements.clear()
+            response = client.open(path, method=method, **request_args())
+            if response.mimetype != "text/event-stream":
+                response.get_data()
+            response.close()
+            # Forms redirect after a successful POST
+            ok = response.status_code == 200 or (method != "GET" and response.status_code == 302)
+            counts.append(len(statements) if ok else float("inf"))
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return counts, list(statements)
+
+
+def newest_ids(user_id):
+    """IDs of the user's newest lot, watchlist item and alert, for WRITE_BUDGETS paths"""
+    with app.app_context():
+        return {
+            "lot_id": db.session.query(db.func.max(PortfolioItem.id)).filter_by(user_id=user_id).scalar(),
+            "item_id": db.session.query(db.func.max(WatchlistItem.id)).filter_by(user_id=user_id).scalar(),
+            "alert_id": db.session.query(db.func.max(PriceAlert.id)).filter_by(user_id=user_id).scalar(),
+        }
+
+
+def count_write(client, user_id, label):
+    """Make one WRITE_BUDGETS request; returns its statement count and statements"""
+    method, path, request_args, _ = WRITE_BUDGETS[label]
+    counts, statements = count_queries(
+        client, path.format(**newest_ids(user_id)), requests=1, method=method, request_args=request_args
+    )
+    return counts[0], statements
+
+
+def main():
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ.setdefault("SIM_PROVIDER_LATENCY", "0")
+
+    from benchmarks import simulated_provider
+    simulated_provider.install()
+
+    create_app({"WTF_CSRF_ENABLED": False, "QUOTE_STREAM_ENABLED": True})
+    with app.app_context():
+        upgrade_database()
+    refresh_quotes(SYMBOLS)
+
+    client = app.test_client()
+    user_id = seed(client)
+
+    failures = 0
+    print(f"{'route':<40} {'first':>6} {'repeat':>7} {'budget':>7}")
+    for path, budget in BUDGETS.items():
+        counts, statements = count_queries(client, path)
+        ok = max(counts) <= budget
+        failures += not ok
+        print(f"{path:<40} {counts[0]:>6} {counts[1]:>7} {budget:>7}{'' if ok else '  FAIL'}")
+        if not ok and os.environ.get("VERBOSE"):
+            print("\n".join("    " + " ".join(s.split()) for s in statements))
+
+    for label, (method, path, _, budget) in WRITE_BUDGETS.items():
+        count, statements = count_write(client, user_id, label)
+        ok = count <= budget
+        failures += not ok
+        print(f"{method + ' ' + label:<40} {count:>6} {'':>7} {budget:>7}{'' if ok else '  FAIL'}")
+        if not ok and os.environ.get("VERBOSE"):
+            print("\n".join("    " + " ".join(s.split()) for s in statements))
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Compare rendering reports to a temp file against rendering them in memory.
+
+Renders the PDF and Excel reports for synthetic portfolios of 10 and 10,000
+holdings both ways: to a temp file that is then read back for the response
+(as send_file did), and into memory. Reports the median latency and the
+bytes this process read and wrote through system calls (rchar/wchar from
+/proc/self/io, Linux only) per report.
+
+Usage: python benchmarks/report_rendering.py [--runs 5]
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from report_generator import generate_monthly_report_pdf, generate_monthly_report_excel  # noqa: E402
+
+RENDERERS = {
+    'pdf': (generate_monthly_report_pdf, 'pdf'),
+    'excel': (generate_monthly_report_excel, 'xlsx'),
+}
+
+
+def make_report_data(rows):
+    portfolio = []
+    for i in range(rows):
+        quantity = random.randint(1, 500)
+        buy_price = random.uniform(10, 5000)
+        current_price = buy_price * random.uniform(0.5, 1.5)
+        portfolio.append({
+            'symbol': f"SYM{i}",
+            'quantity': quantity,
+            'buy_price': buy_price,
+            'current_price': current_price,
+            'investment': quantity * buy_price,
+            'current_value': quantity * current_price,
+            'gain_loss': quantity * (current_price - buy_price),
+            'gain_loss_percent': (current_price - buy_price) / buy_price * 100,
+        })
+    total_investment = sum(item['investment'] for item in portfolio)
+    total_current_value = sum(item['current_value'] for item in portfolio)
+    return {
+        'username': 'bench',
+        'month': 'January',
+        'year': '2026',
+        'total_investment': total_investment,
+        'total_current_value': total_current_value,
+        'net_gain_loss': total_current_value - total_investment,
+        'net_gain_loss_percent': (total_current_value - total_investment) / total_investment * 100,
+        'portfolio': portfolio,
+        'top_gainer': {'symbol': 'SYM0', 'gain_percent': 1.0},
+        'top_loser': {'symbol': 'SYM1', 'loss_percent': -1.0},
+    }
+
+
+def io_counters():
+    try:
+        with open('/proc/self/io') as f:
+            counters = dict(line.split(': ') for line in f.read().splitlines())
+        return int(counters['rchar']), int(counters['wchar'])
+    except OSError:
+        return 0, 0
+
+
+def via_temp_file(render, data, extension):
+    path = os.path.join(tempfile.gettempdir(), f"bench_report_{os.getpid()}.{extension}")
+    if not render(data, path):
+        return None
+    with open(path, 'rb') as f:
+        content = f.read()
+    os.remove(path)
+    return content
+
+
+def in_memory(render, data, extension):
+    return render(data)
+
+
+def measure(method, render, data, extension, runs):
+    timings = []
+    read = written = size = 0
+    for _ in range(runs):
+        before = io_counters()
+        started = time.perf_counter()
+        content = method(render, data, extension)
+        timings.append((time.perf_counter() - started) * 1000)
+        after = io_counters()
+        if not content:
+            return None
+        read += after[0] - before[0]
+        written += after[1] - before[1]
+        size = len(content)
+    return statistics.median(timings), read // runs, written // runs, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    # Keep the renderers' per-report log lines out of the counters and the table
+    logging.disable(logging.INFO)
+
+    print(f"{'report':<7} {'rows':>6} {'method':<10} {'median ms':>10} {'read B':>10} {'written B':>10} {'size B':>10}")
+    for rows in (10, 10000):
+        data = make_report_data(rows)
+        runs = args.runs if rows <= 1000 else max(1, args.runs // 2)
+        for name, (render, extension) in RENDERERS.items():
+            for label, method in (('temp file', via_temp_file), ('in memory', in_memory)):
+                result = measure(method, render, data, extension, runs)
+                if result is None:
+                    print(f"{name:<7} {rows:>6} {label:<10} {'renderer failed':>10}")
+                    continue
+                ms, read, written, size = result
+                print(f"{name:<7} {rows:>6} {label:<10} {ms:>10.1f} {read:>10} {written:>10} {size:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""
+WSGI entry point that serves the app against the simulated provider.
+
+Usage: gunicorn -c gunicorn_config.py benchmarks.sim_app:app
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import simulated_provider
+
+simulated_provider.install()
+
+import stock_utils  # noqa: E402
+
+# Benchmarks can shorten the quote cache TTL so requests keep reaching the provider
+if "SIM_QUOTE_CACHE_TTL" in os.environ:
+    stock_utils.QUOTE_CACHE_TTL = float(os.environ["SIM_QUOTE_CACHE_TTL"])
+
+from app import create_app  # noqa: E402
+
+# Benchmark clients post forms without scraping CSRF tokens
+app = create_app({"WTF_CSRF_ENABLED": False})
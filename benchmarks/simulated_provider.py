@@ -0,0 +1,72 @@
+"""
+Simulated market-data provider for benchmarks.
+
+Replaces yfinance's download() and Ticker().history() with functions that
+sleep for a configurable latency and return random-walk price frames, so
+the app can be load-tested without touching the network.
+
+The sleep is the unpatched time.sleep even under gevent, because yfinance's
+real transport (curl_cffi) blocks in C where gevent cannot switch greenlets.
+"""
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+import yfinance as yf
+
+try:
+    from gevent.monkey import get_original
+    _blocking_sleep = get_original('time', 'sleep')
+except ImportError:
+    _blocking_sleep = time.sleep
+
+# Simulated upstream latency per call, in seconds
+LATENCY = float(os.environ.get("SIM_PROVIDER_LATENCY", "0.2"))
+
+_prices = {}
+
+
+def _frame(ticker_symbol, rows):
+    """Build an OHLCV frame ending today for a ticker, moving its price a little"""
+    symbol = ticker_symbol.split('.')[0]
+    price = _prices.get(symbol, random.uniform(100, 3000))
+    _prices[symbol] = price * random.uniform(0.995, 1.005)
+
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    index = pd.DatetimeIndex([today - timedelta(days=rows - 1 - i) for i in range(rows)])
+    closes = [price * (1 + 0.01 * (i - rows + 1)) for i in range(rows - 1)] + [_prices[symbol]]
+    return pd.DataFrame({
+        'Open': closes,
+        'High': closes,
+        'Low': closes,
+        'Close': closes,
+        'Volume': [100000] * rows
+    }, index=index)
+
+
+def _rows_for_period(period):
+    return {'1d': 1, '2d': 2, '5d': 5, '1wk': 5, '1mo': 22, '3mo': 66, '6mo': 132, '1y': 252}.get(period, 22)
+
+
+def download(tickers, period='1mo', **kwargs):
+    _blocking_sleep(LATENCY)
+    if isinstance(tickers, str):
+        tickers = tickers.split()
+    return pd.concat({t: _frame(t, _rows_for_period(period)) for t in tickers}, axis=1)
+
+
+class Ticker:
+    def __init__(self, ticker_symbol):
+        self.ticker_symbol = ticker_symbol
+
+    def history(self, period='1mo', **kwargs):
+        _blocking_sleep(LATENCY)
+        return _frame(self.ticker_symbol, _rows_for_period(period))
+
+
+def install():
+    """Patch yfinance in this process to use the simulated provider"""
+    yf.download = download
+    yf.Ticker = Ticker
@@ -0,0 +1,124 @@
+"""
+Compare mixed read/write throughput on SQLite with and without the tuned profile.
+
+Starts gunicorn with several sync workers against one SQLite file. Client
+threads then mix portfolio reads (GET /api/portfolio) with full-snapshot
+writes (POST /api/portfolio/sync, which deletes and inserts lots). The run
+is repeated with SQLite's defaults (rollback journal, synchronous=FULL,
+5s busy timeout, no mmap, 2MB cache) and with the profile from
+db_profiles.py (WAL, synchronous=NORMAL, longer busy timeout, mmap and a
+larger cache).
+
+Usage: python benchmarks/sqlite_concurrency.py [--clients 16] [--write-ratio 0.3] [--duration 15]
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.dashboard_load import SYMBOLS, start_server, create_user  # noqa: E402
+
+PROFILES = {
+    "sqlite defaults": {
+        "SQLITE_JOURNAL_MODE": "DELETE",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_BUSY_TIMEOUT_MS": "5000",
+        "SQLITE_MMAP_SIZE": "0",
+        "SQLITE_CACHE_SIZE_KB": "2000",
+    },
+    "tuned profile": {},
+}
+
+
+def snapshot(account, version):
+    """One of two alternating 20-lot snapshots for an account, so every sync writes"""
+    rng = random.Random(account * 2 + version)
+    return [
+        {"symbol": rng.choice(SYMBOLS), "quantity": rng.randint(1, 100), "buy_price": rng.randint(100, 5000)}
+        for _ in range(20)
+    ]
+
+
+def client(opener, base_url, account, write_ratio, stop_at, results):
+    version = 0
+    while time.perf_counter() < stop_at:
+        write = random.random() < write_ratio
+        started = time.perf_counter()
+        try:
+            if write:
+                version ^= 1
+                body = json.dumps({"lots": snapshot(account, version)}).encode()
+                request = urllib.request.Request(
+                    base_url + "/api/portfolio/sync", body, {"Content-Type": "application/json"}
+                )
+                opener.open(request, timeout=60).read()
+            else:
+                opener.open(base_url + "/api/portfolio", timeout=60).read()
+            results.append((write, time.perf_counter() - started, True))
+        except (urllib.error.HTTPError, OSError):
+            results.append((write, time.perf_counter() - started, False))
+
+
+def run(profile_env, args):
+    saved = {key: os.environ.get(key) for key in profile_env}
+    os.environ.update(profile_env, SIM_PROVIDER_LATENCY="0")
+    try:
+        process, base_url = start_server("sync", args.workers, args.port, 120)
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    try:
+        openers = [create_user(base_url, index) for index in range(args.clients)]
+        results = []
+        stop_at = time.perf_counter() + args.duration
+        threads = [
+            threading.Thread(target=client, args=(openers[i], base_url, i, args.write_ratio, stop_at, results))
+            for i in range(args.clients)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait()
+
+    summary = {}
+    for kind, is_write in (("reads", False), ("writes", True)):
+        ok = sorted(seconds for write, seconds, success in results if write == is_write and success)
+        failed = sum(1 for write, _, success in results if write == is_write and not success)
+        p95 = statistics.quantiles(ok, n=20)[-1] if len(ok) >= 20 else float("nan")
+        summary[kind] = (len(ok) / args.duration, statistics.median(ok) if ok else float("nan"), p95, failed)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--write-ratio", type=float, default=0.3)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--port", type=int, default=5058)
+    args = parser.parse_args()
+
+    print(f"{'profile':<16} {'kind':<7} {'ops/s':>7} {'p50 (ms)':>9} {'p95 (ms)':>9} {'errors':>7}")
+    for name, profile_env in PROFILES.items():
+        for kind, (rate, p50, p95, failed) in run(profile_env, args).items():
+            print(f"{name:<16} {kind:<7} {rate:>7.1f} {p50 * 1000:>9.1f} {p95 * 1000:>9.1f} {failed:>7}")
+
+
+if __name__ == "__main__":
+    main()
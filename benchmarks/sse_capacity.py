@@ -0,0 +1,144 @@
+"""
+Measure how many /stream/quotes connections one gevent worker can hold.
+
+Starts gunicorn with gunicorn_config.py and a single worker against the
+simulated provider, logs in a user with a few watchlist symbols, then opens
+streams in steps. For each step it reports how many streams received their
+first quotes event, the time to that event and the worker's resident memory.
+
+Usage: python benchmarks/sse_capacity.py [--steps 100,250,500,1000] [--port 5055]
+"""
+import argparse
+import asyncio
+import os
+import re
+import resource
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SYMBOLS = ["RELIANCE", "TCS", "INFY", "HDFCBANK", "ITC", "SBIN", "LT", "WIPRO"]
+
+
+def start_server(port, worker_connections):
+    env = dict(
+        os.environ,
+        DATABASE_URL="sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db"),
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        GUNICORN_WORKERS="1",
+        GUNICORN_WORKER_CONNECTIONS=str(worker_connections),
+        SIM_PROVIDER_LATENCY=os.environ.get("SIM_PROVIDER_LATENCY", "0.2"),
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn_config.py", "benchmarks.sim_app:app"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(base_url + "/login", timeout=1)
+            return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("gunicorn did not start")
+
+
+def login_with_watchlist(base_url):
+    """Register a user, log in and add the benchmark symbols; returns the session cookie header"""
+    jar = CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+
+    def post(path, **fields):
+        opener.open(base_url + path, urllib.parse.urlencode(fields).encode())
+
+    post("/register", username="streambench", email="streambench@example.com", password="benchpass", confirm_password="benchpass")
+    post("/login", username="streambench", password="benchpass")
+    for symbol in SYMBOLS:
+        post("/watchlist/add", symbol=symbol, exchange="NSE", notes="")
+    return "; ".join(f"{cookie.name}={cookie.value}" for cookie in jar)
+
+
+def worker_rss_mb(master_pid):
+    """Resident memory of the master's worker children, in MB"""
+    total_kb = 0
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/status") as status:
+                text = status.read()
+        except OSError:
+            continue
+        if re.search(rf"^PPid:\s+{master_pid}$", text, re.M):
+            match = re.search(r"^VmRSS:\s+(\d+) kB", text, re.M)
+            total_kb += int(match.group(1)) if match else 0
+    return total_kb / 1024
+
+
+async def open_stream(port, cookie, timeout):
+    """Open one stream and wait for its first quotes event; returns (writer, seconds) or None"""
+    started = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), timeout)
+        writer.write(
+            f"GET /stream/quotes HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept: text/event-stream\r\nCookie: {cookie}\r\n\r\n".encode()
+        )
+        await writer.drain()
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout)
+            if not line:
+                writer.close()
+                return None
+            if line.startswith(b"event: quotes"):
+                return writer, time.perf_counter() - started
+    except (OSError, asyncio.TimeoutError):
+        return None
+
+
+async def run(port, cookie, steps, master_pid, timeout):
+    held = []
+    print(f"{'target':>8} {'held':>8} {'p50 first event (s)':>20} {'p95 (s)':>8} {'worker RSS (MB)':>16}")
+    for target in steps:
+        results = await asyncio.gather(*[open_stream(port, cookie, timeout) for _ in range(target - len(held))])
+        latencies = [seconds for result in results if result for seconds in [result[1]]]
+        held += [result[0] for result in results if result]
+        p50 = statistics.median(latencies) if latencies else float("nan")
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) >= 20 else float("nan")
+        print(f"{target:>8} {len(held):>8} {p50:>20.3f} {p95:>8.3f} {worker_rss_mb(master_pid):>16.1f}")
+        if len(held) < target:
+            print("Worker stopped accepting streams; capacity reached")
+            break
+    for writer in held:
+        writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", default="100,250,500,1000")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    steps = [int(step) for step in args.steps.split(",")]
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, max(steps) * 2 + 256)), hard))
+
+    process, base_url = start_server(args.port, max(steps) + 50)
+    try:
+        cookie = login_with_watchlist(base_url)
+        asyncio.run(run(args.port, cookie, steps, process.pid, args.timeout))
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait()
+
+
+if __name__ == "__main__":
+    main()
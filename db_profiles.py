@@ -0,0 +1,82 @@
+"""
+SQLAlchemy engine profiles for the supported databases.
+
+SQLite is tuned for several gunicorn workers sharing one database file: WAL
+journaling lets readers run alongside a writer, and a busy timeout makes
+writers wait for the lock instead of failing with "database is locked".
+PostgreSQL gets a sized connection pool and a statement timeout.
+
+Every setting can be overridden from the environment.
+"""
+import os
+import sqlite3
+
+# SQLite pragmas applied to every new connection
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "15000"))
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get("SQLITE_CACHE_SIZE_KB", "65536"))
+
+# Connections are cheap for SQLite, but keeping them pooled keeps their pragmas and page cache
+SQLITE_POOL_SIZE = int(os.environ.get("SQLITE_POOL_SIZE", "10"))
+SQLITE_MAX_OVERFLOW = int(os.environ.get("SQLITE_MAX_OVERFLOW", "20"))
+
+# PostgreSQL pool, per worker process
+POSTGRES_POOL_SIZE = int(os.environ.get("POSTGRES_POOL_SIZE", "10"))
+POSTGRES_MAX_OVERFLOW = int(os.environ.get("POSTGRES_MAX_OVERFLOW", "10"))
+POSTGRES_POOL_TIMEOUT = int(os.environ.get("POSTGRES_POOL_TIMEOUT", "30"))
+POSTGRES_STATEMENT_TIMEOUT_MS = int(os.environ.get("POSTGRES_STATEMENT_TIMEOUT_MS", "30000"))
+
+
+def engine_options(database_url):
+    """
+    Get SQLALCHEMY_ENGINE_OPTIONS suited to the database in a URL.
+
+    Args:
+        database_url: SQLAlchemy database URL
+
+    Returns:
+        dict: Keyword arguments for create_engine
+    """
+    if database_url.startswith("sqlite"):
+        # The pysqlite busy handler waits this long for a lock before raising
+        options = {"connect_args": {"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}}
+        if database_url in ("sqlite://", "sqlite:///:memory:"):
+            # In-memory databases use a connection per thread, not a sized pool
+            return options
+        options.update(pool_size=SQLITE_POOL_SIZE, max_overflow=SQLITE_MAX_OVERFLOW)
+        return options
+
+    if database_url.startswith("postgres"):
+        return {
+            "pool_size": POSTGRES_POOL_SIZE,
+            "max_overflow": POSTGRES_MAX_OVERFLOW,
+            "pool_timeout": POSTGRES_POOL_TIMEOUT,
+            "pool_recycle": 300,
+            "pool_pre_ping": True,
+            "connect_args": {"options": f"-c statement_timeout={POSTGRES_STATEMENT_TIMEOUT_MS}"},
+        }
+
+    return {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Engine 'connect' listener: tune each new SQLite connection"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+
+    cursor = dbapi_connection.cursor()
+    try:
+        # journal_mode is stored in the database file; the rest are per connection
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        # A negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    finally:
+        cursor.close()
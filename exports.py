@@ -0,0 +1,123 @@
+"""
+Streaming CSV and NDJSON exports of a user's portfolio, watchlist and history.
+
+Portfolio and watchlist rows are read from the database in batches with
+yield_per and written out as they arrive, so an export uses constant memory
+however many rows it has and the download starts before the last row is
+read. The history export is the retained series, as in the Excel report:
+monthly and weekly rollups of compacted days, then the daily snapshots,
+each row labelled with its interval. Retention bounds it to a few hundred
+rows, so it is built in memory.
+"""
+import csv
+import io
+import json
+import logging
+from datetime import date, datetime
+
+from models import PortfolioItem, WatchlistItem
+from history_rollup import get_retained_history
+from user_data import get_user_data
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rows fetched from the database per round trip
+EXPORT_BATCH_SIZE = 1000
+
+# Rows written per chunk of the response body
+EXPORT_CHUNK_ROWS = 500
+
+
+def _retained_history_rows(user_id):
+    """The user's retained history as (date, interval, total_value, change_percent) rows, oldest first"""
+    return [
+        (point.date, tier, point.value, point.change_percent)
+        for tier, point in get_retained_history(user_id, get_user_data(user_id).history())
+    ]
+
+
+# Export name -> (columns, function returning the user's rows as tuples)
+EXPORTS = {
+    'portfolio': (
+        ['symbol', 'exchange', 'quantity', 'buy_price', 'investment', 'date_added'],
+        lambda user_id: PortfolioItem.query.with_entities(
+            PortfolioItem.symbol, PortfolioItem.exchange, PortfolioItem.quantity, PortfolioItem.buy_price,
+            PortfolioItem.quantity * PortfolioItem.buy_price, PortfolioItem.date_added
+        ).filter_by(user_id=user_id).order_by(PortfolioItem.id).yield_per(EXPORT_BATCH_SIZE)
+    ),
+    'watchlist': (
+        ['symbol', 'exchange', 'notes', 'date_added'],
+        lambda user_id: WatchlistItem.query.with_entities(
+            WatchlistItem.symbol, WatchlistItem.exchange, WatchlistItem.notes, WatchlistItem.date_added
+        ).filter_by(user_id=user_id).order_by(WatchlistItem.id).yield_per(EXPORT_BATCH_SIZE)
+    ),
+    'history': (
+        ['date', 'interval', 'total_value', 'change_percent'],
+        _retained_history_rows
+    ),
+}
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _export_value(value):
+    """Dates as ISO 8601 strings; everything else unchanged"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _csv_chunks(columns, rows):
+    """Yield a CSV header, then the rows in chunks of EXPORT_CHUNK_ROWS"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(_chunk_rows(row, rows, EXPORT_CHUNK_ROWS))
+        yield buffer.getvalue()
+
+
+def _chunk_rows(first, rows, size):
+    """Yield first, then up to size - 1 more rows from the iterator, as export values"""
+    yield [_export_value(value) for value in first]
+    for _, row in zip(range(size - 1), rows):
+        yield [_export_value(value) for value in row]
+
+
+def _ndjson_chunks(columns, rows):
+    """Yield one JSON object per row, in chunks of EXPORT_CHUNK_ROWS lines"""
+    for row in rows:
+        yield ''.join(
+            json.dumps(dict(zip(columns, chunk_row))) + '\n'
+            for chunk_row in _chunk_rows(row, rows, EXPORT_CHUNK_ROWS)
+        )
+
+
+def stream_export(name, export_format, user_id):
+    """
+    Generate the body of an export for a user, chunk by chunk.
+
+    Args:
+        name: Export name, a key of EXPORTS
+        export_format: 'csv' or 'ndjson'
+        user_id: ID of the user whose rows are exported
+
+    Returns:
+        generator: Text chunks of the export body
+    """
+    columns, get_rows = EXPORTS[name]
+    rows = iter(get_rows(user_id))
+    logger.info(f"Streaming {name} export as {export_format} for user {user_id}")
+
+    if export_format == 'csv':
+        return _csv_chunks(columns, rows)
+    return _ndjson_chunks(columns, rows)
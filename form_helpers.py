@@ -41,10 +41,15 @@ def get_field_label(field_name):
         'quantity': 'Quantity',
         'buy_price': 'Buy Price',
         'exchange': 'Exchange',
+        'csv_file': 'CSV File',
         
         # Watchlist form fields
         'notes': 'Notes',
         
+        # Price alert form fields
+        'alert_type': 'Alert Type',
+        'threshold': 'Threshold',
+        
         # Report form fields
         'report_type': 'Report Type'
     }
@@ -1,7 +1,8 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
 from wtforms import StringField, PasswordField, SubmitField, FloatField, TextAreaField, SelectField
-from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError
-from models import User
+from wtforms.validators import DataRequired, Email, EqualTo, Length, NumberRange, ValidationError
+from models import User, ALERT_TYPES
 
 class RegistrationForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired(), Length(min=3, max=20)])
@@ -32,6 +33,10 @@ class PortfolioItemForm(FlaskForm):
     exchange = SelectField('Exchange', choices=[('NSE', 'NSE'), ('BSE', 'BSE')], validators=[DataRequired()])
     submit = SubmitField('Add to Portfolio')
 
+class PortfolioImportForm(FlaskForm):
+    csv_file = FileField('CSV File', validators=[FileRequired(), FileAllowed(['csv'], 'Please upload a .csv file')])
+    submit = SubmitField('Import')
+
 class WatchlistItemForm(FlaskForm):
     symbol = StringField('Stock Symbol', validators=[DataRequired(), Length(max=20)])
     exchange = SelectField('Exchange', choices=[('NSE', 'NSE'), ('BSE', 'BSE')], validators=[DataRequired()])
@@ -42,6 +47,11 @@ class WatchlistNoteForm(FlaskForm):
     notes = TextAreaField('Notes')
     submit = SubmitField('Update Notes')
 
+class PriceAlertForm(FlaskForm):
+    alert_type = SelectField('Alert When', choices=ALERT_TYPES, validators=[DataRequired()])
+    threshold = FloatField('Threshold', validators=[DataRequired(), NumberRange(min=0.01)])
+    submit = SubmitField('Add Alert')
+
 class ReportGeneratorForm(FlaskForm):
     report_type = SelectField('Report Format', choices=[('pdf', 'PDF'), ('excel', 'Excel')], validators=[DataRequired()])
     submit = SubmitField('Generate Report')
@@ -0,0 +1,66 @@
+"""
+Gunicorn configuration for the asynchronous serving mode.
+
+Usage: gunicorn -c gunicorn_config.py main:app
+
+Uses gevent workers so a single worker can hold many long-lived connections,
+such as the /stream/quotes Server-Sent Events endpoint, and enables quote
+streaming in the app. Every setting can be overridden from the environment.
+
+Blocking market-data calls run in each worker's native thread pool (see
+stock_utils._provider_call); PROVIDER_THREADS sets its size. Pending
+database migrations are applied once when the master starts, and each
+worker warms its quote cache from the quote table.
+
+Workers record Prometheus metrics to files in PROMETHEUS_MULTIPROC_DIR so
+/metrics reports all of them together (see metrics.py); the directory is
+emptied when the master starts.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("GUNICORN_WORKERS", "2"))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gevent")
+
+# Maximum simultaneous connections (including open quote streams) per worker
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", "1000"))
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+
+raw_env = ["QUOTE_STREAM_ENABLED=1"]
+
+# Set before any worker imports prometheus_client, which reads it on import
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "portfolio_metrics"))
+
+
+def on_starting(server):
+    """Apply pending database migrations once, before any worker starts"""
+    # Samples left by a previous server would be added to this one's
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+    # Run in a subprocess so the master doesn't import the app before workers
+    # apply gevent's monkey patching
+    subprocess.run(
+        [sys.executable, "-m", "flask", "--app", "main", "upgrade-db"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+    )
+
+
+def post_worker_init(worker):
+    """Serve last-known prices from the quote table while the worker's first fetches load"""
+    from quote_store import warm_quote_cache
+    warm_quote_cache()
+
+
+def child_exit(server, worker):
+    """Drop an exited worker's live gauge samples from the metrics"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
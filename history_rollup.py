@@ -0,0 +1,277 @@
+"""
+Tiered retention for portfolio history.
+
+Daily snapshots are kept for DAILY_RETENTION_DAYS. Older ones are compacted
+into weekly and monthly rollups (open, close, min and max value), weekly
+rollups are kept for WEEKLY_RETENTION_DAYS and monthly rollups indefinitely,
+so each user's history stays at a few hundred rows however old the account.
+
+Performance charts read the tier matching the requested range: daily rows
+for up to a year, weekly points for up to five years and monthly beyond.
+Periods that are still (partly) held as daily rows are rolled up on the fly.
+"""
+import logging
+import os
+from collections import namedtuple
+from datetime import date, timedelta
+
+from app import app, db
+from models import PortfolioHistory, PortfolioHistoryWeekly, PortfolioHistoryMonthly
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Retention per tier, in days
+DAILY_RETENTION_DAYS = int(os.environ.get("HISTORY_DAILY_RETENTION_DAYS", "400"))
+WEEKLY_RETENTION_DAYS = int(os.environ.get("HISTORY_WEEKLY_RETENTION_DAYS", "1830"))
+
+# Compact a user's history once their oldest daily row is this far past the cutoff,
+# so compaction runs about monthly per user rather than every day
+COMPACTION_INTERVAL_DAYS = 30
+
+# Chart ranges in days; None is the user's whole history
+PERFORMANCE_RANGES = {
+    '1m': 31,
+    '3m': 92,
+    '1y': 366,
+    '5y': 1827,
+    'max': None,
+}
+DEFAULT_PERFORMANCE_RANGE = '1y'
+
+TIERS = {
+    'weekly': PortfolioHistoryWeekly,
+    'monthly': PortfolioHistoryMonthly,
+}
+
+# One point of a performance series; date is the period start for rollups
+SeriesPoint = namedtuple('SeriesPoint', ['date', 'value', 'change_percent'])
+
+
+def _period_start(day, tier):
+    """The Monday of the week, or first day of the month, containing a date"""
+    if tier == 'weekly':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def _merge(earlier, later):
+    """Combine two rollups of the same period, where earlier covers older days"""
+    return {
+        'open_value': earlier['open_value'],
+        'close_value': later['close_value'],
+        'min_value': min(earlier['min_value'], later['min_value']),
+        'max_value': max(earlier['max_value'], later['max_value']),
+        'days': earlier['days'] + later['days'],
+    }
+
+
+def _roll_up(daily_rows, tier):
+    """
+    Aggregate daily rows into rollups for a tier.
+
+    Args:
+        daily_rows: Objects with date and total_value, oldest first
+        tier: 'weekly' or 'monthly'
+
+    Returns:
+        dict: Rollup values keyed by period start, in date order
+    """
+    rollups = {}
+    for row in daily_rows:
+        value = row.total_value
+        rollup = {'open_value': value, 'close_value': value, 'min_value': value, 'max_value': value, 'days': 1}
+        key = _period_start(row.date, tier)
+        rollups[key] = _merge(rollups[key], rollup) if key in rollups else rollup
+    return rollups
+
+
+def get_daily_cutoff(today=None):
+    """The oldest date kept as daily rows"""
+    return (today or date.today()) - timedelta(days=DAILY_RETENTION_DAYS)
+
+
+def needs_compaction(oldest_daily_date, today=None):
+    """Whether a user's oldest daily row is far enough past the cutoff to compact"""
+    return oldest_daily_date < get_daily_cutoff(today) - timedelta(days=COMPACTION_INTERVAL_DAYS)
+
+
+def compact_user_history(user_id, today=None):
+    """
+    Roll daily rows older than the cutoff into weekly and monthly rollups,
+    delete them, and drop weekly rollups past their retention.
+
+    Runs in one transaction, so a failure leaves the history untouched.
+
+    Args:
+        user_id: ID of the user
+        today: Date to compute the cutoffs from (defaults to today)
+
+    Returns:
+        int: Number of daily rows compacted
+    """
+    today = today or date.today()
+    cutoff = get_daily_cutoff(today)
+    try:
+        daily_rows = db.session.query(PortfolioHistory.date, PortfolioHistory.total_value)\
+            .filter(PortfolioHistory.user_id == user_id, PortfolioHistory.date < cutoff)\
+            .order_by(PortfolioHistory.date).all()
+
+        if daily_rows:
+            for tier, model in TIERS.items():
+                rollups = _roll_up(daily_rows, tier)
+                existing = {
+                    rollup.period_start: rollup for rollup in model.query.filter(
+                        model.user_id == user_id, model.period_start.in_(list(rollups))
+                    )
+                }
+                for period_start, values in rollups.items():
+                    stored = existing.get(period_start)
+                    if stored is None:
+                        db.session.add(model(user_id=user_id, period_start=period_start, **values))
+                        continue
+                    # Days compacted earlier in this period are older than the new ones
+                    merged = _merge({column: getattr(stored, column) for column in values}, values)
+                    for column, value in merged.items():
+                        setattr(stored, column, value)
+
+            PortfolioHistory.query.filter(
+                PortfolioHistory.user_id == user_id,
+                PortfolioHistory.date < cutoff
+            ).delete(synchronize_session=False)
+
+        PortfolioHistoryWeekly.query.filter(
+            PortfolioHistoryWeekly.user_id == user_id,
+            PortfolioHistoryWeekly.period_start < today - timedelta(days=WEEKLY_RETENTION_DAYS)
+        ).delete(synchronize_session=False)
+
+        db.session.commit()
+        if daily_rows:
+            logger.info(f"Compacted {len(daily_rows)} daily history rows for user {user_id}")
+        return len(daily_rows)
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def compact_all_history(today=None):
+    """
+    Compact the history of every user with daily rows older than the cutoff.
+
+    Returns:
+        int: Number of daily rows compacted
+    """
+    user_ids = [row.user_id for row in db.session.query(PortfolioHistory.user_id)
+                .filter(PortfolioHistory.date < get_daily_cutoff(today)).distinct()]
+    compacted = 0
+    for user_id in user_ids:
+        try:
+            compacted += compact_user_history(user_id, today)
+        except Exception as e:
+            logger.error(f"Error compacting history for user {user_id}: {str(e)}")
+    return compacted
+
+
+def _tier_for(range_days):
+    if range_days <= DAILY_RETENTION_DAYS:
+        return 'daily'
+    if range_days <= WEEKLY_RETENTION_DAYS:
+        return 'weekly'
+    return 'monthly'
+
+
+def get_history_series(user_id, daily_rows, range_name=DEFAULT_PERFORMANCE_RANGE, today=None):
+    """
+    Get a user's portfolio value series for a chart range from the matching tier.
+
+    Args:
+        user_id: ID of the user
+        daily_rows: The user's daily snapshots, oldest first (e.g. UserData.history())
+        range_name: A key of PERFORMANCE_RANGES
+        today: Date the range ends on (defaults to today)
+
+    Returns:
+        tuple: (tier, SeriesPoints oldest first), where tier is 'daily', 'weekly' or 'monthly'
+    """
+    today = today or date.today()
+    range_days = PERFORMANCE_RANGES[range_name]
+    if range_days is None:
+        # Size the whole-history range by the oldest monthly rollup, if there is one
+        oldest = db.session.query(db.func.min(PortfolioHistoryMonthly.period_start))\
+            .filter(PortfolioHistoryMonthly.user_id == user_id).scalar()
+        range_days = (today - oldest).days if oldest else 0
+    start = today - timedelta(days=range_days) if range_name != 'max' else date.min
+
+    tier = _tier_for(range_days)
+    if tier == 'daily':
+        return tier, [
+            SeriesPoint(row.date, float(row.total_value or 0.0), float(row.daily_change_percent or 0.0))
+            for row in daily_rows if row.date >= start
+        ]
+
+    model = TIERS[tier]
+    first_period = _period_start(start, tier) if start > date.min else date.min
+    rollups = {
+        rollup.period_start: {column: getattr(rollup, column)
+                              for column in ('open_value', 'close_value', 'min_value', 'max_value', 'days')}
+        for rollup in model.query.filter(model.user_id == user_id, model.period_start >= first_period)
+        .order_by(model.period_start)
+    }
+    for period_start, values in _roll_up([row for row in daily_rows if row.date >= start], tier).items():
+        rollups[period_start] = _merge(rollups[period_start], values) if period_start in rollups else values
+
+    series = []
+    previous_close = None
+    for period_start in sorted(rollups):
+        values = rollups[period_start]
+        opening = previous_close if previous_close else values['open_value']
+        change_percent = (values['close_value'] - opening) / opening * 100 if opening else 0.0
+        series.append(SeriesPoint(period_start, float(values['close_value']), float(change_percent)))
+        previous_close = values['close_value']
+    return tier, series
+
+
+def get_retained_history(user_id, daily_rows):
+    """
+    Get every retained point of a user's history, at the finest interval kept for each date.
+
+    Monthly rollups come first up to the oldest weekly rollup, then weekly
+    rollups up to the oldest daily row, then the daily rows.
+
+    Args:
+        user_id: ID of the user
+        daily_rows: The user's daily snapshots, oldest first (e.g. UserData.history())
+
+    Returns:
+        list: (tier, SeriesPoint) tuples oldest first, where tier is 'daily', 'weekly' or 'monthly'
+    """
+    first_daily = daily_rows[0].date if daily_rows else date.max
+    weekly = PortfolioHistoryWeekly.query.filter(
+        PortfolioHistoryWeekly.user_id == user_id, PortfolioHistoryWeekly.period_start < first_daily
+    ).order_by(PortfolioHistoryWeekly.period_start).all()
+    first_weekly = weekly[0].period_start if weekly else first_daily
+    monthly = PortfolioHistoryMonthly.query.filter(
+        PortfolioHistoryMonthly.user_id == user_id, PortfolioHistoryMonthly.period_start < first_weekly
+    ).order_by(PortfolioHistoryMonthly.period_start).all()
+
+    points = []
+    previous_close = None
+    for tier, rollups in (('monthly', monthly), ('weekly', weekly)):
+        for rollup in rollups:
+            opening = previous_close if previous_close else rollup.open_value
+            change_percent = (rollup.close_value - opening) / opening * 100 if opening else 0.0
+            points.append((tier, SeriesPoint(rollup.period_start, float(rollup.close_value), float(change_percent))))
+            previous_close = rollup.close_value
+    points.extend(
+        ('daily', SeriesPoint(row.date, float(row.total_value or 0.0), float(row.daily_change_percent or 0.0)))
+        for row in daily_rows
+    )
+    return points
+
+
+@app.cli.command('compact-history')
+def compact_history_command():
+    """Roll old daily portfolio history into weekly and monthly rollups."""
+    compacted = compact_all_history()
+    logger.info(f"Compacted {compacted} daily history rows")
@@ -0,0 +1,57 @@
+"""
+Helper functions for HTTP conditional caching of JSON responses.
+"""
+import hashlib
+from datetime import datetime, timezone
+
+from flask import request, jsonify, Response
+
+
+def make_etag(*parts):
+    """
+    Build a strong ETag value from the values that identify a response body.
+    
+    Args:
+        parts: Values that change whenever the response body would change
+        
+    Returns:
+        str: A short hex digest, stable across worker processes
+    """
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:20]
+
+
+def conditional_json(build_body, etag, last_modified, max_age):
+    """
+    Return a JSON response, or an empty 304 if the client's copy is current.
+    
+    The body is only built and serialized when the validators don't match,
+    so a repeat poll costs a header exchange.
+    
+    Args:
+        build_body: Callable returning the JSON serializable body
+        etag: ETag value for the current body (see make_etag)
+        last_modified: Unix timestamp of the last change to the body
+        max_age: Seconds the client may reuse the response without revalidating
+        
+    Returns:
+        Response: A 200 JSON response or a 304 Not Modified response
+    """
+    last_modified = datetime.fromtimestamp(int(last_modified), tz=timezone.utc)
+    
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    elif request.if_modified_since:
+        not_modified = request.if_modified_since >= last_modified
+    else:
+        not_modified = False
+    
+    response = Response(status=304) if not_modified else jsonify(build_body())
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    
+    # Responses depend on the logged-in user, so only private caches may keep them
+    response.cache_control.private = True
+    response.cache_control.max_age = max(int(max_age), 0)
+    response.vary.add('Cookie')
+    return response
@@ -0,0 +1,26 @@
+"""
+Deferred imports for heavy libraries.
+
+yfinance and pandas alone take about half a second to import, and fpdf and
+openpyxl are only needed to render reports. Modules bind them with
+LazyModule so a cold start can serve pages like /login before any of them
+is loaded; the first attribute access imports the real module.
+"""
+import importlib
+
+
+class LazyModule:
+    """Stand-in for a module that imports it on first attribute access"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        # Only called for attributes not set on the stand-in itself
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        return f"<LazyModule {self._name}{'' if self._module is None else ' (loaded)'}>"
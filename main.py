@@ -1,4 +1,10 @@
-from app import app
+from app import create_app, upgrade_database
+from quote_store import warm_quote_cache
+
+app = create_app()
 
 if __name__ == "__main__":
+    with app.app_context():
+        upgrade_database()
+    warm_quote_cache()
     app.run(host="0.0.0.0", port=5000, debug=True)
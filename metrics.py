@@ -0,0 +1,148 @@
+"""
+Prometheus metrics for the app, served at /metrics.
+
+Records request latency per endpoint, database statements per request,
+market-data provider calls (count, latency and outcome by the stock_utils
+function making them), cache hits and misses, and report render times.
+
+Gunicorn workers are separate processes, each with its own counters, so
+gunicorn_config.py sets PROMETHEUS_MULTIPROC_DIR before they start: every
+process then writes its samples to files in that directory, and /metrics,
+whichever worker serves it, adds up all of them. The directory is emptied
+when the server starts. Without the variable (e.g. the development
+server) metrics are kept in memory for the one process.
+
+/metrics is served only when METRICS_TOKEN is set, to scrapers sending it
+as a bearer token (Prometheus: `authorization: {credentials: <token>}`).
+"""
+import hmac
+import logging
+import os
+import time
+
+from flask import g, has_request_context, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time to handle a request, by endpoint',
+    ['method', 'endpoint']
+)
+REQUESTS = Counter(
+    'http_requests_total', 'Requests handled, by endpoint and status',
+    ['method', 'endpoint', 'status']
+)
+DB_QUERIES = Histogram(
+    'db_queries_per_request', 'Database statements executed while handling a request, by endpoint',
+    ['endpoint'], buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+)
+UPSTREAM_CALLS = Counter(
+    'upstream_calls_total', 'Market-data provider calls, by function and outcome (ok, empty or error)',
+    ['function', 'outcome']
+)
+UPSTREAM_LATENCY = Histogram(
+    'upstream_call_duration_seconds', 'Market-data provider call time, by function',
+    ['function'], buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+CACHE_LOOKUPS = Counter(
+    'cache_lookups_total', 'Cache lookups, by cache and result (hit or miss)',
+    ['cache', 'result']
+)
+REPORT_RENDER = Histogram(
+    'report_render_duration_seconds', 'Time to render a report, by type',
+    ['report_type'], buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+
+
+def record_upstream_call(function, outcome, seconds):
+    """Count a market-data provider call made by a stock_utils function"""
+    UPSTREAM_CALLS.labels(function, outcome).inc()
+    UPSTREAM_LATENCY.labels(function).observe(seconds)
+
+
+def record_cache_lookup(cache, hits=0, misses=0):
+    """Count lookups in a cache; a batch lookup can record several at once"""
+    if hits:
+        CACHE_LOOKUPS.labels(cache, 'hit').inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(cache, 'miss').inc(misses)
+
+
+def time_report_render(report_type):
+    """Context manager that records how long rendering a report takes"""
+    return REPORT_RENDER.labels(report_type).time()
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_queries = 0
+
+
+def _record_request(response):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return response
+    # Endpoint names rather than paths, so URLs with IDs don't each get a series
+    endpoint = request.endpoint or 'unmatched'
+    REQUEST_LATENCY.labels(request.method, endpoint).observe(time.perf_counter() - started)
+    REQUESTS.labels(request.method, endpoint, str(response.status_code)).inc()
+    DB_QUERIES.labels(endpoint).observe(g.pop('metrics_queries', 0))
+    return response
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'metrics_queries' in g:
+        g.metrics_queries += 1
+
+
+def init_app(app):
+    """
+    Record request metrics for the app.
+
+    Call before other request hooks are registered, so the latency covers
+    them and the recorded status is the one finally sent.
+
+    Args:
+        app: The Flask application
+    """
+    app.before_request(_start_request)
+    app.after_request(_record_request)
+    event.listen(Engine, "before_cursor_execute", _count_query)
+
+
+def scrape_authorized(authorization, token):
+    """
+    Check a scrape's Authorization header against the configured bearer token.
+
+    Args:
+        authorization: The request's Authorization header
+        token: METRICS_TOKEN
+
+    Returns:
+        bool: Whether the header is "Bearer <token>"
+    """
+    scheme, _, credentials = authorization.partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(credentials.strip().encode(), token.encode())
+
+
+def render_metrics():
+    """
+    Render every metric in the Prometheus text format.
+
+    Returns:
+        tuple: (body, content type)
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        # Add up the samples every process has written, including workers since restarted
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -1,3 +1,5 @@
+import hashlib
+import secrets
 from datetime import datetime
 from app import db
 from flask_login import UserMixin
@@ -8,12 +10,18 @@ class User(UserMixin, db.Model):
     username = db.Column(db.String(64), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
+    # SHA-256 of the user's API token, for scripts calling the sync API
+    api_token_hash = db.Column(db.String(64), unique=True, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
     portfolio_items = db.relationship('PortfolioItem', backref='owner', lazy='dynamic', cascade='all, delete-orphan')
     watchlist_items = db.relationship('WatchlistItem', backref='owner', lazy='dynamic', cascade='all, delete-orphan')
     portfolio_history = db.relationship('PortfolioHistory', backref='owner', lazy='dynamic', cascade='all, delete-orphan')
+    weekly_history = db.relationship('PortfolioHistoryWeekly', backref='owner', lazy='dynamic', cascade='all, delete-orphan')
+    monthly_history = db.relationship('PortfolioHistoryMonthly', backref='owner', lazy='dynamic', cascade='all, delete-orphan')
+    price_alerts = db.relationship('PriceAlert', backref='owner', lazy='dynamic', cascade='all, delete-orphan')
+    report_jobs = db.relationship('ReportJob', backref='owner', lazy='dynamic', cascade='all, delete-orphan')
 
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
@@ -21,10 +29,21 @@ class User(UserMixin, db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+    def set_api_token(self):
+        """Replace the user's API token with a new one and return it; only its hash is stored"""
+        token = secrets.token_urlsafe(32)
+        self.api_token_hash = hash_api_token(token)
+        return token
+
     def __repr__(self):
         return f'<User {self.username}>'
 
 
+def hash_api_token(token):
+    """Hash an API token for storage and lookup; tokens are random, so no salt is needed"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
 class PortfolioItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     symbol = db.Column(db.String(20), nullable=False)
@@ -34,6 +53,10 @@ class PortfolioItem(db.Model):
     date_added = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
+    __table_args__ = (
+        db.Index('ix_portfolio_item_user_id_symbol', 'user_id', 'symbol'),
+    )
+    
     def __repr__(self):
         return f'<PortfolioItem {self.symbol}>'
 
@@ -46,6 +69,12 @@ class WatchlistItem(db.Model):
     date_added = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
+    alerts = db.relationship('PriceAlert', backref='watchlist_item', lazy='dynamic', cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        db.Index('ix_watchlist_item_user_id_symbol', 'user_id', 'symbol'),
+    )
+    
     def __repr__(self):
         return f'<WatchlistItem {self.symbol}>'
 
@@ -58,5 +87,108 @@ class PortfolioHistory(db.Model):
     daily_change = db.Column(db.Float)
     daily_change_percent = db.Column(db.Float)
     
+    # One snapshot per user per day; also serves the history queries by user and date
+    __table_args__ = (
+        db.Index('uq_portfolio_history_user_id_date', 'user_id', 'date', unique=True),
+    )
+    
     def __repr__(self):
         return f'<PortfolioHistory {self.date}>'
+
+
+# Older daily snapshots are compacted into weekly and monthly rollups (see history_rollup)
+class PortfolioHistoryWeekly(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    period_start = db.Column(db.Date, nullable=False)  # Monday of the week
+    open_value = db.Column(db.Float, nullable=False)
+    close_value = db.Column(db.Float, nullable=False)
+    min_value = db.Column(db.Float, nullable=False)
+    max_value = db.Column(db.Float, nullable=False)
+    days = db.Column(db.Integer, nullable=False)  # daily snapshots rolled up
+    
+    __table_args__ = (
+        db.Index('uq_portfolio_history_weekly_user_id_period_start', 'user_id', 'period_start', unique=True),
+    )
+    
+    def __repr__(self):
+        return f'<PortfolioHistoryWeekly {self.period_start}>'
+
+
+class PortfolioHistoryMonthly(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    period_start = db.Column(db.Date, nullable=False)  # first day of the month
+    open_value = db.Column(db.Float, nullable=False)
+    close_value = db.Column(db.Float, nullable=False)
+    min_value = db.Column(db.Float, nullable=False)
+    max_value = db.Column(db.Float, nullable=False)
+    days = db.Column(db.Integer, nullable=False)  # daily snapshots rolled up
+    
+    __table_args__ = (
+        db.Index('uq_portfolio_history_monthly_user_id_period_start', 'user_id', 'period_start', unique=True),
+    )
+    
+    def __repr__(self):
+        return f'<PortfolioHistoryMonthly {self.period_start}>'
+
+
+# Price alert types: price thresholds, or an absolute daily percent change
+ALERT_TYPES = [
+    ('above', 'Price rises above'),
+    ('below', 'Price falls below'),
+    ('percent_move', 'Daily move exceeds (%)')
+]
+
+class PriceAlert(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    watchlist_item_id = db.Column(db.Integer, db.ForeignKey('watchlist_item.id'), nullable=False)
+    symbol = db.Column(db.String(20), nullable=False)
+    alert_type = db.Column(db.String(20), nullable=False)
+    threshold = db.Column(db.Float, nullable=False)
+    is_active = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    triggered_at = db.Column(db.DateTime)
+    triggered_price = db.Column(db.Float)
+    triggered_change_percent = db.Column(db.Float)
+    
+    __table_args__ = (
+        db.Index('ix_price_alert_user_id_triggered_at', 'user_id', 'triggered_at'),
+    )
+    
+    def __repr__(self):
+        return f'<PriceAlert {self.symbol} {self.alert_type} {self.threshold}>'
+
+
+# Last known quote per symbol, shared by every worker and kept across restarts (see quote_store)
+class Quote(db.Model):
+    symbol = db.Column(db.String(20), primary_key=True)
+    price = db.Column(db.Float, nullable=False)
+    previous_close = db.Column(db.Float)
+    as_of = db.Column(db.DateTime, nullable=False)
+    source = db.Column(db.String(20), nullable=False)
+    
+    def __repr__(self):
+        return f'<Quote {self.symbol} {self.price}>'
+
+
+# A report generated in the background (see report_jobs): queued -> running -> done or failed
+class ReportJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)  # random hex, so ids can't be guessed
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    report_type = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    error = db.Column(db.Text)
+    file_path = db.Column(db.String(500))
+    download_name = db.Column(db.String(200))
+    
+    __table_args__ = (
+        db.Index('ix_report_job_user_id_created_at', 'user_id', 'created_at'),
+    )
+    
+    def __repr__(self):
+        return f'<ReportJob {self.id} {self.report_type} {self.status}>'
@@ -0,0 +1,244 @@
+"""
+Streaming import of portfolio lots from broker CSV exports.
+
+Two layouts are recognised from the header row:
+
+- Holdings exports (Symbol/Instrument, Quantity/Qty, Avg. cost/Buy Price),
+  one lot per row.
+- Tradebooks (symbol, trade_type, quantity, price, trade_date), one lot per
+  buy trade. Sell trades are reported and skipped.
+
+Rows are read one at a time and inserted in batches, so memory use stays flat
+however large the file is. Symbols are checked against the known symbols
+(see get_known_symbols) instead of fetching a price for each row.
+"""
+import csv
+import io
+import logging
+import math
+from datetime import datetime
+
+from sqlalchemy import select, union
+
+from app import db
+from models import PortfolioItem, Quote
+from stock_utils import get_instrument_symbols
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rows inserted per executemany batch
+IMPORT_BATCH_SIZE = 2000
+
+# Per-row errors kept for the report; later errors are only counted
+MAX_REPORTED_ERRORS = 200
+
+EXCHANGES = ('NSE', 'BSE')
+
+# Normalized header name -> field, for both holdings and tradebook layouts.
+# When several headers map to one field, the one listed first here wins.
+COLUMN_ALIASES = {
+    'symbol': 'symbol',
+    'instrument': 'symbol',
+    'tradingsymbol': 'symbol',
+    'scrip': 'symbol',
+    'quantity': 'quantity',
+    'qty': 'quantity',
+    'buy price': 'buy_price',
+    'buy_price': 'buy_price',
+    'avg cost': 'buy_price',
+    'average price': 'buy_price',
+    'avg price': 'buy_price',
+    'price': 'buy_price',
+    'exchange': 'exchange',
+    'trade_type': 'trade_type',
+    'trade type': 'trade_type',
+    'trade_date': 'trade_date',
+    'trade date': 'trade_date',
+}
+
+
+class ImportResult:
+    """Counts and per-row errors from one import"""
+
+    def __init__(self):
+        self.imported = 0
+        self.skipped = 0
+        self.error_count = 0
+        self.errors = []  # (line number, message)
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def _map_columns(header):
+    """Map header positions to fields; raises ValueError if required columns are missing"""
+    aliases = list(COLUMN_ALIASES)
+    columns = {}
+    ranks = {}
+    for index, name in enumerate(header):
+        alias = name.strip().lower().replace('.', '')
+        field = COLUMN_ALIASES.get(alias)
+        if field and (field not in columns or aliases.index(alias) < ranks[field]):
+            columns[field] = index
+            ranks[field] = aliases.index(alias)
+
+    missing = [field for field in ('symbol', 'quantity', 'buy_price') if field not in columns]
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+    return columns
+
+
+def normalize_symbol(raw, exchange):
+    """Strip exchange and series suffixes (RELIANCE.NS, RELIANCE-EQ); returns (symbol, exchange)"""
+    symbol = raw.strip().upper()
+    if symbol.endswith('.NS'):
+        return symbol[:-3], 'NSE'
+    if symbol.endswith('.BO'):
+        return symbol[:-3], 'BSE'
+    if symbol.endswith(('-EQ', '-BE')):
+        symbol = symbol[:-3]
+    return symbol, exchange
+
+
+def get_known_symbols():
+    """
+    Get the symbols lots may use, without a price fetch per symbol.
+
+    The instrument list is only a short list of large caps unless
+    INSTRUMENTS_FILE points at a full exchange list, so symbols already held
+    in any portfolio (the add form checks them for a price) or with a stored
+    quote are accepted too. Those come from one query.
+
+    Returns:
+        frozenset: Symbols without exchange or series suffixes
+    """
+    seen = db.session.execute(union(select(PortfolioItem.symbol), select(Quote.symbol))).scalars()
+    return get_instrument_symbols() | {normalize_symbol(symbol, 'NSE')[0] for symbol in seen}
+
+
+def normalize_lot(symbol, quantity, buy_price, exchange, known_symbols):
+    """
+    Validate one lot and return its PortfolioItem column values.
+    
+    Args:
+        symbol: Symbol, optionally with a .NS/.BO or series suffix
+        quantity: Quantity as a number or numeric string
+        buy_price: Buy price as a number or numeric string
+        exchange: NSE or BSE; empty means NSE
+        known_symbols: Set of valid symbols (see get_known_symbols)
+        
+    Returns:
+        dict: symbol, quantity, buy_price and exchange
+        
+    Raises:
+        ValueError: With a readable message if the lot is invalid
+    """
+    exchange = (str(exchange or '').strip() or 'NSE').upper()
+    if exchange not in EXCHANGES:
+        raise ValueError(f"Unknown exchange '{exchange}'")
+
+    symbol, exchange = normalize_symbol(str(symbol or ''), exchange)
+    if not symbol:
+        raise ValueError("Symbol is empty")
+    if len(symbol) > 20:
+        raise ValueError(f"Symbol '{symbol}' is too long")
+    if symbol not in known_symbols:
+        raise ValueError(f"Unknown symbol '{symbol}'")
+
+    try:
+        quantity = float(str(quantity).replace(',', ''))
+        buy_price = float(str(buy_price).replace(',', ''))
+    except ValueError:
+        raise ValueError("Quantity and price must be numbers")
+    if not (math.isfinite(quantity) and math.isfinite(buy_price)):
+        raise ValueError("Quantity and price must be numbers")
+    if quantity <= 0:
+        raise ValueError("Quantity must be greater than zero")
+    if buy_price <= 0:
+        raise ValueError("Buy price must be greater than zero")
+
+    return {'symbol': symbol, 'quantity': quantity, 'buy_price': buy_price, 'exchange': exchange}
+
+
+def _parse_row(row, columns, known_symbols):
+    """Turn one CSV row into PortfolioItem column values; raises ValueError with a readable message"""
+    def value(field):
+        index = columns.get(field)
+        return row[index].strip() if index is not None and index < len(row) else ''
+
+    mapping = normalize_lot(value('symbol'), value('quantity'), value('buy_price'), value('exchange'), known_symbols)
+    if value('trade_date'):
+        try:
+            mapping['date_added'] = datetime.fromisoformat(value('trade_date'))
+        except ValueError:
+            raise ValueError(f"Invalid trade date '{value('trade_date')}'")
+    return mapping
+
+
+def import_portfolio_csv(stream, user_id):
+    """
+    Import portfolio lots for a user from a binary CSV stream.
+
+    Valid rows are inserted in batches of IMPORT_BATCH_SIZE within a single
+    transaction; invalid rows are skipped and reported.
+
+    Args:
+        stream: Binary file-like object with the CSV contents
+        user_id: ID of the user that will own the lots
+
+    Returns:
+        ImportResult: Imported and skipped counts plus per-row errors
+
+    Raises:
+        ValueError: If the file has no header row or lacks required columns
+    """
+    result = ImportResult()
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline=''))
+
+    header = next(reader, None)
+    if not header:
+        raise ValueError("The file is empty")
+    columns = _map_columns(header)
+    known_symbols = get_known_symbols()
+
+    batch = []
+    try:
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            line = reader.line_num
+
+            trade_type = row[columns['trade_type']] if 'trade_type' in columns and columns['trade_type'] < len(row) else 'buy'
+            if trade_type.strip().lower() != 'buy':
+                result.skipped += 1
+                result.add_error(line, "Sell trade skipped; only buy trades are imported")
+                continue
+
+            try:
+                mapping = _parse_row(row, columns, known_symbols)
+            except ValueError as e:
+                result.skipped += 1
+                result.add_error(line, str(e))
+                continue
+
+            mapping['user_id'] = user_id
+            batch.append(mapping)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                db.session.bulk_insert_mappings(PortfolioItem, batch)
+                result.imported += len(batch)
+                batch = []
+
+        if batch:
+            db.session.bulk_insert_mappings(PortfolioItem, batch)
+            result.imported += len(batch)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    logger.info(f"Imported {result.imported} portfolio lots for user {user_id}, skipped {result.skipped}")
+    return result
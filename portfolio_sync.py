@@ -0,0 +1,156 @@
+"""
+Bulk sync of a user's portfolio lots from a full holdings snapshot.
+
+The snapshot is diffed against the user's existing PortfolioItem rows, read
+in one query. Lots are matched on (symbol, exchange, buy price): matched
+lots with a different quantity are updated, unmatched snapshot lots are
+inserted and unmatched existing lots are deleted. All changes are applied
+as batched statements in a single transaction.
+
+Besides the browser session (which also needs the page's CSRF token),
+scripts can call the sync API with a per-user API token in an
+"Authorization: Bearer <token>" header. `flask --app main create-api-token
+<username>` issues one, replacing the previous token; only its hash is
+stored. The token authenticates this API only, not the rest of the site.
+"""
+import logging
+from collections import defaultdict
+
+import click
+
+from app import app, db
+from models import PortfolioItem, User, hash_api_token
+from portfolio_import import get_known_symbols, normalize_lot, normalize_symbol
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Upper bound on lots accepted in one sync request
+MAX_SYNC_LOTS = 10000
+
+# Rows per batched INSERT/UPDATE/DELETE statement
+SYNC_BATCH_SIZE = 1000
+
+
+def _lot_key(symbol, exchange, buy_price):
+    """Identity of a lot for matching; prices are compared to 4 decimal places"""
+    return symbol, exchange, round(buy_price, 4)
+
+
+def authenticate_api_token(authorization):
+    """
+    Find the user whose API token a request's Authorization header carries.
+
+    Args:
+        authorization: The request's Authorization header
+
+    Returns:
+        User: The token's owner, or None if the header is not "Bearer <valid token>"
+    """
+    scheme, _, token = authorization.partition(' ')
+    token = token.strip()
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    return User.query.filter_by(api_token_hash=hash_api_token(token)).first()
+
+
+def validate_lots(lots):
+    """
+    Validate a snapshot of lots from a sync request.
+
+    Args:
+        lots: List of dicts with symbol, quantity, buy_price and optional exchange
+
+    Returns:
+        tuple: (normalized lots, list of {'index', 'error'} dicts)
+    """
+    known_symbols = get_known_symbols()
+    normalized = []
+    errors = []
+    for index, lot in enumerate(lots):
+        if not isinstance(lot, dict):
+            errors.append({'index': index, 'error': 'Lot must be an object'})
+            continue
+        try:
+            normalized.append(normalize_lot(
+                lot.get('symbol'), lot.get('quantity'), lot.get('buy_price'), lot.get('exchange'), known_symbols
+            ))
+        except ValueError as e:
+            errors.append({'index': index, 'error': str(e)})
+    return normalized, errors
+
+
+def sync_portfolio(user_id, lots, dry_run=False):
+    """
+    Make a user's portfolio match a snapshot of validated lots.
+
+    Args:
+        user_id: ID of the user whose portfolio is synced
+        lots: Normalized lots (see validate_lots)
+        dry_run: Compute the summary without changing anything
+
+    Returns:
+        dict: Counts of inserted, updated, deleted and unchanged lots
+    """
+    existing = defaultdict(list)
+    for item_id, symbol, exchange, buy_price, quantity in PortfolioItem.query.with_entities(
+        PortfolioItem.id, PortfolioItem.symbol, PortfolioItem.exchange, PortfolioItem.buy_price, PortfolioItem.quantity
+    ).filter_by(user_id=user_id).order_by(PortfolioItem.id):
+        symbol, exchange = normalize_symbol(symbol, exchange)
+        existing[_lot_key(symbol, exchange, buy_price)].append((item_id, quantity))
+
+    inserts = []
+    updates = []
+    unchanged = 0
+    for lot in lots:
+        matches = existing.get(_lot_key(lot['symbol'], lot['exchange'], lot['buy_price']))
+        if not matches:
+            inserts.append(dict(lot, user_id=user_id))
+            continue
+        item_id, quantity = matches.pop(0)
+        if quantity != lot['quantity']:
+            updates.append({'id': item_id, 'quantity': lot['quantity']})
+        else:
+            unchanged += 1
+    deletes = [item_id for matches in existing.values() for item_id, _ in matches]
+
+    summary = {
+        'inserted': len(inserts),
+        'updated': len(updates),
+        'deleted': len(deletes),
+        'unchanged': unchanged,
+        'dry_run': dry_run
+    }
+    if dry_run:
+        return summary
+
+    try:
+        for start in range(0, len(deletes), SYNC_BATCH_SIZE):
+            PortfolioItem.query.filter(
+                PortfolioItem.id.in_(deletes[start:start + SYNC_BATCH_SIZE])
+            ).delete(synchronize_session=False)
+        for start in range(0, len(updates), SYNC_BATCH_SIZE):
+            db.session.bulk_update_mappings(PortfolioItem, updates[start:start + SYNC_BATCH_SIZE])
+        for start in range(0, len(inserts), SYNC_BATCH_SIZE):
+            db.session.bulk_insert_mappings(PortfolioItem, inserts[start:start + SYNC_BATCH_SIZE])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    logger.info(f"Synced portfolio for user {user_id}: {summary}")
+    return summary
+
+
+@app.cli.command('create-api-token')
+@click.argument('username')
+def create_api_token_command(username):
+    """Issue a new sync API token for a user, revoking the old one."""
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.ClickException(f"No user named {username}")
+    token = user.set_api_token()
+    db.session.commit()
+    logger.info(f"Issued a new API token for user {user.id}")
+    click.echo(token)
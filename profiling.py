@@ -0,0 +1,250 @@
+"""
+Opt-in cProfile profiling of individual requests.
+
+Profiling is off unless PROFILE_SAMPLE_RATE or PROFILE_TOKEN is set; when
+both are unset no request hooks are registered, so it costs nothing.
+
+- PROFILE_SAMPLE_RATE: fraction of requests to profile, e.g. 0.01
+- PROFILE_TOKEN: secret that profiles a request sent with it in the
+  X-Profile-Token header (for admins reproducing a slow page); the
+  response then carries the profile's name in X-Profile-Id
+- PROFILE_DIR: where profiles are written (default: <tempdir>/portfolio_profiles)
+- PROFILE_KEEP: profiles kept per endpoint, the slowest ones (default 5)
+
+Each profile is written to PROFILE_DIR/<endpoint>/ as <name>.prof, for
+`python -m pstats` or snakeviz, and <name>.collapsed, one "a;b;c <us>"
+line per call stack, for flamegraph.pl or speedscope. cProfile records
+only caller/callee pairs, so the collapsed stacks split each function's
+time between its callers in proportion to the time each spent in it.
+
+The profile covers the view and the other request hooks, not the
+streaming of a response body. A worker profiles one request at a time.
+cProfile hooks the whole thread, which a gevent worker's greenlets share,
+so the profiler is paused whenever the profiled request's greenlet is
+switched out (via greenlet.settrace) and the time spent switched out is
+left out of its duration. Calls still open at a switch are split there,
+so their callers may be missing from the collapsed stacks.
+"""
+import cProfile
+import hmac
+import logging
+import os
+import pstats
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+from flask import g, request
+
+try:
+    import greenlet
+except ImportError:  # greenlet comes with gevent, only needed for the asynchronous serving mode
+    greenlet = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "portfolio_profiles"))
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "5"))
+
+PROFILE_HEADER = 'X-Profile-Token'
+
+# Stacks deeper than this are cut off in the collapsed output
+COLLAPSED_MAX_DEPTH = 100
+
+_profiling = threading.Lock()
+# The profile being recorded, paused while its request's greenlet is switched out
+_active = None
+
+
+class _ActiveProfile:
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.greenlet = greenlet.getcurrent() if greenlet is not None else None
+        self.started = time.perf_counter()
+        self.switched_at = None
+        self.switched_out = 0.0
+
+    def seconds(self):
+        return time.perf_counter() - self.started - self.switched_out
+
+
+def _trace_switch(event, args):
+    """greenlet trace function: pause the profiler while the profiled greenlet isn't running"""
+    active = _active
+    if active is not None and event in ('switch', 'throw'):
+        origin, target = args
+        if origin is active.greenlet and target is not active.greenlet:
+            active.profile.disable()
+            active.switched_at = time.perf_counter()
+        elif target is active.greenlet and active.switched_at is not None:
+            active.switched_out += time.perf_counter() - active.switched_at
+            active.switched_at = None
+            active.profile.enable()
+    if _trace_switch.previous is not None:
+        _trace_switch.previous(event, args)
+
+
+_trace_switch.previous = None
+
+
+def _trace_greenlet_switches():
+    # Trace functions are per thread, so this is installed by the thread serving requests
+    if greenlet is not None and greenlet.gettrace() is not _trace_switch:
+        _trace_switch.previous = greenlet.settrace(_trace_switch)
+
+
+def _should_profile():
+    token = request.headers.get(PROFILE_HEADER)
+    if token and PROFILE_TOKEN and hmac.compare_digest(token, PROFILE_TOKEN):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _start_profile():
+    global _active
+    if not _should_profile() or not _profiling.acquire(blocking=False):
+        return
+    _trace_greenlet_switches()
+    g.profile = _active = _ActiveProfile()
+    _active.profile.enable()
+
+
+def _stop_profile():
+    """Stop the request's profiler; returns (profile, seconds) or None if it wasn't profiled"""
+    global _active
+    active = g.pop('profile', None)
+    if active is None:
+        return None
+    active.profile.disable()
+    _active = None
+    _profiling.release()
+    return active.profile, active.seconds()
+
+
+def _finish_profile(response):
+    stopped = _stop_profile()
+    if stopped is not None:
+        try:
+            name = save_profile(request.endpoint or 'unmatched', *stopped)
+            if name is not None and request.headers.get(PROFILE_HEADER):
+                response.headers['X-Profile-Id'] = name
+        except Exception as e:
+            logger.error(f"Error saving request profile: {str(e)}")
+    return response
+
+
+def _abandon_profile(exc):
+    # Normally stopped in _finish_profile; this only runs if that was skipped
+    _stop_profile()
+
+
+def _label(func):
+    filename, lineno, name = func
+    if filename == '~':
+        # Built-ins, e.g. "<method 'execute' of 'sqlite3.Cursor' objects>"
+        return name.replace(';', ',')
+    return f"{os.path.basename(filename)}:{name}:{lineno}".replace(';', ',')
+
+
+def collapsed_stacks(profile):
+    """
+    Convert a cProfile profile to collapsed stacks.
+
+    Args:
+        profile: A finished cProfile.Profile
+
+    Returns:
+        list: "frame;frame;frame microseconds" lines, heaviest first
+    """
+    stats = pstats.Stats(profile).stats
+    callees = defaultdict(list)
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, (_, _, _, edge_time) in callers.items():
+            callees[caller].append((func, edge_time))
+
+    totals = defaultdict(float)
+
+    def walk(func, stack, path_time):
+        _, _, self_time, total_time, _ = stats[func]
+        share = path_time / total_time if total_time else 0
+        totals[stack] += self_time * share
+        if len(stack) >= COLLAPSED_MAX_DEPTH:
+            return
+        for callee, edge_time in callees.get(func, ()):
+            # Recursive calls are already counted in the frame's own time
+            if callee not in stack and edge_time * share > 1e-6:
+                walk(callee, stack + (callee,), edge_time * share)
+
+    for func, (_, _, _, total_time, callers) in stats.items():
+        if not callers:
+            walk(func, (func,), total_time)
+
+    return [
+        f"{';'.join(_label(func) for func in stack)} {round(seconds * 1e6)}"
+        for stack, seconds in sorted(totals.items(), key=lambda item: item[1], reverse=True)
+        if seconds >= 1e-6
+    ]
+
+
+def save_profile(endpoint, profile, seconds):
+    """
+    Save a request's profile if it is among the PROFILE_KEEP slowest for its endpoint.
+
+    Args:
+        endpoint: Endpoint name of the request
+        profile: Its finished cProfile.Profile
+        seconds: How long the request took
+
+    Returns:
+        str: Name of the saved profile, or None if faster ones weren't kept
+    """
+    endpoint_dir = os.path.join(PROFILE_DIR, re.sub(r'[^\w.-]', '_', endpoint))
+    os.makedirs(endpoint_dir, exist_ok=True)
+
+    # Names start with the zero-padded duration, so they sort by it
+    name = f"{round(seconds * 1000):08d}ms_{datetime.utcnow():%Y%m%dT%H%M%S}_{uuid.uuid4().hex[:8]}"
+    kept = sorted((f[:-len('.prof')] for f in os.listdir(endpoint_dir) if f.endswith('.prof')), reverse=True)
+    if len(kept) >= PROFILE_KEEP and name < kept[PROFILE_KEEP - 1]:
+        return None
+
+    path = os.path.join(endpoint_dir, name)
+    profile.dump_stats(f"{path}.prof")
+    with open(f"{path}.collapsed", 'w') as f:
+        f.write('\n'.join(collapsed_stacks(profile)) + '\n')
+
+    # Drop the fastest beyond the limit (another worker may have removed them already)
+    for old in sorted(kept + [name], reverse=True)[PROFILE_KEEP:]:
+        for extension in ('.prof', '.collapsed'):
+            try:
+                os.remove(os.path.join(endpoint_dir, old + extension))
+            except OSError:
+                pass
+
+    logger.info(f"Saved {seconds * 1000:.0f} ms profile of {endpoint} as {name}")
+    return name
+
+
+def init_app(app):
+    """
+    Profile requests as configured by PROFILE_SAMPLE_RATE and PROFILE_TOKEN.
+
+    Registers nothing when neither is set.
+
+    Args:
+        app: The Flask application
+    """
+    if PROFILE_SAMPLE_RATE <= 0 and not PROFILE_TOKEN:
+        return
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_abandon_profile)
+    logger.info(f"Profiling {PROFILE_SAMPLE_RATE:.1%} of requests and those with {PROFILE_HEADER}; saving to {PROFILE_DIR}")
@@ -0,0 +1,127 @@
+"""
+Durable quote store backed by the quote table.
+
+The table is a second-level cache behind stock_utils' in-memory quote cache.
+Every batch of fetched quotes is written through with a single
+INSERT ... ON CONFLICT upsert, so prices survive restarts and deploys, and a
+worker on any node can reuse a quote another one fetched recently instead of
+calling the provider again. Workers warm their in-memory cache from the
+table in one query when they start (see warm_quote_cache).
+"""
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import app, db
+from models import Quote
+from stock_utils import set_quote_store, warm_quotes
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Rows per upsert statement, well under SQLite's bound parameter limit
+QUOTE_UPSERT_BATCH = 500
+
+_UPSERT_DIALECTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+def _to_datetime(timestamp):
+    """Unix timestamp to the naive UTC datetime stored in the table"""
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).replace(tzinfo=None)
+
+
+def _to_timestamp(value):
+    """Stored naive UTC datetime to a Unix timestamp"""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class QuoteStore:
+    """Loads and saves quotes in the format stock_utils caches them"""
+
+    def load(self, symbols=None):
+        """
+        Load stored quotes.
+
+        Args:
+            symbols: Symbols to load, or None for every stored quote
+
+        Returns:
+            dict: Quote dicts keyed by symbol
+        """
+        with app.app_context():
+            query = db.session.query(Quote.symbol, Quote.price, Quote.previous_close, Quote.as_of, Quote.source)
+            if symbols is not None:
+                query = query.filter(Quote.symbol.in_(list(symbols)))
+
+            quotes = {}
+            for symbol, price, previous_close, as_of, source in query:
+                change = price - previous_close if previous_close is not None else 0.0
+                quotes[symbol] = {
+                    'symbol': symbol,
+                    'price': price,
+                    'previous_close': previous_close,
+                    'change': change,
+                    'change_percent': (change / previous_close) * 100 if previous_close else 0.0,
+                    'as_of': _to_timestamp(as_of),
+                    'source': source
+                }
+            return quotes
+
+    def save(self, quotes):
+        """
+        Upsert fetched quotes, keeping whichever row is newer.
+
+        Args:
+            quotes: Quote dicts keyed by symbol
+        """
+        rows = [{
+            'symbol': symbol,
+            'price': quote['price'],
+            'previous_close': quote['previous_close'],
+            'as_of': _to_datetime(quote['as_of']),
+            'source': quote.get('source', 'yfinance')
+        } for symbol, quote in quotes.items()]
+
+        with app.app_context():
+            try:
+                insert = _UPSERT_DIALECTS.get(db.engine.dialect.name)
+                for start in range(0, len(rows), QUOTE_UPSERT_BATCH):
+                    batch = rows[start:start + QUOTE_UPSERT_BATCH]
+                    if insert is None:
+                        for row in batch:
+                            db.session.merge(Quote(**row))
+                        continue
+
+                    statement = insert(Quote).values(batch)
+                    # Another worker may have stored a fresher quote in the meantime
+                    statement = statement.on_conflict_do_update(
+                        index_elements=[Quote.symbol],
+                        set_={column: statement.excluded[column]
+                              for column in ('price', 'previous_close', 'as_of', 'source')},
+                        where=Quote.as_of < statement.excluded.as_of
+                    )
+                    db.session.execute(statement)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+
+quote_store = QuoteStore()
+
+
+def warm_quote_cache():
+    """Seed this process's in-memory quote cache from the quote table in one query"""
+    try:
+        added = warm_quotes(quote_store.load())
+        logger.info(f"Warmed quote cache with {added} stored quotes")
+    except Exception as e:
+        logger.error(f"Error warming quote cache: {str(e)}")
+
+
+set_quote_store(quote_store)
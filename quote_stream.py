@@ -0,0 +1,160 @@
+"""
+Server-Sent Events quote stream fed by the shared quote cache.
+
+Each open stream subscribes to a set of symbols. A background refresher
+keeps those symbols fresh in the quote cache, and a stream is woken only
+when the cache reports a changed quote for one of its symbols. Event ids are quote cache cursors,
+so a reconnecting client's Last-Event-ID resumes from where it left off.
+
+Every open stream holds its request for as long as the client is connected,
+so this endpoint must be served by an asynchronous worker class (see
+gunicorn_config.py).
+"""
+import json
+import logging
+import threading
+
+from stock_utils import (
+    QUOTE_CACHE_TTL, register_quote_listener, refresh_quotes,
+    get_quote_version, get_quotes_since, make_quote_cursor
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds between keep-alive comments on an idle stream
+STREAM_HEARTBEAT = 15
+
+# Seconds between background refreshes of subscribed symbols
+STREAM_REFRESH_INTERVAL = QUOTE_CACHE_TTL
+
+# Ask clients to wait this long (ms) before reconnecting after a drop
+STREAM_RETRY_MS = 5000
+
+
+class QuoteStreamHub:
+    """Tracks open streams in this worker and refreshes their symbols in the background"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}  # subscription id -> set of symbols
+        self._changed = {}        # subscription id -> event set when one of its symbols changes
+        self._next_id = 1
+        self._refresher = None
+        self._wakeup = threading.Event()
+        self.peak_streams = 0
+
+    @property
+    def open_streams(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+    def subscribed_symbols(self):
+        with self._lock:
+            symbols = set()
+            for subscription in self._subscriptions.values():
+                symbols |= subscription
+            return symbols
+
+    def subscribe(self, symbols):
+        with self._lock:
+            subscription_id = self._next_id
+            self._next_id += 1
+            self._subscriptions[subscription_id] = set(symbols)
+            self._changed[subscription_id] = threading.Event()
+            self.peak_streams = max(self.peak_streams, len(self._subscriptions))
+            open_streams = len(self._subscriptions)
+
+            if self._refresher is None or not self._refresher.is_alive():
+                self._refresher = threading.Thread(target=self._run_refresher, name='quote-stream-refresher', daemon=True)
+                self._refresher.start()
+
+        # Fetch any symbols new to this worker without waiting for the next cycle
+        self._wakeup.set()
+        logger.info(f"Quote stream opened ({open_streams} open in this worker)")
+        return subscription_id
+
+    def unsubscribe(self, subscription_id):
+        with self._lock:
+            self._subscriptions.pop(subscription_id, None)
+            self._changed.pop(subscription_id, None)
+            open_streams = len(self._subscriptions)
+        logger.info(f"Quote stream closed ({open_streams} open in this worker)")
+
+    def notify(self, changed_quotes):
+        """Quote listener: wake the streams subscribed to any of the changed symbols"""
+        changed = set(changed_quotes)
+        with self._lock:
+            for subscription_id, symbols in self._subscriptions.items():
+                if not symbols.isdisjoint(changed):
+                    self._changed[subscription_id].set()
+
+    def wait_for_change(self, subscription_id, timeout):
+        """Block until a quote the subscription streams changes, or timeout; returns True if one did
+
+        A change notified since the previous wait returns at once, so none is
+        missed while the stream was sending the last batch.
+        """
+        with self._lock:
+            event = self._changed[subscription_id]
+        changed = event.wait(timeout)
+        event.clear()
+        return changed
+
+    def _run_refresher(self):
+        """Refresh subscribed symbols until the last stream in this worker closes"""
+        while True:
+            with self._lock:
+                if not self._subscriptions:
+                    self._refresher = None
+                    return
+
+            symbols = self.subscribed_symbols()
+            if symbols:
+                try:
+                    # Only stale symbols are fetched, so early wake-ups are cheap
+                    refresh_quotes(symbols)
+                except Exception as e:
+                    logger.error(f"Error refreshing streamed quotes: {str(e)}")
+
+            self._wakeup.wait(STREAM_REFRESH_INTERVAL)
+            self._wakeup.clear()
+
+
+quote_stream_hub = QuoteStreamHub()
+register_quote_listener(quote_stream_hub.notify)
+
+
+def format_quote_event(version, quotes):
+    """Format a batch of quotes as one SSE 'quotes' event, identified by its cursor"""
+    payload = {
+        symbol: {
+            'price': quote['price'],
+            'change': quote['change'],
+            'change_percent': quote['change_percent'],
+            'as_of': quote['as_of']
+        } for symbol, quote in quotes.items()
+    }
+    return f"id: {make_quote_cursor(version)}\nevent: quotes\ndata: {json.dumps(payload)}\n\n"
+
+
+def quote_events(symbols, since_version=0):
+    """Generate SSE messages with quotes for symbols that changed after since_version"""
+    subscription_id = quote_stream_hub.subscribe(symbols)
+    cursor = since_version
+    try:
+        yield f"retry: {STREAM_RETRY_MS}\n\n"
+        while True:
+            # Read the version before scanning so no update can slip between them
+            version = get_quote_version()
+            quotes = get_quotes_since(cursor, symbols)
+            cursor = max([version] + [quote['version'] for quote in quotes.values()])
+
+            if quotes:
+                yield format_quote_event(cursor, quotes)
+
+            if not quote_stream_hub.wait_for_change(subscription_id, STREAM_HEARTBEAT):
+                yield ": keep-alive\n\n"
+    finally:
+        quote_stream_hub.unsubscribe(subscription_id)
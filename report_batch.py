@@ -0,0 +1,182 @@
+"""
+Month-end report generation for every user.
+
+The generate-monthly-reports command prices every symbol held by any user
+in one batch quote refresh, builds each user's report data from that
+snapshot, and renders the PDF and Excel reports on a process pool, since
+rendering is CPU-bound. Reports are written to REPORTS_DIR/<YYYY-MM>/ with
+a manifest.json listing every file, any failures and the run's throughput.
+
+Schedule it daily near the end of the day with --if-month-end (cron cannot
+express "last day of the month"), e.g.:
+
+    55 23 28-31 * * flask --app main generate-monthly-reports --if-month-end
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import date, datetime, timedelta
+
+import click
+
+from app import app, db
+from models import PortfolioItem
+from stock_utils import get_quotes
+from report_jobs import REPORT_RENDERERS, build_report_data
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REPORTS_DIR = os.environ.get("REPORTS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "reports"))
+
+# Users whose report data is built ahead of the workers, per worker
+PENDING_PER_WORKER = 4
+
+
+def _init_worker():
+    """Drop the database connections inherited from the parent without closing them under it"""
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _render_reports(user_id, report_data, month_dir, report_types):
+    """
+    Render one user's reports into the month's directory (runs in a pool process).
+
+    Returns:
+        list: Manifest entries, one per report
+    """
+    entries = []
+    for report_type in report_types:
+        render, extension = REPORT_RENDERERS[report_type]
+        path = os.path.join(month_dir, f"user_{user_id}.{extension}")
+        partial_path = f"{path}.partial"
+        started = time.perf_counter()
+        if not render(report_data, partial_path):
+            raise RuntimeError(f"Error generating {report_type} report")
+        os.replace(partial_path, path)
+        entries.append({
+            'user_id': user_id,
+            'username': report_data['username'],
+            'type': report_type,
+            'file': os.path.basename(path),
+            'bytes': os.path.getsize(path),
+            'sha256': _sha256(path),
+            'render_ms': round((time.perf_counter() - started) * 1000, 1),
+        })
+    return entries
+
+
+def _report_data_for_all_users(user_ids, quotes):
+    """Yield (user_id, report data) for each user who has a priced holding"""
+    for user_id in user_ids:
+        # A fresh app context per user, so the request-scoped loaders and the
+        # session's identity map don't accumulate every user's rows
+        with app.app_context():
+            report_data = build_report_data(user_id, quotes)
+        if report_data is not None:
+            yield user_id, report_data
+
+
+def _collect(future, user_id, reports, failures):
+    try:
+        reports.extend(future.result())
+    except Exception as e:
+        logger.error(f"Error generating monthly reports for user {user_id}: {str(e)}")
+        failures.append({'user_id': user_id, 'error': str(e)})
+
+
+def generate_monthly_reports(output_dir=None, report_types=None, workers=None):
+    """
+    Generate every user's monthly reports from one price snapshot.
+
+    Args:
+        output_dir: Directory to write the month's directory in (defaults to REPORTS_DIR)
+        report_types: Keys of REPORT_RENDERERS to generate (defaults to all)
+        workers: Worker processes (defaults to the CPU count)
+
+    Returns:
+        dict: The manifest written alongside the reports
+    """
+    report_types = list(report_types or REPORT_RENDERERS)
+    workers = workers or os.cpu_count() or 1
+    month = date.today().strftime('%Y-%m')
+    month_dir = os.path.join(output_dir or REPORTS_DIR, month)
+    os.makedirs(month_dir, exist_ok=True)
+    started = time.perf_counter()
+
+    user_ids = [row.user_id for row in db.session.query(PortfolioItem.user_id).distinct().order_by(PortfolioItem.user_id)]
+    symbols = [row.symbol for row in db.session.query(PortfolioItem.symbol).distinct()]
+    # One refresh for every symbol held by anyone; each user's report is priced from it
+    quotes = get_quotes(symbols, serve_warmed=False)
+    priced_at = datetime.utcnow()
+    db.session.remove()
+    logger.info(f"Priced {len(quotes)} of {len(symbols)} symbols for {len(user_ids)} users")
+
+    reports = []
+    failures = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        pending = {}
+        for user_id, report_data in _report_data_for_all_users(user_ids, quotes):
+            pending[executor.submit(_render_reports, user_id, report_data, month_dir, report_types)] = user_id
+            # Keep a bounded number of users' data in flight rather than building everyone's up front
+            if len(pending) >= workers * PENDING_PER_WORKER:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    _collect(future, pending.pop(future), reports, failures)
+        for future, user_id in pending.items():
+            _collect(future, user_id, reports, failures)
+
+    elapsed = time.perf_counter() - started
+    cores = min(workers, os.cpu_count() or 1)
+    reports_per_second = len(reports) / elapsed if elapsed else 0.0
+    manifest = {
+        'month': month,
+        'generated_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'prices': {'as_of': priced_at.isoformat(timespec='seconds') + 'Z', 'symbols': len(quotes)},
+        'users': len(user_ids),
+        'workers': workers,
+        'elapsed_seconds': round(elapsed, 2),
+        'reports_per_second': round(reports_per_second, 2),
+        'reports_per_second_per_core': round(reports_per_second / cores, 2),
+        'reports': sorted(reports, key=lambda entry: (entry['user_id'], entry['type'])),
+        'failures': failures,
+    }
+    manifest_path = os.path.join(month_dir, 'manifest.json')
+    with open(f"{manifest_path}.partial", 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{manifest_path}.partial", manifest_path)
+
+    logger.info(
+        f"Generated {len(reports)} reports for {len(user_ids)} users in {elapsed:.1f}s with {workers} workers: "
+        f"{reports_per_second:.2f} reports/s, {manifest['reports_per_second_per_core']:.2f} per core"
+    )
+    if failures:
+        logger.error(f"{len(failures)} users' reports failed; see {manifest_path}")
+    return manifest
+
+
+@app.cli.command('generate-monthly-reports')
+@click.option('--output-dir', default=None, help='Directory for the reports (default: REPORTS_DIR).')
+@click.option('--type', 'report_types', multiple=True, type=click.Choice(list(REPORT_RENDERERS)),
+              help='Report type to generate; repeat for several (default: all).')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: CPU count).')
+@click.option('--if-month-end', is_flag=True, help='Do nothing unless today is the last day of the month.')
+def generate_monthly_reports_command(output_dir, report_types, workers, if_month_end):
+    """Generate every user's monthly PDF and Excel reports."""
+    if if_month_end and (date.today() + timedelta(days=1)).day != 1:
+        logger.info("Not the last day of the month; skipping monthly reports")
+        return
+    generate_monthly_reports(output_dir, report_types, workers)
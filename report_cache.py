@@ -0,0 +1,198 @@
+"""
+Content-addressed cache for rendered report files.
+
+A report is identified by a hash of its format and its normalized report
+data (amounts rounded to the cents the report shows), so requesting the
+same report again while prices are unchanged serves the file already
+rendered instead of rendering a new one. Files live in REPORT_CACHE_DIR and
+are evicted once older than REPORT_CACHE_MAX_AGE, or least recently used
+first once the directory grows past REPORT_CACHE_MAX_BYTES.
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+
+from metrics import record_cache_lookup
+from tracing import start_span
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REPORT_CACHE_DIR = os.environ.get("REPORT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "portfolio_reports"))
+REPORT_CACHE_MAX_BYTES = int(os.environ.get("REPORT_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+REPORT_CACHE_MAX_AGE = int(os.environ.get("REPORT_CACHE_MAX_AGE", str(24 * 3600)))  # seconds
+
+# Part of every key; bump it when the renderers change so cached files are not reused
+REPORT_CACHE_VERSION = 3
+
+# Renders that crashed midway leave partial files behind; they are removed after this long
+PARTIAL_FILE_MAX_AGE = 3600
+
+
+def _normalize(value):
+    """Round floats to the two decimals reports display, recursively"""
+    if isinstance(value, float):
+        return round(value, 2)
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def report_cache_key(report_data, report_type):
+    """
+    Get the content hash identifying a rendered report.
+
+    Args:
+        report_data: Data passed to the report renderer
+        report_type: Report format, e.g. 'pdf'
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    payload = json.dumps(
+        [REPORT_CACHE_VERSION, report_type, _normalize(report_data)],
+        sort_keys=True, separators=(',', ':'), default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _cache_path(report_data, report_type, extension):
+    return os.path.join(REPORT_CACHE_DIR, f"{report_cache_key(report_data, report_type)}.{extension}")
+
+
+def _fresh_cache_file(path):
+    """The path if the file exists and is within REPORT_CACHE_MAX_AGE, else None"""
+    try:
+        if time.time() - os.path.getmtime(path) >= REPORT_CACHE_MAX_AGE:
+            return None
+        # Touch the file so eviction sees it as recently used
+        os.utime(path)
+    except OSError:
+        return None
+    return path
+
+
+def get_cached_report_file(report_data, report_type, extension):
+    """
+    Get the path of an already rendered report without rendering it.
+
+    Args:
+        report_data: Data passed to the report renderer
+        report_type: Report format, e.g. 'pdf'
+        extension: File extension for the report
+
+    Returns:
+        str: Path of the cached report file, or None if it is not cached
+    """
+    with start_span('cache.lookup', cache='report', report_type=report_type) as lookup:
+        path = _fresh_cache_file(_cache_path(report_data, report_type, extension))
+        lookup.set_attribute('hit', path is not None)
+    if path is None:
+        record_cache_lookup('report', misses=1)
+        return None
+    record_cache_lookup('report', hits=1)
+    logger.info(f"Serving cached report {os.path.basename(path)}")
+    return path
+
+
+def get_report_file(report_data, report_type, render, extension):
+    """
+    Get the path of a rendered report, rendering it only if it is not cached.
+
+    Args:
+        report_data: Data passed to the report renderer
+        report_type: Report format, e.g. 'pdf'
+        render: Callable(report_data, output) that saves the report to the output path, returning None on failure
+        extension: File extension for the report
+
+    Returns:
+        str: Path of the report file, or None if rendering failed
+    """
+    cached_path = get_cached_report_file(report_data, report_type, extension)
+    if cached_path:
+        return cached_path
+
+    os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+    path = _cache_path(report_data, report_type, extension)
+
+    # Render to a private name and move it into place, so a concurrent
+    # request for the same report never sees a partial file
+    partial_path = f"{path}.{uuid.uuid4().hex}.partial"
+    try:
+        if not render(report_data, partial_path):
+            return None
+        os.replace(partial_path, path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+    evict_report_files(keep=path)
+    return path
+
+
+def _remove(path):
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except OSError:
+        # Already evicted by another worker
+        return 0
+
+
+def evict_report_files(keep=None):
+    """
+    Delete cached reports past REPORT_CACHE_MAX_AGE, then the least recently
+    used ones until the cache fits in REPORT_CACHE_MAX_BYTES.
+
+    Also removes report files written straight to the temp directory by
+    earlier versions, once they are past the same age.
+
+    Args:
+        keep: Path of a report to keep regardless of size, e.g. the one just rendered
+
+    Returns:
+        int: Number of bytes freed
+    """
+    now = time.time()
+    freed = 0
+    files = []
+    for path in glob.glob(os.path.join(REPORT_CACHE_DIR, '*')):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        age = now - stat.st_mtime
+        if age >= REPORT_CACHE_MAX_AGE or (path.endswith('.partial') and age >= PARTIAL_FILE_MAX_AGE):
+            freed += _remove(path)
+        elif not path.endswith('.partial'):
+            files.append((stat.st_mtime, stat.st_size, path))
+
+    for pattern in ('portfolio_report_*.pdf', 'portfolio_report_*.xlsx'):
+        for path in glob.glob(os.path.join(tempfile.gettempdir(), pattern)):
+            try:
+                if now - os.path.getmtime(path) >= REPORT_CACHE_MAX_AGE:
+                    freed += _remove(path)
+            except OSError:
+                continue
+
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= REPORT_CACHE_MAX_BYTES:
+            break
+        if path == keep:
+            continue
+        freed += _remove(path)
+        total -= size
+
+    if freed:
+        logger.info(f"Evicted {freed} bytes of cached reports")
+    return freed
@@ -1,213 +1,519 @@
+from copy import copy
 from datetime import datetime
-from fpdf import FPDF
+from fpdf import FPDF, FPDF_VERSION, set_global as fpdf_set_global
 import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
+from openpyxl.utils import get_column_letter
+import io
 import logging
 import os
-import tempfile
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def generate_monthly_report_pdf(data, output_path=None):
-    """Generate a PDF report for the user's investment portfolio"""
+def _deliver(content, output):
+    """Return rendered report bytes, or write them to a binary stream or file path"""
+    if output is None:
+        return content
+    if hasattr(output, 'write'):
+        output.write(content)
+        return output
+    with open(output, 'wb') as f:
+        f.write(content)
+    return output
+
+# Unicode TrueType fonts for PDF reports, as (regular, bold) paths; the first
+# regular font found is used. Without one, reports fall back to the core
+# Helvetica font, which has no rupee sign, and print "Rs." instead.
+PDF_FONT_CANDIDATES = [
+    (os.environ.get("REPORT_PDF_FONT"), os.environ.get("REPORT_PDF_FONT_BOLD")),
+    ('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'),
+    ('/usr/share/fonts/dejavu/DejaVuSans.ttf', '/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf'),
+    ('/usr/share/fonts/TTF/DejaVuSans.ttf', '/usr/share/fonts/TTF/DejaVuSans-Bold.ttf'),
+    ('/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf', '/usr/share/fonts/truetype/noto/NotoSans-Bold.ttf'),
+]
+PDF_FONT_FAMILY = 'reportsans'
+
+# RGB colors shared by every PDF report
+PDF_COLORS = {
+    'text': (33, 37, 41),
+    'muted': (108, 117, 125),
+    'header_fill': (204, 204, 204),
+    'grid': (222, 226, 230),
+    'line': (13, 110, 253),
+    'bar': (25, 135, 84),
+}
+
+# Holdings table columns: (header, width in mm, alignment); widths fill the 190mm between margins
+PDF_TABLE_COLUMNS = [
+    ("Symbol", 25, 'L'),
+    ("Quantity", 22, 'R'),
+    ("Buy Price", 28, 'R'),
+    ("Current Price", 28, 'R'),
+    ("Investment", 30, 'R'),
+    ("Current Value", 32, 'R'),
+    ("Gain/Loss %", 25, 'R'),
+]
+PDF_ROW_HEIGHT = 7
+
+# Holdings shown individually in the allocation chart; the rest are grouped as "Other"
+PDF_ALLOCATION_BARS = 8
+
+# Parsed font metrics, kept for the life of the process: style -> (fonts, font_files) entries
+_pdf_font_entries = {}
+_pdf_font_paths = None
+
+# Copying parsed font metrics between documents and _GlyphSubset rely on
+# FPDF 1.7.2 internals (its fonts/font_files dicts and list-based glyph
+# subsets); other versions add the font to each document the documented way
+_REUSE_FPDF_FONTS = FPDF_VERSION == '1.7.2'
+
+# Don't write fpdf's metrics pickles next to system fonts; metrics are cached in _pdf_font_entries
+fpdf_set_global("FPDF_CACHE_MODE", 1)
+
+def _find_pdf_fonts():
+    """The (regular, bold) font paths to use, looked up once; (None, None) if no font was found"""
+    global _pdf_font_paths
+    if _pdf_font_paths is None:
+        _pdf_font_paths = next(
+            ((regular, bold if bold and os.path.exists(bold) else regular)
+             for regular, bold in PDF_FONT_CANDIDATES if regular and os.path.exists(regular)),
+            (None, None)
+        )
+        if _pdf_font_paths[0] is None:
+            logger.warning("No Unicode font found for PDF reports, using Helvetica; set REPORT_PDF_FONT")
+    return _pdf_font_paths
+
+class _GlyphSubset(list):
+    """The list of characters a document uses from a Unicode font, without duplicates
+    
+    FPDF appends every character it draws to this list and, on output, tests
+    each of the font's code points against it, which grows with the square
+    of the text length. Keeping each character once, with a set for
+    membership tests, makes output time independent of the row count.
+    """
+    
+    def __init__(self, glyphs):
+        super().__init__(dict.fromkeys(glyphs))
+        self._glyphs = set(self)
+    
+    def append(self, glyph):
+        if glyph not in self._glyphs:
+            self._glyphs.add(glyph)
+            super().append(glyph)
+    
+    def __contains__(self, glyph):
+        return glyph in self._glyphs
+    
+    def __delitem__(self, index):
+        self._glyphs.discard(self[index])
+        super().__delitem__(index)
+
+class ReportPDF(FPDF):
+    """FPDF document with the report's fonts, running header and footer
+    
+    The Unicode font is parsed once per process and its metrics copied into
+    each document (with FPDF 1.7.2; see _REUSE_FPDF_FONTS). While table_title is set, pages started by a page break
+    repeat the table's column headers.
+    """
+    
+    def __init__(self, title):
+        super().__init__()
+        self.report_title = title
+        self.table_title = None
+        self.alias_nb_pages()
+        self.set_margins(10, 10)
+        self.set_auto_page_break(True, margin=15)
+        self.unicode = self._add_report_fonts()
+        self.font_name = PDF_FONT_FAMILY if self.unicode else 'Helvetica'
+        self.currency = '₹ ' if self.unicode else 'Rs. '
+    
+    def _add_report_fonts(self):
+        paths = _find_pdf_fonts()
+        if paths[0] is None:
+            return False
+        for style, path in (('', paths[0]), ('B', paths[1])):
+            if not _REUSE_FPDF_FONTS:
+                self.add_font(PDF_FONT_FAMILY, style, path, uni=True)
+                continue
+            if style not in _pdf_font_entries:
+                template = FPDF()
+                template.add_font(PDF_FONT_FAMILY, style, path, uni=True)
+                _pdf_font_entries[style] = (template.fonts, template.font_files)
+            fonts, font_files = _pdf_font_entries[style]
+            for key, entry in fonts.items():
+                # Each document numbers its fonts and tracks the glyphs it uses (0-56 covers the page aliases)
+                self.fonts[key] = dict(entry, i=len(self.fonts) + 1, subset=_GlyphSubset(range(0, 57)))
+            self.font_files.update((key, dict(value)) for key, value in font_files.items())
+        return True
+    
+    def normalize_text(self, txt):
+        # Core fonts only cover latin-1
+        if not self.unicode and isinstance(txt, str):
+            return txt.encode('latin-1', 'replace').decode('latin-1')
+        return super().normalize_text(txt)
+    
+    def style(self, size, bold=False, color='text'):
+        self.set_font(self.font_name, 'B' if bold else '', size)
+        self.set_text_color(*PDF_COLORS[color])
+    
+    def header(self):
+        if self.page_no() > 1:
+            self.style(8, color='muted')
+            self.cell(0, 6, self.report_title, 0, 1, 'R')
+        if self.table_title:
+            self.table_header()
+    
+    def footer(self):
+        self.set_y(-12)
+        self.style(8, color='muted')
+        self.cell(95, 6, f"Generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", 0, 0, 'L')
+        self.cell(0, 6, f"Page {self.page_no()}/{{nb}}", 0, 0, 'R')
+    
+    def table_header(self):
+        self.style(9, bold=True)
+        self.set_fill_color(*PDF_COLORS['header_fill'])
+        for header, width, _ in PDF_TABLE_COLUMNS:
+            self.cell(width, PDF_ROW_HEIGHT, header, 1, 0, 'C', True)
+        self.ln(PDF_ROW_HEIGHT)
+
+def _downsample(values, limit):
+    """Keep at most limit evenly spaced values, always including the last"""
+    if len(values) <= limit:
+        return values
+    step = len(values) / (limit - 1)
+    return [values[int(i * step)] for i in range(limit - 1)] + [values[-1]]
+
+def _draw_performance_chart(pdf, history, width=190, height=50):
+    """Line chart of the portfolio value history"""
+    points = _downsample([(point['date'], point['value']) for point in history], int(width * 2))
+    if len(points) < 2:
+        return
+    
+    pdf.style(12, bold=True)
+    pdf.cell(0, 8, "Portfolio Value", 0, 1)
+    x, y = pdf.get_x() + 18, pdf.get_y()
+    plot_width = width - 18
+    values = [value for _, value in points]
+    low, high = min(values), max(values)
+    if high == low:
+        low, high = low - 1, high + 1
+    
+    pdf.set_draw_color(*PDF_COLORS['grid'])
+    pdf.set_line_width(0.2)
+    pdf.rect(x, y, plot_width, height)
+    pdf.style(7, color='muted')
+    pdf.set_xy(pdf.l_margin, y)
+    pdf.cell(17, 4, f"{high:,.0f}", 0, 0, 'R')
+    pdf.set_xy(pdf.l_margin, y + height - 4)
+    pdf.cell(17, 4, f"{low:,.0f}", 0, 0, 'R')
+    
+    pdf.set_draw_color(*PDF_COLORS['line'])
+    pdf.set_line_width(0.4)
+    step = plot_width / (len(points) - 1)
+    previous = None
+    for i, value in enumerate(values):
+        point = (x + i * step, y + height - (value - low) / (high - low) * height)
+        if previous:
+            pdf.line(previous[0], previous[1], point[0], point[1])
+        previous = point
+    
+    pdf.set_xy(x, y + height + 1)
+    pdf.cell(plot_width / 2, 4, str(points[0][0]), 0, 0, 'L')
+    pdf.cell(plot_width / 2, 4, str(points[-1][0]), 0, 1, 'R')
+    pdf.set_draw_color(0)
+    pdf.set_line_width(0.2)
+    pdf.ln(4)
+
+def _draw_allocation_chart(pdf, portfolio, width=190):
+    """Horizontal bar chart of the largest holdings' share of the portfolio value"""
+    values = {}
+    for item in portfolio:
+        values[item['symbol']] = values.get(item['symbol'], 0) + item['current_value']
+    total = sum(values.values())
+    if total <= 0:
+        return
+    
+    holdings = sorted(values.items(), key=lambda holding: holding[1], reverse=True)
+    bars = holdings[:PDF_ALLOCATION_BARS]
+    if len(holdings) > PDF_ALLOCATION_BARS:
+        bars.append(("Other", sum(value for _, value in holdings[PDF_ALLOCATION_BARS:])))
+    
+    pdf.style(12, bold=True)
+    pdf.cell(0, 8, "Allocation", 0, 1)
+    bar_width = width - 45
+    pdf.set_fill_color(*PDF_COLORS['bar'])
+    for symbol, value in bars:
+        share = value / total
+        y = pdf.get_y()
+        pdf.style(8)
+        pdf.cell(28, 5, symbol, 0, 0)
+        if share > 0:
+            pdf.rect(pdf.l_margin + 28, y + 1, bar_width * share, 3, 'F')
+        pdf.set_x(pdf.l_margin + 28 + bar_width + 2)
+        pdf.cell(15, 5, f"{share * 100:.1f}%", 0, 1, 'R')
+    pdf.ln(4)
+
+def generate_monthly_report_pdf(data, output=None):
+    """Generate a PDF report for the user's investment portfolio
+    
+    Renders in memory. Returns the PDF bytes when output is None; pass a
+    binary stream (e.g. BytesIO) to write into it, or a file path to save
+    the report to disk, and that output is returned instead. Returns None
+    on failure.
+    
+    The holdings table continues across pages with its column headers
+    repeated, after charts of the portfolio value history (when data has
+    a 'history' list) and of the allocation by holding.
+    """
     try:
-        # Create a temporary file if output_path is not provided
-        if output_path is None:
-            temp_dir = tempfile.gettempdir()
-            output_path = os.path.join(temp_dir, f"portfolio_report_{datetime.now().strftime('%Y%m%d%H%M%S')}.pdf")
-            logger.info(f"No output path provided, using temporary file: {output_path}")
-        
-        # Create PDF object
-        pdf = FPDF()
+        title = f"Investment Portfolio Report - {data['month']} {data['year']}"
+        pdf = ReportPDF(title)
         pdf.add_page()
-        
-        # Set fonts
-        pdf.set_font('Arial', 'B', 16)
+        currency = pdf.currency
         
         # Title
-        pdf.cell(0, 10, f"Investment Portfolio Report - {data['month']} {data['year']}", 0, 1, 'C')
+        pdf.style(16, bold=True)
+        pdf.cell(0, 10, title, 0, 1, 'C')
         pdf.cell(0, 10, f"Generated for: {data['username']}", 0, 1, 'C')
-        pdf.ln(10)
+        pdf.ln(6)
         
         # Summary
-        pdf.set_font('Arial', 'B', 14)
+        pdf.style(14, bold=True)
         pdf.cell(0, 10, "Summary", 0, 1)
         
-        pdf.set_font('Arial', '', 12)
-        pdf.cell(100, 10, "Total Investment:", 0, 0)
-        pdf.cell(0, 10, f"₹ {data['total_investment']:.2f}", 0, 1)
-        
-        pdf.cell(100, 10, "Current Portfolio Value:", 0, 0)
-        pdf.cell(0, 10, f"₹ {data['total_current_value']:.2f}", 0, 1)
-        
-        pdf.cell(100, 10, "Net Gain/Loss:", 0, 0)
-        pdf.cell(0, 10, f"₹ {data['net_gain_loss']:.2f} ({data['net_gain_loss_percent']:.2f}%)", 0, 1)
-        
+        pdf.style(11)
+        summary = [
+            ("Total Investment:", f"{currency}{data['total_investment']:.2f}"),
+            ("Current Portfolio Value:", f"{currency}{data['total_current_value']:.2f}"),
+            ("Net Gain/Loss:", f"{currency}{data['net_gain_loss']:.2f} ({data['net_gain_loss_percent']:.2f}%)"),
+        ]
         # Include top performer and worst performer only if they exist
         if 'top_gainer' in data and data['top_gainer']:
-            pdf.cell(100, 10, "Top Performing Stock:", 0, 0)
-            pdf.cell(0, 10, f"{data['top_gainer']['symbol']} ({data['top_gainer']['gain_percent']:.2f}%)", 0, 1)
-        
+            summary.append(("Top Performing Stock:",
+                            f"{data['top_gainer']['symbol']} ({data['top_gainer']['gain_percent']:.2f}%)"))
         if 'top_loser' in data and data['top_loser']:
-            pdf.cell(100, 10, "Worst Performing Stock:", 0, 0)
-            pdf.cell(0, 10, f"{data['top_loser']['symbol']} ({data['top_loser']['loss_percent']:.2f}%)", 0, 1)
-        
-        pdf.ln(10)
-        
-        # Portfolio details
-        pdf.set_font('Arial', 'B', 14)
+            summary.append(("Worst Performing Stock:",
+                            f"{data['top_loser']['symbol']} ({data['top_loser']['loss_percent']:.2f}%)"))
+        for label, value in summary:
+            pdf.cell(100, 8, label, 0, 0)
+            pdf.cell(0, 8, value, 0, 1)
+        pdf.ln(6)
+        
+        # Charts
+        if data.get('history'):
+            _draw_performance_chart(pdf, data['history'])
+        _draw_allocation_chart(pdf, data['portfolio'])
+        
+        # Portfolio details, starting on a new page unless the heading, header and a few rows fit
+        if pdf.get_y() + 10 + PDF_ROW_HEIGHT * 4 > pdf.page_break_trigger:
+            pdf.add_page()
+        pdf.style(14, bold=True)
         pdf.cell(0, 10, "Portfolio Details", 0, 1)
+        pdf.table_header()
+        pdf.table_title = "Portfolio Details"
         
-        # Table header
-        pdf.set_font('Arial', 'B', 10)
-        pdf.cell(25, 10, "Symbol", 1, 0, 'C')
-        pdf.cell(25, 10, "Quantity", 1, 0, 'C')
-        pdf.cell(30, 10, "Buy Price", 1, 0, 'C')
-        pdf.cell(30, 10, "Current Price", 1, 0, 'C')
-        pdf.cell(30, 10, "Investment", 1, 0, 'C')
-        pdf.cell(30, 10, "Current Value", 1, 0, 'C')
-        pdf.cell(25, 10, "Gain/Loss %", 1, 1, 'C')
-        
-        # Table rows
-        pdf.set_font('Arial', '', 10)
+        pdf.style(9)
         for item in data['portfolio']:
-            pdf.cell(25, 10, item['symbol'], 1, 0)
-            pdf.cell(25, 10, f"{item['quantity']:.2f}", 1, 0, 'R')
-            pdf.cell(30, 10, f"₹ {item['buy_price']:.2f}", 1, 0, 'R')
-            pdf.cell(30, 10, f"₹ {item['current_price']:.2f}", 1, 0, 'R')
-            pdf.cell(30, 10, f"₹ {item['investment']:.2f}", 1, 0, 'R')
-            pdf.cell(30, 10, f"₹ {item['current_value']:.2f}", 1, 0, 'R')
-            pdf.cell(25, 10, f"{item['gain_loss_percent']:.2f}%", 1, 1, 'R')
-        
-        # Footer
-        pdf.ln(10)
-        pdf.set_font('Arial', 'I', 8)
-        pdf.cell(0, 10, f"Generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", 0, 0, 'C')
-        
-        # Output to file
-        pdf.output(output_path)
-        logger.info(f"PDF report generated successfully at {output_path}")
-        
-        return output_path
+            row = (
+                item['symbol'],
+                f"{item['quantity']:.2f}",
+                f"{currency}{item['buy_price']:.2f}",
+                f"{currency}{item['current_price']:.2f}",
+                f"{currency}{item['investment']:.2f}",
+                f"{currency}{item['current_value']:.2f}",
+                f"{item['gain_loss_percent']:.2f}%",
+            )
+            for (_, width, align), value in zip(PDF_TABLE_COLUMNS, row):
+                pdf.cell(width, PDF_ROW_HEIGHT, value, 1, 0, align)
+            pdf.ln(PDF_ROW_HEIGHT)
+        pdf.table_title = None
+        
+        # FPDF builds the document as a latin-1 string
+        content = pdf.output(dest='S').encode('latin-1')
+        logger.info(f"PDF report generated ({len(content)} bytes, {pdf.page_no()} pages)")
+        
+        return _deliver(content, output)
     except Exception as e:
         logger.error(f"Error generating PDF report: {str(e)}")
         return None
 
-def generate_monthly_report_excel(data, output_path=None):
-    """Generate an Excel report for the user's investment portfolio"""
+# Reports with more rows than this (holdings plus history) use write-only worksheets,
+# which stream rows to disk instead of keeping a cell object per value
+EXCEL_WRITE_ONLY_ROWS = int(os.environ.get("REPORT_EXCEL_WRITE_ONLY_ROWS", "2000"))
+
+EXCEL_CURRENCY_FORMAT = '₹#,##0.00'
+
+def _add_excel_styles(wb):
+    """Register the report's named styles, so cells share one style record instead of one each"""
+    thin = Side(style='thin')
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    header_font = Font(name='Calibri', size=12, bold=True)
+    styles = [
+        NamedStyle(name='report_title', font=Font(name='Calibri', size=16, bold=True)),
+        NamedStyle(name='report_heading', font=header_font),
+        NamedStyle(name='report_amount', number_format=EXCEL_CURRENCY_FORMAT),
+        NamedStyle(
+            name='report_column', font=header_font, border=border, alignment=Alignment(horizontal='center'),
+            fill=PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+        ),
+        NamedStyle(name='report_cell', border=border),
+        NamedStyle(name='report_currency', border=border, number_format=EXCEL_CURRENCY_FORMAT),
+        NamedStyle(name='report_date', border=border, number_format='yyyy-mm-dd'),
+        NamedStyle(name='report_footer', font=Font(name='Calibri', size=8, italic=True),
+                   alignment=Alignment(horizontal='center')),
+    ]
+    for style in styles:
+        wb.add_named_style(style)
+
+def _cell_styler(ws):
+    """Make a function creating cells of a sheet with a named style
+    
+    Looking a named style up by name is slow, so each is looked up once and
+    its style array copied into later cells.
+    """
+    style_arrays = {}
+    
+    def styled(value, style):
+        cell = WriteOnlyCell(ws, value=value)
+        if style in style_arrays:
+            cell._style = copy(style_arrays[style])
+        else:
+            cell.style = style
+            style_arrays[style] = cell._style
+        return cell
+    
+    return styled
+
+def _append_table(ws, styled, headers, rows, column_styles):
+    """Append a header row, then each row with its columns' named styles"""
+    ws.append([styled(header, 'report_column') for header in headers])
+    for row in rows:
+        ws.append([styled(value, style) for value, style in zip(row, column_styles)])
+
+def _create_sheet(wb, title, width=15, columns=7):
+    ws = wb.create_sheet(title)
+    # Column widths must be set before any row is written in write-only mode
+    for col in range(1, columns + 1):
+        ws.column_dimensions[get_column_letter(col)].width = width
+    return ws, _cell_styler(ws)
+
+def _write_summary_sheet(wb, data, merge):
+    ws, styled = _create_sheet(wb, f"Investment Report {data['month']}")
+    merged_rows = []
+    
+    # Title
+    ws.append([styled(f"Investment Portfolio Report - {data['month']} {data['year']}", 'report_title')])
+    ws.append([styled(f"Generated for: {data['username']}", 'report_heading')])
+    ws.append([])
+    merged_rows += [1, 2]
+    
+    # Summary
+    ws.append([styled("Summary", 'report_heading')])
+    merged_rows.append(4)
+    ws.append(["Total Investment:", styled(data['total_investment'], 'report_amount')])
+    ws.append(["Current Portfolio Value:", styled(data['total_current_value'], 'report_amount')])
+    ws.append(["Net Gain/Loss:", styled(data['net_gain_loss'], 'report_amount'),
+               f"({data['net_gain_loss_percent']:.2f}%)"])
+    row = 8
+    
+    # Include top performer and worst performer only if they exist
+    if 'top_gainer' in data and data['top_gainer']:
+        ws.append(["Top Performing Stock:", f"{data['top_gainer']['symbol']} ({data['top_gainer']['gain_percent']:.2f}%)"])
+        row += 1
+    
+    if 'top_loser' in data and data['top_loser']:
+        ws.append(["Worst Performing Stock:", f"{data['top_loser']['symbol']} ({data['top_loser']['loss_percent']:.2f}%)"])
+        row += 1
+    
+    # Portfolio details
+    ws.append([])
+    ws.append([])
+    ws.append([styled("Portfolio Details", 'report_heading')])
+    merged_rows.append(row + 2)
+    _append_table(
+        ws, styled,
+        ["Symbol", "Quantity", "Buy Price", "Current Price", "Investment", "Current Value", "Gain/Loss %"],
+        ([item['symbol'], item['quantity'], item['buy_price'], item['current_price'], item['investment'],
+          item['current_value'], f"{item['gain_loss_percent']:.2f}%"] for item in data['portfolio']),
+        ['report_cell', 'report_cell'] + ['report_currency'] * 4 + ['report_cell']
+    )
+    
+    # Footer
+    ws.append([])
+    ws.append([styled(f"Generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", 'report_footer')])
+    merged_rows.append(row + 3 + len(data['portfolio']) + 2)
+    
+    if merge:
+        for merged_row in merged_rows:
+            ws.merge_cells(f'A{merged_row}:G{merged_row}')
+
+def _write_lots_sheet(wb, data):
+    ws, styled = _create_sheet(wb, "Lots", columns=11)
+    ws.freeze_panes = 'A2'
+    total_value = data['total_current_value']
+    _append_table(
+        ws, styled,
+        ["Symbol", "Exchange", "Date Added", "Quantity", "Buy Price", "Current Price", "Investment",
+         "Current Value", "Gain/Loss", "Gain/Loss %", "Weight %"],
+        ([item['symbol'], item.get('exchange'), item.get('date_added'), item['quantity'], item['buy_price'],
+          item['current_price'], item['investment'], item['current_value'], item['gain_loss'],
+          round(item['gain_loss_percent'], 2),
+          round(item['current_value'] / total_value * 100, 2) if total_value else 0.0]
+         for item in data['portfolio']),
+        ['report_cell', 'report_cell', 'report_date', 'report_cell'] + ['report_currency'] * 5
+        + ['report_cell', 'report_cell']
+    )
+
+def _write_history_sheet(wb, data):
+    ws, styled = _create_sheet(wb, "History", columns=4)
+    ws.freeze_panes = 'A2'
+    _append_table(
+        ws, styled,
+        ["Date", "Interval", "Portfolio Value", "Change %"],
+        ([point['date'], point['interval'], point['value'], round(point['change_percent'], 2)]
+         for point in data['history']),
+        ['report_date', 'report_cell', 'report_currency', 'report_cell']
+    )
+
+def generate_monthly_report_excel(data, output=None):
+    """Generate an Excel report for the user's investment portfolio
+    
+    Takes output like generate_monthly_report_pdf: None returns the
+    workbook bytes, a binary stream or file path is written to and returned.
+    
+    Besides the summary sheet, the workbook has a sheet of per-lot detail
+    and, when data has a 'history' list, one with the portfolio value
+    series. Reports larger than EXCEL_WRITE_ONLY_ROWS are built with
+    write-only worksheets, which keep memory flat however many rows there
+    are but cannot merge the title cells; save large reports to a file path
+    rather than into memory.
+    """
     try:
-        # Create a temporary file if output_path is not provided
-        if output_path is None:
-            temp_dir = tempfile.gettempdir()
-            output_path = os.path.join(temp_dir, f"portfolio_report_{datetime.now().strftime('%Y%m%d%H%M%S')}.xlsx")
-            logger.info(f"No output path provided, using temporary file: {output_path}")
-        
-        # Create workbook and select active worksheet
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = f"Investment Report {data['month']}"
-        
-        # Define styles
-        title_font = Font(name='Calibri', size=16, bold=True)
-        header_font = Font(name='Calibri', size=12, bold=True)
-        header_fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # Title
-        ws['A1'] = f"Investment Portfolio Report - {data['month']} {data['year']}"
-        ws['A1'].font = title_font
-        ws.merge_cells('A1:G1')
-        ws['A2'] = f"Generated for: {data['username']}"
-        ws['A2'].font = header_font
-        ws.merge_cells('A2:G2')
-        
-        # Summary
-        ws['A4'] = "Summary"
-        ws['A4'].font = header_font
-        ws.merge_cells('A4:G4')
-        
-        ws['A5'] = "Total Investment:"
-        ws['B5'] = data['total_investment']
-        ws['B5'].number_format = '₹#,##0.00'
-        
-        ws['A6'] = "Current Portfolio Value:"
-        ws['B6'] = data['total_current_value']
-        ws['B6'].number_format = '₹#,##0.00'
-        
-        ws['A7'] = "Net Gain/Loss:"
-        ws['B7'] = data['net_gain_loss']
-        ws['B7'].number_format = '₹#,##0.00'
-        ws['C7'] = f"({data['net_gain_loss_percent']:.2f}%)"
-        
-        row = 8
-        # Include top performer and worst performer only if they exist
-        if 'top_gainer' in data and data['top_gainer']:
-            ws[f'A{row}'] = "Top Performing Stock:"
-            ws[f'B{row}'] = f"{data['top_gainer']['symbol']} ({data['top_gainer']['gain_percent']:.2f}%)"
-            row += 1
-        
-        if 'top_loser' in data and data['top_loser']:
-            ws[f'A{row}'] = "Worst Performing Stock:"
-            ws[f'B{row}'] = f"{data['top_loser']['symbol']} ({data['top_loser']['loss_percent']:.2f}%)"
-            row += 1
-        
-        # Portfolio details - Table headers
-        ws[f'A{row + 2}'] = "Portfolio Details"
-        ws[f'A{row + 2}'].font = header_font
-        ws.merge_cells(f'A{row + 2}:G{row + 2}')
-        
-        headers = ["Symbol", "Quantity", "Buy Price", "Current Price", "Investment", "Current Value", "Gain/Loss %"]
-        header_row = row + 3
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=header_row, column=col)
-            cell.value = header
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.border = border
-            cell.alignment = Alignment(horizontal='center')
-        
-        # Portfolio details - Data
-        for i, item in enumerate(data['portfolio'], 1):
-            data_row = header_row + i
-            ws.cell(row=data_row, column=1).value = item['symbol']
-            ws.cell(row=data_row, column=2).value = item['quantity']
-            ws.cell(row=data_row, column=3).value = item['buy_price']
-            ws.cell(row=data_row, column=3).number_format = '₹#,##0.00'
-            ws.cell(row=data_row, column=4).value = item['current_price']
-            ws.cell(row=data_row, column=4).number_format = '₹#,##0.00'
-            ws.cell(row=data_row, column=5).value = item['investment']
-            ws.cell(row=data_row, column=5).number_format = '₹#,##0.00'
-            ws.cell(row=data_row, column=6).value = item['current_value']
-            ws.cell(row=data_row, column=6).number_format = '₹#,##0.00'
-            ws.cell(row=data_row, column=7).value = f"{item['gain_loss_percent']:.2f}%"
-            
-            # Apply borders to cells
-            for col in range(1, 8):
-                ws.cell(row=data_row, column=col).border = border
-        
-        # Adjust column widths
-        for col in range(1, 8):
-            ws.column_dimensions[openpyxl.utils.get_column_letter(col)].width = 15
-        
-        # Footer
-        footer_row = header_row + len(data['portfolio']) + 2
-        ws.cell(row=footer_row, column=1).value = f"Generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        ws.merge_cells(f'A{footer_row}:G{footer_row}')
-        ws.cell(row=footer_row, column=1).font = Font(name='Calibri', size=8, italic=True)
-        ws.cell(row=footer_row, column=1).alignment = Alignment(horizontal='center')
-        
-        # Save workbook
-        wb.save(output_path)
-        logger.info(f"Excel report generated successfully at {output_path}")
-        
-        return output_path
+        write_only = len(data['portfolio']) + len(data.get('history', ())) > EXCEL_WRITE_ONLY_ROWS
+        wb = openpyxl.Workbook(write_only=write_only)
+        if not write_only:
+            # Sheets are added in order below, so drop the default empty one
+            wb.remove(wb.active)
+        _add_excel_styles(wb)
+        
+        _write_summary_sheet(wb, data, merge=not write_only)
+        _write_lots_sheet(wb, data)
+        if data.get('history'):
+            _write_history_sheet(wb, data)
+        
+        # Save workbook; openpyxl writes the zip straight into a stream or file
+        if output is None:
+            buffer = io.BytesIO()
+            wb.save(buffer)
+            logger.info(f"Excel report generated ({buffer.tell()} bytes)")
+            return buffer.getvalue()
+        wb.save(output)
+        logger.info("Excel report generated successfully")
+        
+        return output
     except Exception as e:
         logger.error(f"Error generating Excel report: {str(e)}")
         return None
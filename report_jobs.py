@@ -0,0 +1,301 @@
+"""
+Background report generation.
+
+Generating a report fetches a price for every holding and renders a PDF or
+Excel file, which is too slow to do inside the POST. A request instead
+records a ReportJob row and submits it to a small per-process worker pool;
+the browser polls the job's status and downloads the file once it is done.
+
+Jobs are rows in the database, so any worker can report a job's status. A
+user's queued or running job of the same type is reused instead of starting
+a duplicate. A job still unfinished after REPORT_JOB_TIMEOUT seconds (for
+example because its worker restarted) is marked failed.
+
+Portfolios of up to REPORT_INLINE_MAX_ITEMS holdings render quickly enough
+to be returned by the request itself: render_report renders them in memory
+and the route streams the bytes back without touching the disk.
+"""
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+try:
+    import gevent
+    from gevent import monkey as gevent_monkey
+except ImportError:  # gevent is only needed for the asynchronous serving mode
+    gevent = None
+
+from app import app, db
+from models import User, PortfolioItem, ReportJob
+from stock_utils import get_quotes
+from report_cache import get_cached_report_file, get_report_file
+from history_rollup import get_retained_history
+from user_data import get_user_data
+from lazy_imports import LazyModule
+from metrics import time_report_render
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Reports rendered at once per worker process
+REPORT_WORKERS = int(os.environ.get("REPORT_WORKERS", "2"))
+
+# Seconds after which an unfinished job is considered lost
+REPORT_JOB_TIMEOUT = int(os.environ.get("REPORT_JOB_TIMEOUT", "600"))
+
+# Larger portfolios are always rendered by a background job
+REPORT_INLINE_MAX_ITEMS = int(os.environ.get("REPORT_INLINE_MAX_ITEMS", "50"))
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+# fpdf and openpyxl are imported with the first report rendered, not at startup
+report_generator = LazyModule('report_generator')
+
+
+def _render_pdf(report_data, output=None):
+    with time_report_render('pdf'):
+        return report_generator.generate_monthly_report_pdf(report_data, output)
+
+
+def _render_excel(report_data, output=None):
+    with time_report_render('excel'):
+        return report_generator.generate_monthly_report_excel(report_data, output)
+
+
+# Report type -> (renderer, file extension)
+REPORT_RENDERERS = {
+    'pdf': (_render_pdf, 'pdf'),
+    'excel': (_render_excel, 'xlsx'),
+}
+
+_executor = None
+_enqueue_lock = threading.Lock()
+
+
+def _get_executor():
+    """The worker pool, created on first use so each forked worker gets its own"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix='report')
+    return _executor
+
+
+def _run_blocking(func, *args):
+    """Run CPU-bound rendering without stalling other requests in this worker.
+
+    Under gevent workers the pool's threads are greenlets, so rendering is
+    handed to the hub's native thread pool (as stock_utils does for provider calls).
+    """
+    if gevent is not None and gevent_monkey.is_module_patched('threading'):
+        return gevent.get_hub().threadpool.apply(func, args)
+    return func(*args)
+
+
+def build_report_data(user_id, quotes=None):
+    """
+    Price a user's portfolio with one batch quote refresh and summarize it for the report renderers.
+
+    Args:
+        user_id: ID of the user
+        quotes: Quotes by symbol to price the portfolio with, instead of refreshing them
+
+    Returns:
+        dict: Report data, or None if no holding could be priced
+    """
+    user = db.session.get(User, user_id)
+    portfolio_items = PortfolioItem.query.filter_by(user_id=user_id).all()
+    if quotes is None:
+        quotes = get_quotes([item.symbol for item in portfolio_items], serve_warmed=False)
+
+    portfolio_data = []
+    total_investment = 0
+    total_current_value = 0
+    top_gainer = None
+    top_loser = None
+
+    for item in portfolio_items:
+        quote = quotes.get(item.symbol)
+        if quote is None:
+            continue
+
+        current_price = quote['price']
+        investment = item.quantity * item.buy_price
+        current_value = item.quantity * current_price
+        gain_loss = current_value - investment
+        gain_loss_percent = (gain_loss / investment) * 100 if investment > 0 else 0
+
+        total_investment += investment
+        total_current_value += current_value
+
+        portfolio_data.append({
+            'symbol': item.symbol,
+            'exchange': item.exchange,
+            'date_added': item.date_added,
+            'quantity': item.quantity,
+            'buy_price': item.buy_price,
+            'current_price': current_price,
+            'investment': investment,
+            'current_value': current_value,
+            'gain_loss': gain_loss,
+            'gain_loss_percent': gain_loss_percent
+        })
+
+        # Track top gainer and loser
+        if top_gainer is None or gain_loss_percent > top_gainer['gain_percent']:
+            top_gainer = {'symbol': item.symbol, 'gain_percent': gain_loss_percent}
+
+        if top_loser is None or gain_loss_percent < top_loser['loss_percent']:
+            top_loser = {'symbol': item.symbol, 'loss_percent': gain_loss_percent}
+
+    if not portfolio_data:
+        return None
+
+    now = datetime.now()
+    return {
+        'username': user.username,
+        'month': now.strftime('%B'),
+        'year': now.strftime('%Y'),
+        'total_investment': total_investment,
+        'total_current_value': total_current_value,
+        'net_gain_loss': total_current_value - total_investment,
+        'net_gain_loss_percent': ((total_current_value - total_investment) / total_investment) * 100 if total_investment > 0 else 0,
+        'portfolio': portfolio_data,
+        'top_gainer': top_gainer,
+        'top_loser': top_loser,
+        'history': [
+            {'date': point.date, 'interval': tier, 'value': point.value, 'change_percent': point.change_percent}
+            for tier, point in get_retained_history(user_id, get_user_data(user_id).history())
+        ]
+    }
+
+
+def report_download_name(extension):
+    return f"portfolio_report_{datetime.now().strftime('%Y%m%d')}.{extension}"
+
+
+def render_report(user_id, report_type):
+    """
+    Render a report within the current request.
+
+    A report already in the report cache is read from there; otherwise it
+    is rendered in memory and not written to disk. Inline reports are small,
+    so the cached file is read here rather than handed to the response,
+    where cache eviction could remove it first.
+
+    Args:
+        user_id: ID of the user
+        report_type: A key of REPORT_RENDERERS
+
+    Returns:
+        tuple: (report bytes, download name)
+    """
+    report_data = build_report_data(user_id)
+    if report_data is None:
+        raise ValueError("None of your portfolio items could be priced")
+
+    render, extension = REPORT_RENDERERS[report_type]
+    content = None
+    path = get_cached_report_file(report_data, report_type, extension)
+    if path is not None:
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            logger.info(f"Cached report {os.path.basename(path)} was evicted; rendering it again")
+    if content is None:
+        content = _run_blocking(render, report_data)
+    if not content:
+        raise RuntimeError("Error generating report")
+    return content, report_download_name(extension)
+
+
+def _run_job(job_id):
+    """Generate the report for a queued job and record the outcome"""
+    with app.app_context():
+        job = db.session.get(ReportJob, job_id)
+        if job is None or job.status != 'queued':
+            return
+
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+
+        try:
+            report_data = build_report_data(job.user_id)
+            if report_data is None:
+                raise ValueError("None of your portfolio items could be priced")
+
+            render, extension = REPORT_RENDERERS[job.report_type]
+            # Identical reports (same holdings and prices) reuse the cached file
+            output_path = _run_blocking(get_report_file, report_data, job.report_type, render, extension)
+            if not output_path:
+                raise RuntimeError("Error generating report")
+
+            job.status = 'done'
+            job.file_path = output_path
+            job.download_name = report_download_name(extension)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error generating report for job {job_id}: {str(e)}")
+            job.status = 'failed'
+            job.error = str(e)
+
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        logger.info(f"Report job {job_id} finished with status {job.status}")
+
+
+def expire_stalled_job(job):
+    """Mark a job failed if it has been queued or running longer than REPORT_JOB_TIMEOUT"""
+    if job.status in ACTIVE_STATUSES and job.created_at < datetime.utcnow() - timedelta(seconds=REPORT_JOB_TIMEOUT):
+        job.status = 'failed'
+        job.error = 'The report did not finish in time. Please try again.'
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+    return job
+
+
+def enqueue_report_job(user_id, report_type):
+    """
+    Start generating a report in the background, reusing the user's unfinished job of the same type.
+
+    Args:
+        user_id: ID of the user
+        report_type: A key of REPORT_RENDERERS
+
+    Returns:
+        ReportJob: The new or reused job
+    """
+    if report_type not in REPORT_RENDERERS:
+        raise ValueError(f"Unknown report type: {report_type}")
+
+    # The lock keeps one process from starting duplicates for a double-submitted form
+    with _enqueue_lock:
+        active = ReportJob.query.filter(
+            ReportJob.user_id == user_id,
+            ReportJob.created_at >= datetime.utcnow() - timedelta(seconds=REPORT_JOB_TIMEOUT),
+            ReportJob.report_type == report_type,
+            ReportJob.status.in_(ACTIVE_STATUSES)
+        ).first()
+        if active is not None:
+            logger.info(f"Reusing unfinished report job {active.id} for user {user_id}")
+            return active
+
+        job = ReportJob(id=uuid.uuid4().hex, user_id=user_id, report_type=report_type, status='queued')
+        db.session.add(job)
+        db.session.commit()
+
+    _get_executor().submit(_run_job, job.id)
+    logger.info(f"Queued {report_type} report job {job.id} for user {user_id}")
+    return job
+
+
+def get_recent_jobs(user_id, limit=5):
+    """Get the user's most recent report jobs, newest first"""
+    jobs = ReportJob.query.filter_by(user_id=user_id)\
+        .order_by(ReportJob.created_at.desc()).limit(limit).all()
+    return [expire_stalled_job(job) for job in jobs]
@@ -1,27 +1,296 @@
+import io
 import os
+import time
 import logging
-from flask import render_template, url_for, flash, redirect, request, jsonify, send_file, g
+from flask import render_template, url_for, flash, redirect, request, jsonify, send_file, g, Response, stream_with_context, abort
 from flask_login import login_user, current_user, logout_user, login_required
 from urllib.parse import urlparse
 from datetime import datetime, timedelta
-import tempfile
 
-from app import app, db
-from models import User, PortfolioItem, WatchlistItem, PortfolioHistory
-from forms import RegistrationForm, LoginForm, PortfolioItemForm, WatchlistItemForm, WatchlistNoteForm, ReportGeneratorForm
-from stock_utils import get_stock_price, get_stock_history, get_stock_symbols, get_daily_change
-from report_generator import generate_monthly_report_pdf, generate_monthly_report_excel
+from app import app, db, csrf
+from models import User, PortfolioItem, WatchlistItem, PortfolioHistory, PriceAlert, ReportJob, ALERT_TYPES
+from forms import (
+    RegistrationForm, LoginForm, PortfolioItemForm, PortfolioImportForm, WatchlistItemForm,
+    WatchlistNoteForm, PriceAlertForm, ReportGeneratorForm
+)
+from stock_utils import (
+    get_stock_price, get_stock_history, get_stock_symbols, get_daily_change, get_quotes,
+    refresh_quotes, get_quotes_since, get_quote_version, make_quote_cursor, parse_quote_cursor,
+    get_symbol_list_timestamp, has_stale_warmed_quotes, QUOTE_CACHE_TTL
+)
+from alerts import add_alert_to_index, remove_alert_from_index
+import quote_store  # write-through and read-through for quotes, via stock_utils.set_quote_store
+from quote_stream import quote_events
+from portfolio_import import import_portfolio_csv
+from exports import EXPORTS, EXPORT_FORMATS, stream_export
+from portfolio_sync import MAX_SYNC_LOTS, authenticate_api_token, validate_lots, sync_portfolio
+import report_batch  # registers the generate-monthly-reports command
+from report_jobs import (
+    REPORT_INLINE_MAX_ITEMS, enqueue_report_job, expire_stalled_job, get_recent_jobs, render_report
+)
 from form_helpers import format_form_errors
+from http_helpers import make_etag, conditional_json
+from metrics import render_metrics, scrape_authorized
+from user_data import HistoryPoint, get_user_data
+from history_rollup import (
+    PERFORMANCE_RANGES, DEFAULT_PERFORMANCE_RANGE, get_history_series, needs_compaction, compact_user_history
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Upper bound on symbols accepted by the batch quote endpoint
+MAX_QUOTE_SYMBOLS = 100
+
+# Seconds a browser may reuse symbol search results without revalidating
+SEARCH_CACHE_MAX_AGE = 3600
+
 @app.context_processor
 def inject_now():
     """Add current date to all templates"""
     return {'now': datetime.now()}
 
+def serialize_alert(alert):
+    """Convert a PriceAlert into a JSON serializable dict"""
+    return {
+        'id': alert.id,
+        'watchlist_item_id': alert.watchlist_item_id,
+        'symbol': alert.symbol,
+        'alert_type': alert.alert_type,
+        'threshold': alert.threshold,
+        'triggered_at': alert.triggered_at.isoformat() if alert.triggered_at else None,
+        'triggered_price': alert.triggered_price,
+        'triggered_change_percent': alert.triggered_change_percent
+    }
+
+def get_portfolio_rows(user_id):
+    """Get portfolio rows from the database only, without fetching prices"""
+    portfolio_items = get_user_data(user_id).portfolio_items()
+    return [{
+        'id': item.id,
+        'symbol': item.symbol,
+        'quantity': item.quantity,
+        'buy_price': item.buy_price,
+        'exchange': item.exchange,
+        'investment': item.quantity * item.buy_price
+    } for item in portfolio_items]
+
+def get_portfolio_data(user_id, portfolio_rows=None):
+    """Get portfolio rows priced from one batch quote refresh, plus totals"""
+    if portfolio_rows is None:
+        portfolio_rows = get_portfolio_rows(user_id)
+    quotes = get_quotes([row['symbol'] for row in portfolio_rows])
+    portfolio_data = []
+    total_investment = 0
+    total_current_value = 0
+    
+    for row in portfolio_rows:
+        try:
+            quote = quotes.get(row['symbol'])
+            if quote is None:
+                # Skip items with no current price data
+                logger.warning(f"Unable to fetch current price for {row['symbol']}")
+                continue
+            
+            current_price = quote['price']
+            investment = row['investment']
+            current_value = row['quantity'] * current_price
+            gain_loss = current_value - investment
+            gain_loss_percent = (gain_loss / investment) * 100 if investment > 0 else 0
+            
+            total_investment += investment
+            total_current_value += current_value
+            
+            portfolio_data.append(dict(
+                row,
+                current_price=current_price,
+                current_value=current_value,
+                gain_loss=gain_loss,
+                gain_loss_percent=gain_loss_percent
+            ))
+        except Exception as e:
+            logger.error(f"Error processing portfolio item {row['symbol']}: {str(e)}")
+    
+    # Calculate total gain/loss
+    total_gain_loss = total_current_value - total_investment
+    total_gain_loss_percent = (total_gain_loss / total_investment) * 100 if total_investment > 0 else 0
+    
+    totals = {
+        'total_investment': total_investment,
+        'total_current_value': total_current_value,
+        'total_gain_loss': total_gain_loss,
+        'total_gain_loss_percent': total_gain_loss_percent
+    }
+    return portfolio_data, totals
+
+def save_portfolio_snapshot(user_id, total_current_value):
+    """Save portfolio history for today if not already saved"""
+    today = datetime.now().date()
+    user_data = get_user_data(user_id)
+    existing_history = user_data.history_on(today)
+    
+    if existing_history or total_current_value <= 0:
+        return
+    
+    # Get yesterday's record if available to calculate daily change
+    yesterday = today - timedelta(days=1)
+    yesterday_history = user_data.history_on(yesterday)
+    
+    daily_change = 0
+    daily_change_percent = 0
+    
+    if yesterday_history:
+        daily_change = total_current_value - yesterday_history.total_value
+        daily_change_percent = (daily_change / yesterday_history.total_value) * 100 if yesterday_history.total_value > 0 else 0
+    
+    try:
+        portfolio_history = PortfolioHistory(
+            user_id=user_id,
+            date=today,
+            total_value=total_current_value,
+            daily_change=daily_change,
+            daily_change_percent=daily_change_percent
+        )
+        db.session.add(portfolio_history)
+        db.session.commit()
+        user_data.add_history(HistoryPoint(today, total_current_value, daily_change, daily_change_percent))
+        logger.info(f"Saved portfolio history for {today}")
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error saving portfolio history: {str(e)}")
+    
+    # Roll old daily rows into weekly and monthly rollups about once a month;
+    # the history is already loaded, so checking costs no query
+    history = user_data.history()
+    if history and needs_compaction(history[0].date, today):
+        try:
+            compact_user_history(user_id, today)
+            user_data.invalidate('history')
+        except Exception as e:
+            logger.error(f"Error compacting portfolio history: {str(e)}")
+
+def get_performance_data(user_id, range_name=DEFAULT_PERFORMANCE_RANGE):
+    """Get the portfolio performance series for a chart range in a JSON serializable format
+    
+    Reads daily snapshots, or weekly or monthly rollups for longer ranges.
+    For rollups, daily_changes holds the change over each period.
+    """
+    interval, series = get_history_series(user_id, get_user_data(user_id).history(), range_name)
+    
+    return {
+        'range': range_name,
+        'interval': interval,
+        'dates': [point.date.strftime('%Y-%m-%d') for point in series],
+        'values': [point.value for point in series],
+        'daily_changes': [point.change_percent for point in series]
+    }
+
+def get_performance_range():
+    """Get the chart range from the ?range= argument, or None if it isn't a known range"""
+    range_name = request.args.get('range', DEFAULT_PERFORMANCE_RANGE)
+    return range_name if range_name in PERFORMANCE_RANGES else None
+
+def get_watchlist_rows(user_id):
+    """Get watchlist rows and their active alerts from the database, without fetching prices"""
+    # Items and their active alerts come from one joined query
+    return [{
+        'id': item.id,
+        'symbol': item.symbol,
+        'exchange': item.exchange,
+        'notes': item.notes,
+        'alerts': alerts
+    } for item, alerts in get_user_data(user_id).watchlist()]
+
+def get_watchlist_data(user_id):
+    """Build watchlist rows with prices from one batch quote refresh and active alerts"""
+    watchlist_rows = get_watchlist_rows(user_id)
+    quotes = get_quotes([row['symbol'] for row in watchlist_rows])
+    
+    watchlist_data = []
+    for row in watchlist_rows:
+        try:
+            quote = quotes.get(row['symbol'])
+            if quote is None:
+                continue
+            
+            watchlist_data.append(dict(
+                row,
+                current_price=quote['price'],
+                daily_change=quote['change'],
+                daily_change_percent=quote['change_percent']
+            ))
+        except Exception as e:
+            logger.error(f"Error processing watchlist item {row['symbol']}: {str(e)}")
+    
+    return watchlist_data
+
+def serialize_report_job(job):
+    """Convert a ReportJob into a JSON serializable dict with its status and file URLs"""
+    return {
+        'id': job.id,
+        'report_type': job.report_type,
+        'status': job.status,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'status_url': url_for('report_job_status', job_id=job.id),
+        'file_url': url_for('report_job_file', job_id=job.id) if job.status == 'done' else None
+    }
+
+def quote_max_age(quote):
+    """Seconds until a cached quote goes stale, for Cache-Control max-age"""
+    return QUOTE_CACHE_TTL - (time.time() - quote['as_of'])
+
+def get_user_symbols(user_id):
+    """Get the sorted, distinct symbols in a user's portfolio and watchlist"""
+    return get_user_data(user_id).symbols()
+
+def serialize_quote(quote):
+    """Convert a cached quote into the JSON shape used by the quote endpoints"""
+    return {
+        'price': quote['price'],
+        'change': quote['change'],
+        'change_percent': quote['change_percent']
+    }
+
+def get_triggered_alerts(user_id, limit=10):
+    """Get the user's most recently triggered price alerts"""
+    return PriceAlert.query.filter(
+        PriceAlert.user_id == user_id,
+        PriceAlert.triggered_at.isnot(None)
+    ).order_by(PriceAlert.triggered_at.desc()).limit(limit).all()
+
+def build_portfolio_payload(user_id, range_name=DEFAULT_PERFORMANCE_RANGE):
+    """Compute the portfolio section of the dashboard API"""
+    quote_cursor = make_quote_cursor()
+    portfolio_rows = get_portfolio_rows(user_id)
+    portfolio_data, totals = get_portfolio_data(user_id, portfolio_rows)
+    # Today's snapshot is kept once written, so it waits until warmed quotes are refreshed
+    if not has_stale_warmed_quotes([row['symbol'] for row in portfolio_rows]):
+        save_portfolio_snapshot(user_id, totals['total_current_value'])
+    
+    priced_ids = {item['id'] for item in portfolio_data}
+    return dict(
+        totals,
+        items=portfolio_data,
+        unpriced_ids=[row['id'] for row in portfolio_rows if row['id'] not in priced_ids],
+        performance=get_performance_data(user_id, range_name),
+        quote_cursor=quote_cursor,
+        updated_at=datetime.now().isoformat()
+    )
+
+def build_watchlist_payload(user_id):
+    """Compute the watchlist section of the dashboard API"""
+    quote_cursor = make_quote_cursor()
+    watchlist_data = get_watchlist_data(user_id)
+    return {
+        'quote_cursor': quote_cursor,
+        'items': [dict(item, alerts=[serialize_alert(a) for a in item['alerts']]) for item in watchlist_data],
+        'triggered_alerts': [serialize_alert(a) for a in get_triggered_alerts(user_id)],
+        'updated_at': datetime.now().isoformat()
+    }
+
 @app.route('/')
 def index():
     """Home page route"""
@@ -147,161 +416,120 @@ def logout():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    """Main dashboard route"""
+    """Main dashboard route
+    
+    Renders only database-backed data; prices and totals are filled in by
+    dashboard.js from /api/portfolio and /api/watchlist.
+    """
     portfolio_form = PortfolioItemForm()
     watchlist_form = WatchlistItemForm()
     
-    # Get portfolio items with current prices
-    portfolio_items = PortfolioItem.query.filter_by(user_id=current_user.id).all()
-    portfolio_data = []
-    total_investment = 0
-    total_current_value = 0
-    
-    for item in portfolio_items:
-        try:
-            current_price = get_stock_price(item.symbol)
-            if current_price is None:
-                # Skip items with no current price data
-                logger.warning(f"Unable to fetch current price for {item.symbol}")
-                continue
-                
-            investment = item.quantity * item.buy_price
-            current_value = item.quantity * current_price
-            gain_loss = current_value - investment
-            gain_loss_percent = (gain_loss / investment) * 100 if investment > 0 else 0
-            
-            total_investment += investment
-            total_current_value += current_value
-            
-            portfolio_data.append({
-                'id': item.id,
-                'symbol': item.symbol,
-                'quantity': item.quantity,
-                'buy_price': item.buy_price,
-                'exchange': item.exchange,
-                'current_price': current_price,
-                'investment': investment,
-                'current_value': current_value,
-                'gain_loss': gain_loss,
-                'gain_loss_percent': gain_loss_percent
-            })
-        except Exception as e:
-            logger.error(f"Error processing portfolio item {item.symbol}: {str(e)}")
-    
-    # Calculate total gain/loss
-    total_gain_loss = total_current_value - total_investment
-    total_gain_loss_percent = (total_gain_loss / total_investment) * 100 if total_investment > 0 else 0
-    
-    # Save portfolio history for today if not already saved
-    today = datetime.now().date()
-    existing_history = PortfolioHistory.query.filter_by(
-        user_id=current_user.id, 
-        date=today
-    ).first()
-    
-    if not existing_history and total_current_value > 0:
-        # Get yesterday's record if available to calculate daily change
-        yesterday = today - timedelta(days=1)
-        yesterday_history = PortfolioHistory.query.filter_by(
-            user_id=current_user.id,
-            date=yesterday
-        ).first()
-        
-        daily_change = 0
-        daily_change_percent = 0
-        
-        if yesterday_history:
-            daily_change = total_current_value - yesterday_history.total_value
-            daily_change_percent = (daily_change / yesterday_history.total_value) * 100 if yesterday_history.total_value > 0 else 0
-        
-        try:
-            portfolio_history = PortfolioHistory(
-                user_id=current_user.id,
-                date=today,
-                total_value=total_current_value,
-                daily_change=daily_change,
-                daily_change_percent=daily_change_percent
-            )
-            db.session.add(portfolio_history)
-            db.session.commit()
-            logger.info(f"Saved portfolio history for {today}")
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"Error saving portfolio history: {str(e)}")
-    
-    # Get performance history for chart
-    history_data = PortfolioHistory.query.filter_by(user_id=current_user.id)\
-        .order_by(PortfolioHistory.date).all()
-    
-    # Initialize with empty lists in case there's no data yet
-    dates = []
-    values = []
-    daily_changes = []
-    
-    # Format the data for the chart
-    for h in history_data:
-        if h.date:
-            dates.append(h.date.strftime('%Y-%m-%d'))
-        else:
-            dates.append('')
-            
-        if h.total_value is not None:
-            # Ensure we have a plain Python float, not a SQLAlchemy or decimal type
-            values.append(float(h.total_value))
-        else:
-            values.append(0.0)
-            
-        if h.daily_change_percent is not None:
-            # Ensure we have a plain Python float
-            daily_changes.append(float(h.daily_change_percent))
-        else:
-            daily_changes.append(0.0)
-    
-    # Create a data structure for the charts that is JSON serializable
-    performance_data = {
-        'dates': dates,
-        'values': values,
-        'daily_changes': daily_changes
-    }
-    
-    # Get watchlist items
-    watchlist_items = WatchlistItem.query.filter_by(user_id=current_user.id).all()
-    watchlist_data = []
-    
-    for item in watchlist_items:
-        try:
-            current_price = get_stock_price(item.symbol)
-            if current_price is None:
-                continue
-                
-            daily_change, daily_change_percent = get_daily_change(item.symbol)
-            
-            watchlist_data.append({
-                'id': item.id,
-                'symbol': item.symbol,
-                'exchange': item.exchange,
-                'notes': item.notes,
-                'current_price': current_price,
-                'daily_change': daily_change,
-                'daily_change_percent': daily_change_percent
-            })
-        except Exception as e:
-            logger.error(f"Error processing watchlist item {item.symbol}: {str(e)}")
-    
     return render_template(
         'dashboard.html', 
         title='Dashboard',
         portfolio_form=portfolio_form,
         watchlist_form=watchlist_form,
-        portfolio_data=portfolio_data,
-        total_investment=total_investment,
-        total_current_value=total_current_value,
-        total_gain_loss=total_gain_loss,
-        total_gain_loss_percent=total_gain_loss_percent,
-        performance_data=performance_data,
-        watchlist_data=watchlist_data
+        portfolio_rows=get_portfolio_rows(current_user.id),
+        performance_data=get_performance_data(current_user.id),
+        performance_ranges=list(PERFORMANCE_RANGES),
+        watchlist_rows=get_watchlist_rows(current_user.id),
+        alert_form=PriceAlertForm(),
+        alert_labels=dict(ALERT_TYPES),
+        triggered_alerts=get_triggered_alerts(current_user.id)
     )
 
+@app.route('/api/dashboard')
+@login_required
+def dashboard_api():
+    """Get computed portfolio and watchlist data for the dashboard"""
+    try:
+        # Read the id once: saving today's snapshot commits, which expires current_user
+        user_id = current_user.id
+        return jsonify({
+            'portfolio': build_portfolio_payload(user_id),
+            'watchlist': build_watchlist_payload(user_id)
+        })
+    except Exception as e:
+        logger.error(f"Error building dashboard data: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/portfolio')
+@login_required
+def portfolio_api():
+    """Get computed portfolio holdings, totals and performance history"""
+    range_name = get_performance_range()
+    if range_name is None:
+        return jsonify({'error': 'Unknown range'}), 400
+    
+    try:
+        return jsonify(build_portfolio_payload(current_user.id, range_name))
+    except Exception as e:
+        logger.error(f"Error building portfolio data: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/portfolio/performance')
+@login_required
+def portfolio_performance_api():
+    """Get the portfolio performance series for ?range= (1m, 3m, 1y, 5y or max)"""
+    range_name = get_performance_range()
+    if range_name is None:
+        return jsonify({'error': 'Unknown range'}), 400
+    
+    try:
+        return jsonify(get_performance_data(current_user.id, range_name))
+    except Exception as e:
+        logger.error(f"Error building performance data: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/watchlist')
+@login_required
+def watchlist_api():
+    """Get computed watchlist prices and alerts"""
+    try:
+        return jsonify(build_watchlist_payload(current_user.id))
+    except Exception as e:
+        logger.error(f"Error building watchlist data: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/portfolio/sync', methods=['POST'])
+@csrf.exempt
+def portfolio_sync_api():
+    """Replace the user's portfolio lots with a full holdings snapshot
+    
+    Expects {"lots": [{"symbol", "quantity", "buy_price", "exchange"}, ...]}
+    and either an "Authorization: Bearer <API token>" header (see
+    portfolio_sync) or a logged-in session with an X-CSRFToken header.
+    Pass "dry_run": true to only get the summary. Nothing is changed if any
+    lot is invalid.
+    """
+    # Browsers never send the bearer token by themselves, so token requests
+    # need no CSRF check; session requests still do
+    user = authenticate_api_token(request.headers.get('Authorization', ''))
+    if user is None:
+        if not current_user.is_authenticated:
+            return jsonify({'error': 'Authentication required'}), 401, {'WWW-Authenticate': 'Bearer'}
+        if app.config['WTF_CSRF_ENABLED']:
+            csrf.protect()
+        user = current_user
+    
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get('lots'), list):
+        return jsonify({'error': 'Expected a JSON object with a "lots" list'}), 400
+    
+    lots = payload['lots']
+    if len(lots) > MAX_SYNC_LOTS:
+        return jsonify({'error': f'Too many lots (maximum {MAX_SYNC_LOTS})'}), 400
+    
+    normalized, errors = validate_lots(lots)
+    if errors:
+        return jsonify({'error': 'Invalid lots', 'lots': errors}), 400
+    
+    try:
+        return jsonify(sync_portfolio(user.id, normalized, dry_run=bool(payload.get('dry_run'))))
+    except Exception as e:
+        logger.error(f"Error syncing portfolio: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/portfolio')
 @login_required
 def portfolio():
@@ -309,55 +537,14 @@ def portfolio():
     portfolio_form = PortfolioItemForm()
     
     # Get portfolio items with current prices
-    portfolio_items = PortfolioItem.query.filter_by(user_id=current_user.id).all()
-    portfolio_data = []
-    total_investment = 0
-    total_current_value = 0
-    
-    for item in portfolio_items:
-        try:
-            current_price = get_stock_price(item.symbol)
-            if current_price is None:
-                # Skip items with no current price data
-                logger.warning(f"Unable to fetch current price for {item.symbol}")
-                continue
-                
-            investment = item.quantity * item.buy_price
-            current_value = item.quantity * current_price
-            gain_loss = current_value - investment
-            gain_loss_percent = (gain_loss / investment) * 100 if investment > 0 else 0
-            
-            total_investment += investment
-            total_current_value += current_value
-            
-            portfolio_data.append({
-                'id': item.id,
-                'symbol': item.symbol,
-                'quantity': item.quantity,
-                'buy_price': item.buy_price,
-                'exchange': item.exchange,
-                'current_price': current_price,
-                'investment': investment,
-                'current_value': current_value,
-                'gain_loss': gain_loss,
-                'gain_loss_percent': gain_loss_percent
-            })
-        except Exception as e:
-            logger.error(f"Error processing portfolio item {item.symbol}: {str(e)}")
-    
-    # Calculate total gain/loss
-    total_gain_loss = total_current_value - total_investment
-    total_gain_loss_percent = (total_gain_loss / total_investment) * 100 if total_investment > 0 else 0
+    portfolio_data, totals = get_portfolio_data(current_user.id)
     
     return render_template(
         'portfolio.html', 
         title='My Portfolio',
         portfolio_form=portfolio_form,
         portfolio_data=portfolio_data,
-        total_investment=total_investment,
-        total_current_value=total_current_value,
-        total_gain_loss=total_gain_loss,
-        total_gain_loss_percent=total_gain_loss_percent
+        **totals
     )
 
 @app.route('/watchlist')
@@ -366,35 +553,19 @@ def watchlist():
     """Watchlist page route"""
     watchlist_form = WatchlistItemForm()
     
-    # Get watchlist items
-    watchlist_items = WatchlistItem.query.filter_by(user_id=current_user.id).all()
-    watchlist_data = []
-    
-    for item in watchlist_items:
-        try:
-            current_price = get_stock_price(item.symbol)
-            if current_price is None:
-                continue
-                
-            daily_change, daily_change_percent = get_daily_change(item.symbol)
-            
-            watchlist_data.append({
-                'id': item.id,
-                'symbol': item.symbol,
-                'exchange': item.exchange,
-                'notes': item.notes,
-                'current_price': current_price,
-                'daily_change': daily_change,
-                'daily_change_percent': daily_change_percent
-            })
-        except Exception as e:
-            logger.error(f"Error processing watchlist item {item.symbol}: {str(e)}")
+    # Get watchlist items with batch-refreshed quotes and alerts
+    quote_cursor = make_quote_cursor()
+    watchlist_data = get_watchlist_data(current_user.id)
     
     return render_template(
         'watchlist.html', 
         title='My Watchlist',
+        quote_cursor=quote_cursor,
         watchlist_form=watchlist_form,
-        watchlist_data=watchlist_data
+        watchlist_data=watchlist_data,
+        alert_form=PriceAlertForm(),
+        alert_labels=dict(ALERT_TYPES),
+        triggered_alerts=get_triggered_alerts(current_user.id)
     )
 
 @app.route('/portfolio/add', methods=['POST'])
@@ -547,6 +718,31 @@ def delete_portfolio_item(item_id):
     
     return redirect(url_for('dashboard'))
 
+@app.route('/portfolio/import', methods=['GET', 'POST'])
+@login_required
+def import_portfolio():
+    """Import portfolio lots from a broker CSV export"""
+    form = PortfolioImportForm()
+    result = None
+    
+    if form.validate_on_submit():
+        try:
+            # The upload is parsed straight from its stream, row by row
+            result = import_portfolio_csv(form.csv_file.data.stream, current_user.id)
+            if result.imported:
+                flash(f"Imported {result.imported} lots into your portfolio", "success")
+            if result.skipped:
+                flash(f"Skipped {result.skipped} rows; see the details below", "warning")
+        except ValueError as e:
+            flash(f"Could not import file: {str(e)}", "danger")
+        except Exception as e:
+            logger.error(f"Error importing portfolio: {str(e)}")
+            flash(f"Error importing portfolio: {str(e)}", "danger")
+    elif request.method == 'POST':
+        format_form_errors(form, form.errors)
+    
+    return render_template('import_portfolio.html', title='Import Portfolio', form=form, result=result)
+
 @app.route('/watchlist/add', methods=['POST'])
 @login_required
 def add_watchlist_item():
@@ -657,6 +853,68 @@ def update_watchlist_notes(item_id):
     
     return redirect(url_for('dashboard'))
 
+@app.route('/watchlist/alert/add/<int:item_id>', methods=['POST'])
+@login_required
+def add_price_alert(item_id):
+    """Add a price alert to a watchlist item"""
+    item = WatchlistItem.query.get_or_404(item_id)
+    
+    # Check if the item belongs to the current user
+    if item.user_id != current_user.id:
+        flash("You don't have permission to update this item", "danger")
+        return redirect(url_for('dashboard'))
+    
+    form = PriceAlertForm()
+    if form.validate_on_submit():
+        try:
+            alert = PriceAlert(
+                user_id=current_user.id,
+                watchlist_item_id=item.id,
+                symbol=item.symbol,
+                alert_type=form.alert_type.data,
+                threshold=float(form.threshold.data)
+            )
+            db.session.add(alert)
+            db.session.commit()
+            
+            add_alert_to_index(alert)
+            flash(f"Alert added for {item.symbol}", "success")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error adding price alert: {str(e)}")
+            flash(f"Error adding alert: {str(e)}", "danger")
+    else:
+        try:
+            format_form_errors(form, form.errors)
+        except Exception as e:
+            logger.error(f"Error formatting form errors: {str(e)}")
+            flash("Form validation failed. Please check your inputs.", "danger")
+    
+    return redirect(url_for('dashboard'))
+
+@app.route('/watchlist/alert/delete/<int:alert_id>', methods=['POST'])
+@login_required
+def delete_price_alert(alert_id):
+    """Delete a price alert"""
+    alert = PriceAlert.query.get_or_404(alert_id)
+    
+    # Check if the alert belongs to the current user
+    if alert.user_id != current_user.id:
+        flash("You don't have permission to delete this alert", "danger")
+        return redirect(url_for('dashboard'))
+    
+    try:
+        remove_alert_from_index(alert)
+        db.session.delete(alert)
+        db.session.commit()
+        flash(f"Alert for {alert.symbol} has been removed", "success")
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error deleting price alert: {str(e)}")
+        flash(f"Error removing alert: {str(e)}", "danger")
+    
+    return redirect(url_for('dashboard'))
+
 @app.route('/stock/search')
 @login_required
 def search_stocks():
@@ -666,21 +924,111 @@ def search_stocks():
         return jsonify([])
     
     try:
-        results = get_stock_symbols(query)
-        return jsonify(results)
+        # Results only change when the daily symbol list does
+        list_timestamp = get_symbol_list_timestamp()
+        return conditional_json(
+            lambda: get_stock_symbols(query),
+            etag=make_etag('search', query.upper(), list_timestamp),
+            last_modified=list_timestamp,
+            max_age=SEARCH_CACHE_MAX_AGE
+        )
     except Exception as e:
         logger.error(f"Error searching for stocks: {str(e)}")
         return jsonify([])
 
+@app.route('/stock/quotes')
+@login_required
+def get_stock_quotes_api():
+    """Get price and daily change for several comma-separated symbols in one request"""
+    symbols = []
+    for symbol in request.args.get('symbols', '').split(','):
+        symbol = symbol.strip()
+        if symbol and symbol not in symbols:
+            symbols.append(symbol)
+    
+    if not symbols:
+        return jsonify({'error': 'No symbols provided'}), 400
+    if len(symbols) > MAX_QUOTE_SYMBOLS:
+        return jsonify({'error': f'At most {MAX_QUOTE_SYMBOLS} symbols per request'}), 400
+    
+    try:
+        cursor = make_quote_cursor()
+        quotes = get_quotes(symbols)
+        return jsonify({
+            'quotes': {symbol: serialize_quote(quote) for symbol, quote in quotes.items()},
+            'missing': [symbol for symbol in symbols if symbol not in quotes],
+            'cursor': cursor
+        })
+    except Exception as e:
+        logger.error(f"Error getting stock quotes: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/stock/quotes/changes')
+@login_required
+def get_stock_quote_changes_api():
+    """Get quotes for the user's symbols that changed after the ?since= cursor
+    
+    Without a usable cursor (first call, or a malformed one) every quote is
+    returned and 'reset' is true. Cursors from any worker can be used. Clients
+    pass the returned cursor on their next call, so unchanged quotes are never
+    re-sent.
+    """
+    try:
+        since = parse_quote_cursor(request.args.get('since'))
+        symbols = get_user_symbols(current_user.id)
+        
+        # Read the version before refreshing so no update can be skipped
+        version = get_quote_version()
+        refresh_quotes(symbols)
+        quotes = get_quotes_since(since, symbols)
+        
+        return jsonify({
+            'quotes': {symbol: serialize_quote(quote) for symbol, quote in quotes.items()},
+            'cursor': make_quote_cursor(max([version] + [quote['version'] for quote in quotes.values()])),
+            'reset': since == 0
+        })
+    except Exception as e:
+        logger.error(f"Error getting quote changes: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/stream/quotes')
+@login_required
+def stream_quotes():
+    """Server-Sent Events stream of quote changes for the user's portfolio and watchlist"""
+    if not app.config.get('QUOTE_STREAM_ENABLED'):
+        return jsonify({'error': 'Quote streaming is not enabled'}), 404
+    
+    symbols = get_user_symbols(current_user.id)
+    if not symbols:
+        # 204 tells EventSource clients not to reconnect
+        return Response(status=204)
+    
+    # EventSource sends Last-Event-ID on reconnect; the query parameter lets a fresh page resume too
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    
+    return Response(
+        quote_events(symbols, parse_quote_cursor(last_event_id)),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @app.route('/stock/price/<symbol>')
 @login_required
 def get_stock_price_api(symbol):
     """Get the current price of a stock"""
     try:
-        price = get_stock_price(symbol)
-        if price is None:
+        quote = get_quotes([symbol]).get(symbol)
+        if quote is None:
             return jsonify({'error': 'Symbol not found'}), 404
-        return jsonify({'symbol': symbol, 'price': price})
+        return conditional_json(
+            lambda: {'symbol': symbol, 'price': quote['price']},
+            etag=make_etag('price', symbol, quote['price'], quote['updated_at']),
+            last_modified=quote['updated_at'],
+            max_age=quote_max_age(quote)
+        )
     except Exception as e:
         logger.error(f"Error getting stock price: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -690,113 +1038,90 @@ def get_stock_price_api(symbol):
 def get_stock_daily_change_api(symbol):
     """Get the daily change of a stock"""
     try:
-        change, change_percent = get_daily_change(symbol)
-        return jsonify({
-            'symbol': symbol,
-            'change': change,
-            'change_percent': change_percent
-        })
+        quote = get_quotes([symbol]).get(symbol)
+        if quote is None:
+            # Keep the historical behaviour of reporting no change for unknown symbols
+            return jsonify({'symbol': symbol, 'change': 0, 'change_percent': 0})
+        return conditional_json(
+            lambda: {
+                'symbol': symbol,
+                'change': quote['change'],
+                'change_percent': quote['change_percent']
+            },
+            etag=make_etag('daily-change', symbol, quote['change'], quote['change_percent'], quote['updated_at']),
+            last_modified=quote['updated_at'],
+            max_age=quote_max_age(quote)
+        )
     except Exception as e:
         logger.error(f"Error getting daily change: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/export/<name>.<export_format>')
+@login_required
+def export_data(name, export_format):
+    """Stream the user's portfolio, watchlist or history as CSV or NDJSON"""
+    if name not in EXPORTS or export_format not in EXPORT_FORMATS:
+        abort(404)
+    
+    filename = f"{name}_{datetime.now().strftime('%Y%m%d')}.{export_format}"
+    return Response(
+        stream_with_context(stream_export(name, export_format, current_user.id)),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 @app.route('/reports')
 @login_required
 def reports():
     """View reports page"""
     form = ReportGeneratorForm()
-    return render_template('reports.html', title='Reports', form=form)
+    return render_template(
+        'reports.html',
+        title='Reports',
+        form=form,
+        jobs=[serialize_report_job(job) for job in get_recent_jobs(current_user.id)],
+        download_job_id=request.args.get('job')
+    )
 
 @app.route('/reports/generate', methods=['POST'])
 @login_required
 def generate_report():
-    """Generate a portfolio report"""
+    """Generate a portfolio report
+    
+    Browsers get small portfolios' reports directly, rendered in memory.
+    Otherwise the report is generated in the background: browsers are
+    redirected to the reports page, which polls the job and downloads the
+    file when it is ready, and clients asking for JSON get the job with a
+    202 status.
+    """
+    wants_json = request.accept_mimetypes.best == 'application/json'
     form = ReportGeneratorForm()
     if form.validate_on_submit():
-        report_type = form.report_type.data
+        portfolio_items = get_user_data(current_user.id).portfolio_items()
+        if not portfolio_items:
+            message = "You don't have any items in your portfolio to generate a report"
+            if wants_json:
+                return jsonify({'error': message}), 400
+            flash(message, "warning")
+            return redirect(url_for('reports'))
         
         try:
-            # Get portfolio data
-            portfolio_items = PortfolioItem.query.filter_by(user_id=current_user.id).all()
-            portfolio_data = []
-            total_investment = 0
-            total_current_value = 0
-            top_gainer = None
-            top_loser = None
-            
-            for item in portfolio_items:
-                current_price = get_stock_price(item.symbol)
-                if current_price is None:
-                    continue
-                    
-                investment = item.quantity * item.buy_price
-                current_value = item.quantity * current_price
-                gain_loss = current_value - investment
-                gain_loss_percent = (gain_loss / investment) * 100 if investment > 0 else 0
-                
-                total_investment += investment
-                total_current_value += current_value
-                
-                item_data = {
-                    'symbol': item.symbol,
-                    'quantity': item.quantity,
-                    'buy_price': item.buy_price,
-                    'current_price': current_price,
-                    'investment': investment,
-                    'current_value': current_value,
-                    'gain_loss': gain_loss,
-                    'gain_loss_percent': gain_loss_percent
-                }
-                portfolio_data.append(item_data)
-                
-                # Track top gainer and loser
-                if top_gainer is None or gain_loss_percent > top_gainer['gain_percent']:
-                    top_gainer = {'symbol': item.symbol, 'gain_percent': gain_loss_percent}
-                
-                if top_loser is None or gain_loss_percent < top_loser['loss_percent']:
-                    top_loser = {'symbol': item.symbol, 'loss_percent': gain_loss_percent}
+            if not wants_json and len(portfolio_items) <= REPORT_INLINE_MAX_ITEMS:
+                content, download_name = render_report(current_user.id, form.report_type.data)
+                return send_file(io.BytesIO(content), as_attachment=True, download_name=download_name)
             
-            if not portfolio_data:
-                flash("You don't have any items in your portfolio to generate a report", "warning")
-                return redirect(url_for('reports'))
-            
-            # Prepare report data
-            now = datetime.now()
-            report_data = {
-                'username': current_user.username,
-                'month': now.strftime('%B'),
-                'year': now.strftime('%Y'),
-                'total_investment': total_investment,
-                'total_current_value': total_current_value,
-                'net_gain_loss': total_current_value - total_investment,
-                'net_gain_loss_percent': ((total_current_value - total_investment) / total_investment) * 100 if total_investment > 0 else 0,
-                'portfolio': portfolio_data,
-                'top_gainer': top_gainer,
-                'top_loser': top_loser
-            }
-            
-            # Generate report based on selected type
-            if report_type == 'pdf':
-                output_path = generate_monthly_report_pdf(report_data)
-                if output_path:
-                    return send_file(
-                        output_path,
-                        as_attachment=True,
-                        download_name=f"portfolio_report_{now.strftime('%Y%m%d')}.pdf"
-                    )
-            elif report_type == 'excel':
-                output_path = generate_monthly_report_excel(report_data)
-                if output_path:
-                    return send_file(
-                        output_path,
-                        as_attachment=True,
-                        download_name=f"portfolio_report_{now.strftime('%Y%m%d')}.xlsx"
-                    )
-            
-            flash("Error generating report", "danger")
+            job = enqueue_report_job(current_user.id, form.report_type.data)
+            if wants_json:
+                return jsonify(serialize_report_job(job)), 202
+            flash("Your report is being generated and will download when it is ready.", "info")
+            return redirect(url_for('reports', job=job.id))
         except Exception as e:
             logger.error(f"Error generating report: {str(e)}")
+            if wants_json:
+                return jsonify({'error': str(e)}), 500
             flash(f"Error generating report: {str(e)}", "danger")
+    elif wants_json:
+        return jsonify({'error': 'Invalid report request', 'fields': form.errors}), 400
     else:
         try:
             format_form_errors(form, form.errors)
@@ -806,6 +1131,50 @@ def generate_report():
     
     return redirect(url_for('reports'))
 
+@app.route('/reports/jobs/<job_id>')
+@login_required
+def report_job_status(job_id):
+    """Get the status of one of the user's report jobs"""
+    job = ReportJob.query.filter_by(id=job_id, user_id=current_user.id).first()
+    if job is None:
+        return jsonify({'error': 'Report job not found'}), 404
+    
+    try:
+        return jsonify(serialize_report_job(expire_stalled_job(job)))
+    except Exception as e:
+        logger.error(f"Error getting report job status: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/reports/jobs/<job_id>/file')
+@login_required
+def report_job_file(job_id):
+    """Download the file of a finished report job"""
+    job = ReportJob.query.filter_by(id=job_id, user_id=current_user.id).first()
+    if job is None:
+        return jsonify({'error': 'Report job not found'}), 404
+    if job.status != 'done':
+        return jsonify({'error': f'Report is {job.status}', 'status': job.status}), 409
+    if not job.file_path or not os.path.exists(job.file_path):
+        return jsonify({'error': 'Report file is no longer available'}), 410
+    
+    return send_file(job.file_path, as_attachment=True, download_name=job.download_name)
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics for every worker process (see metrics.py), for scrapers holding METRICS_TOKEN"""
+    token = app.config.get("METRICS_TOKEN")
+    if not token:
+        abort(404)
+    if not scrape_authorized(request.headers.get('Authorization', ''), token):
+        return Response('Unauthorized\n', status=401, headers={'WWW-Authenticate': 'Bearer'})
+    
+    try:
+        body, content_type = render_metrics()
+        return Response(body, content_type=content_type)
+    except Exception as e:
+        logger.error(f"Error rendering metrics: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.errorhandler(404)
 def page_not_found(e):
     """Handle 404 errors"""
@@ -3,6 +3,10 @@
  * Handles rendering of portfolio performance and other visualizations
  */
 
+// Chart instances, kept so they can be updated with fresh data
+let performanceChart = null;
+let dailyChangeChart = null;
+
 // Initialize portfolio performance chart when DOM is loaded
 document.addEventListener('DOMContentLoaded', function() {
     initializePerformanceChart();
@@ -35,7 +39,7 @@ function initializePerformanceChart() {
     
     // Create the performance chart
     const ctx = performanceChartElement.getContext('2d');
-    const performanceChart = new Chart(ctx, {
+    performanceChart = new Chart(ctx, {
         type: 'line',
         data: {
             labels: chartData.dates,
@@ -104,7 +108,7 @@ function initializePerformanceChart() {
     const dailyChangeElement = document.getElementById('dailyChangeChart');
     if (dailyChangeElement) {
         const ctxDaily = dailyChangeElement.getContext('2d');
-        const dailyChangeChart = new Chart(ctxDaily, {
+        dailyChangeChart = new Chart(ctxDaily, {
             type: 'bar',
             data: {
                 labels: chartData.dates,
@@ -166,3 +170,32 @@ function initializePerformanceChart() {
         });
     }
 }
+
+/**
+ * Replace the data shown in the performance charts
+ */
+function updatePerformanceCharts(chartData) {
+    if (!chartData || !chartData.dates) return;
+    
+    // Daily rows, or weekly/monthly rollups for long ranges
+    const changeLabel = `${chartData.interval.charAt(0).toUpperCase()}${chartData.interval.slice(1)} Change (%)`;
+    const changeTitle = document.getElementById('change-chart-title');
+    if (changeTitle) changeTitle.textContent = changeLabel;
+    
+    if (chartData.dates.length === 0) {
+        chartData = Object.assign({}, chartData, { dates: ['No data'], values: [0], daily_changes: [0] });
+    }
+    
+    if (performanceChart) {
+        performanceChart.data.labels = chartData.dates;
+        performanceChart.data.datasets[0].data = chartData.values;
+        performanceChart.update();
+    }
+    
+    if (dailyChangeChart) {
+        dailyChangeChart.data.labels = chartData.dates;
+        dailyChangeChart.data.datasets[0].data = chartData.daily_changes;
+        dailyChangeChart.data.datasets[0].label = changeLabel;
+        dailyChangeChart.update();
+    }
+}
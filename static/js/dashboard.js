@@ -5,8 +5,219 @@
 // Initialize on DOM load
 document.addEventListener('DOMContentLoaded', function() {
     setupTabPersistence();
+    setupPerformanceRanges();
+    loadDashboardSections();
 });
 
+/**
+ * Load the price-dependent dashboard sections
+ * Each section is fetched independently so a slow one doesn't hold back the other
+ */
+function loadDashboardSections() {
+    const summary = document.getElementById('portfolio-summary');
+    if (summary) {
+        loadPortfolioSection(summary.dataset.apiUrl);
+    }
+    
+    const watchlistTable = document.getElementById('watchlist-table');
+    if (watchlistTable) {
+        loadWatchlistSection(watchlistTable.dataset.apiUrl);
+    }
+}
+
+/**
+ * Fetch JSON from an API endpoint, throwing on HTTP errors
+ */
+async function fetchJson(url) {
+    const response = await fetch(url, { headers: { 'Accept': 'application/json' } });
+    if (!response.ok) throw new Error(`Request to ${url} failed with status ${response.status}`);
+    return response.json();
+}
+
+/**
+ * Set the text and gain/loss styling of an element based on a signed value
+ */
+function setSignedValue(element, value, text) {
+    if (!element) return;
+    element.textContent = text;
+    element.classList.remove('gain', 'loss');
+    element.classList.add(value >= 0 ? 'gain' : 'loss');
+}
+
+/**
+ * Update a holdings row for a new current price
+ */
+function renderPortfolioRow(row, currentPrice) {
+    const quantity = parseFloat(row.dataset.quantity);
+    const investment = parseFloat(row.dataset.investment);
+    const currentValue = quantity * currentPrice;
+    const gainLoss = currentValue - investment;
+    const gainLossPercent = investment > 0 ? (gainLoss / investment) * 100 : 0;
+    
+    row.dataset.currentPrice = currentPrice;
+    row.querySelector('.current-price').textContent = formatters.currency(currentPrice);
+    row.querySelector('.current-value').textContent = formatters.currency(currentValue);
+    setSignedValue(row.querySelector('.gain-loss'), gainLoss, formatters.currency(gainLoss));
+    setSignedValue(row.querySelector('.gain-loss-percent'), gainLossPercent, formatters.percent(gainLossPercent));
+}
+
+/**
+ * Update the summary boxes from portfolio totals
+ */
+function renderPortfolioSummary(totals) {
+    const summary = document.getElementById('portfolio-summary');
+    if (!summary) return;
+    
+    summary.querySelector('[data-field="total_investment"]').textContent = formatters.currency(totals.total_investment);
+    summary.querySelector('[data-field="total_current_value"]').textContent = formatters.currency(totals.total_current_value);
+    summary.querySelector('[data-field="updated_at"]').textContent = 'Updated: ' + new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
+    setSignedValue(summary.querySelector('[data-field="total_gain_loss"]'), totals.total_gain_loss, formatters.currency(totals.total_gain_loss));
+    setSignedValue(summary.querySelector('[data-field="total_gain_loss_percent"]'), totals.total_gain_loss_percent, formatters.percent(totals.total_gain_loss_percent));
+    
+    ['total_gain_loss', 'total_gain_loss_percent'].forEach(field => {
+        const value = totals[field];
+        const box = summary.querySelector(`[data-sign-box="${field}"]`);
+        box.classList.remove('summary-box-gain', 'summary-box-loss');
+        box.classList.add(value >= 0 ? 'summary-box-gain' : 'summary-box-loss');
+        
+        const badge = summary.querySelector(`[data-badge="${field}"]`);
+        const sign = value >= 0 ? '+' : '';
+        badge.className = `summary-box-badge ${value >= 0 ? 'bg-success' : 'bg-danger'}`;
+        badge.textContent = field === 'total_gain_loss'
+            ? sign + formatters.currency(value)
+            : sign + formatters.percent(value);
+    });
+}
+
+/**
+ * Recompute portfolio totals from the priced holdings rows
+ */
+function recomputePortfolioSummary() {
+    let totalInvestment = 0;
+    let totalCurrentValue = 0;
+    
+    document.querySelectorAll('.portfolio-item').forEach(row => {
+        if (row.dataset.currentPrice === undefined) return;
+        totalInvestment += parseFloat(row.dataset.investment);
+        totalCurrentValue += parseFloat(row.dataset.quantity) * parseFloat(row.dataset.currentPrice);
+    });
+    
+    const totalGainLoss = totalCurrentValue - totalInvestment;
+    renderPortfolioSummary({
+        total_investment: totalInvestment,
+        total_current_value: totalCurrentValue,
+        total_gain_loss: totalGainLoss,
+        total_gain_loss_percent: totalInvestment > 0 ? (totalGainLoss / totalInvestment) * 100 : 0
+    });
+}
+
+/**
+ * Apply changed quotes (from the watchlist.js change feed) to the holdings table
+ */
+function applyPortfolioQuotes(quotes) {
+    let changed = false;
+    document.querySelectorAll('.portfolio-item').forEach(row => {
+        const quote = quotes[row.dataset.symbol];
+        if (!quote) return;
+        renderPortfolioRow(row, quote.price);
+        changed = true;
+    });
+    if (changed) recomputePortfolioSummary();
+}
+
+/**
+ * Fill the portfolio summary, holdings table and performance charts
+ */
+async function loadPortfolioSection(url) {
+    const summary = document.getElementById('portfolio-summary');
+    
+    try {
+        const data = await fetchJson(url);
+        if (typeof setQuoteCursor === 'function') setQuoteCursor(data.quote_cursor);
+        
+        renderPortfolioSummary(data);
+        
+        data.items.forEach(item => {
+            const row = document.querySelector(`.portfolio-item[data-item-id="${item.id}"]`);
+            if (row) renderPortfolioRow(row, item.current_price);
+        });
+        
+        data.unpriced_ids.forEach(id => {
+            const row = document.querySelector(`.portfolio-item[data-item-id="${id}"]`);
+            if (row) row.querySelector('.current-price').textContent = 'N/A';
+        });
+        
+        // Skip the default range if another one was picked while this loaded
+        const activeRange = document.querySelector('#performance-ranges .active');
+        if (typeof updatePerformanceCharts === 'function'
+                && (!activeRange || activeRange.dataset.range === data.performance.range)) {
+            updatePerformanceCharts(data.performance);
+        }
+        
+        // Keep holdings current from the periodic quote change feed
+        document.addEventListener('quotes:changed', event => applyPortfolioQuotes(event.detail));
+    } catch (error) {
+        console.error('Error loading portfolio data:', error);
+        summary.querySelectorAll('.summary-box-value').forEach(el => { el.textContent = 'Unavailable'; });
+        document.querySelectorAll('.portfolio-item .current-price').forEach(el => { el.textContent = 'N/A'; });
+    }
+}
+
+/**
+ * Switch the performance charts between ranges; longer ranges are served from rollups
+ */
+function setupPerformanceRanges() {
+    const group = document.getElementById('performance-ranges');
+    if (!group) return;
+    
+    group.querySelectorAll('[data-range]').forEach(button => {
+        button.addEventListener('click', async function() {
+            group.querySelectorAll('[data-range]').forEach(other => other.classList.toggle('active', other === button));
+            
+            try {
+                const data = await fetchJson(`${group.dataset.apiUrl}?range=${encodeURIComponent(button.dataset.range)}`);
+                if (button.classList.contains('active')) updatePerformanceCharts(data);
+            } catch (error) {
+                console.error('Error loading performance data:', error);
+            }
+        });
+    });
+}
+
+/**
+ * Fill watchlist prices and daily changes
+ */
+async function loadWatchlistSection(url) {
+    const rows = document.querySelectorAll('#watchlist-table .watchlist-item');
+    
+    try {
+        const data = await fetchJson(url);
+        if (typeof setQuoteCursor === 'function') setQuoteCursor(data.quote_cursor);
+        
+        const itemsById = {};
+        data.items.forEach(item => { itemsById[item.id] = item; });
+        
+        rows.forEach(row => {
+            const item = itemsById[row.dataset.itemId];
+            const priceElement = row.querySelector('.current-price');
+            const changeElement = row.querySelector('.daily-change');
+            
+            if (!item) {
+                priceElement.textContent = 'N/A';
+                return;
+            }
+            
+            const sign = item.daily_change >= 0 ? '+' : '';
+            priceElement.textContent = formatters.currency(item.current_price);
+            changeElement.textContent = `${sign}${item.daily_change.toFixed(2)} (${sign}${item.daily_change_percent.toFixed(2)}%)`;
+            changeElement.className = `daily-change ${item.daily_change >= 0 ? 'text-success' : 'text-danger'}`;
+        });
+    } catch (error) {
+        console.error('Error loading watchlist data:', error);
+        rows.forEach(row => { row.querySelector('.current-price').textContent = 'N/A'; });
+    }
+}
+
 /**
  * Setup persistence for dashboard tabs
  * This remembers which tab was active between page reloads
@@ -0,0 +1,89 @@
+/**
+ * Report job polling for the Investment Dashboard
+ * Reports are generated in the background; this keeps their status current
+ * and downloads the one just requested when it is ready.
+ */
+
+// Milliseconds between status checks for unfinished jobs
+const REPORT_POLL_INTERVAL = 2000;
+
+const STATUS_BADGES = {
+    queued: 'secondary',
+    running: 'info',
+    done: 'success',
+    failed: 'danger'
+};
+
+// Initialize on DOM load
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('.report-job').forEach(row => {
+        if (row.dataset.status === 'queued' || row.dataset.status === 'running') {
+            pollReportJob(row);
+        } else if (row.dataset.status === 'done') {
+            downloadIfRequested(row, row.querySelector('.job-action a')?.href);
+        }
+    });
+});
+
+/**
+ * Check a job's status until it finishes, then show its result
+ */
+async function pollReportJob(row) {
+    try {
+        const response = await fetch(row.dataset.statusUrl, { headers: { 'Accept': 'application/json' } });
+        if (!response.ok) throw new Error(`Status request failed with status ${response.status}`);
+        const job = await response.json();
+
+        renderReportJob(row, job);
+        if (job.status === 'queued' || job.status === 'running') {
+            setTimeout(() => pollReportJob(row), REPORT_POLL_INTERVAL);
+        } else if (job.status === 'done') {
+            downloadIfRequested(row, job.file_url);
+        }
+    } catch (error) {
+        console.error('Error checking report status:', error);
+        setTimeout(() => pollReportJob(row), REPORT_POLL_INTERVAL * 5);
+    }
+}
+
+/**
+ * Update a job row's status badge, error and download link
+ */
+function renderReportJob(row, job) {
+    row.dataset.status = job.status;
+
+    const status = row.querySelector('.job-status');
+    status.innerHTML = '';
+    const badge = document.createElement('span');
+    badge.className = `badge bg-${STATUS_BADGES[job.status]}`;
+    badge.textContent = job.status.charAt(0).toUpperCase() + job.status.slice(1);
+    status.appendChild(badge);
+
+    if (job.error) {
+        const error = document.createElement('div');
+        error.className = 'small text-danger';
+        error.textContent = job.error;
+        status.appendChild(error);
+    }
+
+    if (job.file_url && !row.querySelector('.job-action a')) {
+        const link = document.createElement('a');
+        link.href = job.file_url;
+        link.className = 'btn btn-sm btn-outline-primary';
+        link.innerHTML = '<i class="fas fa-download me-1"></i>Download';
+        row.querySelector('.job-action').appendChild(link);
+    }
+}
+
+/**
+ * Start the download of the job requested just before this page loaded, once
+ */
+function downloadIfRequested(row, fileUrl) {
+    const jobs = document.getElementById('report-jobs');
+    if (!fileUrl || jobs.dataset.downloadJob !== row.dataset.jobId) return;
+
+    jobs.dataset.downloadJob = '';
+    // Drop ?job= so reloading the page doesn't download the report again
+    history.replaceState(null, '', window.location.pathname);
+    window.location.href = fileUrl;
+}
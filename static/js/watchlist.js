@@ -2,8 +2,24 @@
  * Watchlist functionality for the Investment Dashboard
  */
 
+// Watchlist auto-refresh interval and the time of the last refresh
+const WATCHLIST_REFRESH_INTERVAL = 3 * 60 * 1000;
+let lastWatchlistRefresh = Date.now();
+
+// Quote cursor from the server; only quotes changed after it are fetched or streamed
+let quoteCursor = null;
+
+// Server-Sent Events source, when quote streaming is enabled
+let quoteStream = null;
+
 // Initialize on DOM load
 document.addEventListener('DOMContentLoaded', function() {
+    const cursorElement = document.querySelector('[data-quote-cursor]');
+    if (cursorElement) setQuoteCursor(cursorElement.dataset.quoteCursor);
+    
+    // Changed quotes are broadcast as a 'quotes:changed' event so other scripts can use them
+    document.addEventListener('quotes:changed', event => applyWatchlistQuotes(event.detail));
+    
     initWatchlistNotes();
     initWatchlistRefresh();
 });
@@ -81,8 +97,92 @@ function initWatchlistRefresh() {
         }
     });
     
-    // Auto-refresh every 3 minutes for real-time data
-    setInterval(refreshWatchlistPrices, 3 * 60 * 1000);
+    // Prefer pushed updates when the server has quote streaming enabled
+    if (initQuoteStream()) return;
+    
+    // Auto-refresh every 3 minutes for real-time data, skipped while the tab is hidden
+    setInterval(function() {
+        if (!document.hidden) autoRefreshWatchlistPrices();
+    }, WATCHLIST_REFRESH_INTERVAL);
+    
+    // Catch up as soon as a hidden tab becomes visible again
+    document.addEventListener('visibilitychange', function() {
+        if (!document.hidden && Date.now() - lastWatchlistRefresh >= WATCHLIST_REFRESH_INTERVAL) {
+            autoRefreshWatchlistPrices();
+        }
+    });
+}
+
+/**
+ * Subscribe to the server's quote stream, if enabled; returns true when streaming
+ * The stream is closed while the tab is hidden and resumed from the last event id
+ */
+function initQuoteStream() {
+    const streamUrl = document.body.dataset.quoteStreamUrl;
+    if (!streamUrl || !window.EventSource) return false;
+    if (document.querySelectorAll('.watchlist-item, .portfolio-item').length === 0) return false;
+    
+    const openStream = function() {
+        const url = quoteCursor ? `${streamUrl}?last_event_id=${encodeURIComponent(quoteCursor)}` : streamUrl;
+        quoteStream = new EventSource(url);
+        quoteStream.addEventListener('quotes', function(event) {
+            quoteCursor = event.lastEventId || quoteCursor;
+            publishQuotes(JSON.parse(event.data));
+        });
+    };
+    
+    document.addEventListener('visibilitychange', function() {
+        if (document.hidden && quoteStream) {
+            quoteStream.close();
+            quoteStream = null;
+        } else if (!document.hidden && !quoteStream) {
+            openStream();
+        }
+    });
+    
+    if (!document.hidden) openStream();
+    return true;
+}
+
+/**
+ * Background refresh that fetches only quotes changed since the last cursor
+ * and logs failures instead of surfacing them
+ */
+function autoRefreshWatchlistPrices() {
+    refreshQuoteChanges().catch(error => console.error('Error auto-refreshing prices:', error));
+}
+
+/**
+ * Remember a quote cursor from the server
+ * When two cursors are offered, keep the older one so no change is missed
+ */
+function setQuoteCursor(cursor) {
+    if (!cursor) return;
+    if (quoteCursor && parseFloat(cursor) >= parseFloat(quoteCursor)) return;
+    quoteCursor = cursor;
+}
+
+/**
+ * Broadcast changed quotes to every listener on the page
+ */
+function publishQuotes(quotes) {
+    if (!quotes || Object.keys(quotes).length === 0) return;
+    document.dispatchEvent(new CustomEvent('quotes:changed', { detail: quotes }));
+}
+
+/**
+ * Fetch quotes for the user's symbols that changed since the last cursor
+ */
+async function refreshQuoteChanges() {
+    lastWatchlistRefresh = Date.now();
+    
+    const url = quoteCursor ? `/stock/quotes/changes?since=${encodeURIComponent(quoteCursor)}` : '/stock/quotes/changes';
+    const response = await fetch(url);
+    if (!response.ok) throw new Error(`Quote changes request failed with status ${response.status}`);
+    
+    const data = await response.json();
+    quoteCursor = data.cursor;
+    publishQuotes(data.quotes);
 }
 
 /**
@@ -117,59 +217,44 @@ function showNotification(message, type = 'info') {
 }
 
 /**
- * Refresh all watchlist prices
+ * Refresh all watchlist prices with a single batch quote request
  */
 async function refreshWatchlistPrices() {
     const watchlistItems = document.querySelectorAll('.watchlist-item');
+    const symbols = [...new Set(Array.from(watchlistItems, item => item.dataset.symbol).filter(Boolean))];
+    if (symbols.length === 0) return;
     
-    for (const item of watchlistItems) {
-        const symbol = item.dataset.symbol;
-        const priceElement = item.querySelector('.current-price');
-        const changeElement = item.querySelector('.daily-change');
-        
-        if (symbol && priceElement) {
-            try {
-                const response = await fetch(`/stock/price/${encodeURIComponent(symbol)}`);
-                if (!response.ok) continue;
-                
-                const data = await response.json();
-                
-                // Update price
-                if (priceElement) {
-                    priceElement.textContent = formatCurrency(data.price);
-                }
-                
-                // Get daily change data
-                const [change, changePercent] = await getStockDailyChange(symbol);
-                
-                // Update change display
-                if (changeElement && change !== null && changePercent !== null) {
-                    const changeClass = change >= 0 ? 'text-success' : 'text-danger';
-                    const changeSign = change >= 0 ? '+' : '';
-                    changeElement.textContent = `${changeSign}${change.toFixed(2)} (${changeSign}${changePercent.toFixed(2)}%)`;
-                    changeElement.className = `daily-change ${changeClass}`;
-                }
-                
-            } catch (error) {
-                console.error(`Error refreshing ${symbol}:`, error);
-            }
-        }
-    }
+    lastWatchlistRefresh = Date.now();
+    
+    const response = await fetch(`/stock/quotes?symbols=${encodeURIComponent(symbols.join(','))}`);
+    if (!response.ok) throw new Error(`Quote request failed with status ${response.status}`);
+    
+    const data = await response.json();
+    publishQuotes(data.quotes);
 }
 
 /**
- * Get daily change data for a stock
+ * Update watchlist rows from a {symbol: {price, change, change_percent}} map
  */
-async function getStockDailyChange(symbol) {
-    try {
-        const response = await fetch(`/stock/daily-change/${encodeURIComponent(symbol)}`);
-        if (!response.ok) return [null, null];
+function applyWatchlistQuotes(quotes) {
+    for (const item of document.querySelectorAll('.watchlist-item')) {
+        const quote = quotes[item.dataset.symbol];
+        const priceElement = item.querySelector('.current-price');
+        const changeElement = item.querySelector('.daily-change');
+        if (!quote) continue;
         
-        const data = await response.json();
-        return [data.change, data.change_percent];
-    } catch (error) {
-        console.error(`Error getting daily change for ${symbol}:`, error);
-        return [null, null];
+        // Update price
+        if (priceElement) {
+            priceElement.textContent = formatCurrency(quote.price);
+        }
+        
+        // Update change display
+        if (changeElement && quote.change !== null && quote.change_percent !== null) {
+            const changeClass = quote.change >= 0 ? 'text-success' : 'text-danger';
+            const changeSign = quote.change >= 0 ? '+' : '';
+            changeElement.textContent = `${changeSign}${quote.change.toFixed(2)} (${changeSign}${quote.change_percent.toFixed(2)}%)`;
+            changeElement.className = `daily-change ${changeClass}`;
+        }
     }
 }
 
@@ -1,14 +1,62 @@
-import yfinance as yf
-import pandas as pd
 import logging
 from datetime import datetime, timedelta
-import requests
+import os
+import csv
+import threading
+import time
+import math
 from functools import lru_cache
 
+try:
+    import gevent
+    from gevent import monkey as gevent_monkey
+except ImportError:  # gevent is only needed for the asynchronous serving mode
+    gevent = None
+
+from lazy_imports import LazyModule
+from metrics import record_cache_lookup, record_upstream_call
+from tracing import start_span
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Imported on the first quote fetch rather than at startup
+yf = LazyModule('yfinance')
+pd = LazyModule('pandas')
+
+# Native threads available per worker for provider calls under gevent
+PROVIDER_THREADS = int(os.environ.get("PROVIDER_THREADS", "10"))
+
+def _provider_call(function, func, *args, span_attributes=None, **kwargs):
+    """Call the market-data provider without stalling other requests in this worker.
+
+    yfinance fetches through curl_cffi, whose C-level sockets gevent cannot
+    patch, so under gevent workers the call runs in the hub's native thread
+    pool and only the calling greenlet waits for it.
+
+    The call is recorded in the upstream call metrics under `function`, the
+    name of the function making it, and traced as a span carrying
+    span_attributes (symbol, ticker, attempt) and the outcome.
+    """
+    started = time.perf_counter()
+    outcome = 'error'
+    with start_span(f"yfinance.{getattr(func, '__name__', 'call')}", kind='client', function=function,
+                    **(span_attributes or {})) as span:
+        try:
+            if gevent is not None and gevent_monkey.is_module_patched('socket'):
+                threadpool = gevent.get_hub().threadpool
+                if threadpool.maxsize < PROVIDER_THREADS:
+                    threadpool.maxsize = PROVIDER_THREADS
+                result = threadpool.apply(func, args, kwargs)
+            else:
+                result = func(*args, **kwargs)
+            outcome = 'empty' if getattr(result, 'empty', False) else 'ok'
+            return result
+        finally:
+            span.set_attribute('outcome', outcome)
+            record_upstream_call(function, outcome, time.perf_counter() - started)
+
 # Cache stock prices for 2 minutes to ensure more recent data
 @lru_cache(maxsize=256)
 def get_stock_price_cached(symbol, timestamp=None):
@@ -33,7 +81,10 @@ def get_stock_price_cached(symbol, timestamp=None):
         ticker = yf.Ticker(ticker_symbol)
         
         # Get the latest price
-        data = ticker.history(period="1d")
+        data = _provider_call(
+            'get_stock_price_cached', ticker.history, period="1d",
+            span_attributes={'symbol': symbol, 'ticker': ticker_symbol, 'attempt': 1}
+        )
         
         if data.empty:
             logger.warning(f"No data returned for {ticker_symbol}, trying fallback")
@@ -41,7 +92,10 @@ def get_stock_price_cached(symbol, timestamp=None):
             if ticker_symbol.endswith('.NS'):
                 bse_symbol = symbol + '.BO'
                 ticker = yf.Ticker(bse_symbol)
-                data = ticker.history(period="1d")
+                data = _provider_call(
+                    'get_stock_price_cached', ticker.history, period="1d",
+                    span_attributes={'symbol': symbol, 'ticker': bse_symbol, 'attempt': 2}
+                )
                 
         if data.empty:
             logger.error(f"No data available for {symbol}")
@@ -86,14 +140,20 @@ def get_daily_change(symbol):
         ticker = yf.Ticker(ticker_symbol)
         
         # Get the latest data
-        data = ticker.history(period="2d")
+        data = _provider_call(
+            'get_daily_change', ticker.history, period="2d",
+            span_attributes={'symbol': symbol, 'ticker': ticker_symbol, 'attempt': 1}
+        )
         
         if len(data) < 2:
             # Try BSE if NSE fails
             if ticker_symbol.endswith('.NS'):
                 bse_symbol = symbol + '.BO'
                 ticker = yf.Ticker(bse_symbol)
-                data = ticker.history(period="2d")
+                data = _provider_call(
+                    'get_daily_change', ticker.history, period="2d",
+                    span_attributes={'symbol': symbol, 'ticker': bse_symbol, 'attempt': 2}
+                )
         
         if len(data) < 2:
             logger.warning(f"Insufficient data to calculate daily change for {symbol}")
@@ -125,14 +185,20 @@ def get_stock_history(symbol, period='1mo'):
         
         # Get historical data
         ticker = yf.Ticker(ticker_symbol)
-        data = ticker.history(period=valid_periods[period])
+        data = _provider_call(
+            'get_stock_history', ticker.history, period=valid_periods[period],
+            span_attributes={'symbol': symbol, 'ticker': ticker_symbol, 'attempt': 1}
+        )
         
         if data.empty:
             # Try BSE if NSE fails
             if ticker_symbol.endswith('.NS'):
                 bse_symbol = symbol + '.BO'
                 ticker = yf.Ticker(bse_symbol)
-                data = ticker.history(period=valid_periods[period])
+                data = _provider_call(
+                    'get_stock_history', ticker.history, period=valid_periods[period],
+                    span_attributes={'symbol': symbol, 'ticker': bse_symbol, 'attempt': 2}
+                )
         
         if data.empty:
             logger.error(f"No historical data available for {symbol}")
@@ -155,6 +221,338 @@ def get_stock_history(symbol, period='1mo'):
         logger.error(f"Error fetching historical data for {symbol}: {str(e)}")
         return []
 
+# Shared quote cache, refreshed in batch by get_quotes()/refresh_quotes()
+QUOTE_CACHE_TTL = 120  # seconds before a cached quote is considered stale
+# Seconds a stored quote may be old and still be served while it is refreshed;
+# older ones are fetched before they are used
+QUOTE_WARM_MAX_AGE = int(os.environ.get("QUOTE_WARM_MAX_AGE", "3600"))
+_quote_cache = {}
+_quote_cache_lock = threading.Lock()
+_quote_listeners = []
+# Every quote update is stamped with a 'version': the time it reached this
+# cache, kept strictly increasing. Wall-clock versions let cursors issued by
+# one worker be used with any other.
+_quote_version = 0.0
+_quote_inflight = {}  # symbol -> Event set once the fetch in progress for it finishes
+QUOTE_FETCH_WAIT = 30  # seconds to wait for another request's fetch of the same symbols
+_quote_store = None  # optional durable second-level cache, see set_quote_store()
+
+def register_quote_listener(listener):
+    """Register a callable that receives {symbol: quote} for quotes changed by a refresh"""
+    if listener not in _quote_listeners:
+        _quote_listeners.append(listener)
+
+def set_quote_store(store):
+    """Put a durable store behind the in-memory quote cache.
+
+    store.load(symbols) returns stored quotes as {symbol: quote}, and
+    store.save(quotes) writes fetched quotes through. Stale symbols are
+    looked up in the store before the provider, so a quote fetched recently
+    by another worker or node is reused.
+    """
+    global _quote_store
+    _quote_store = store
+
+def _next_quote_version():
+    """Version for a quote update: the current time, after every earlier version (lock must be held)"""
+    global _quote_version
+    _quote_version = max(time.time(), math.nextafter(_quote_version, math.inf))
+    return _quote_version
+
+def warm_quotes(quotes):
+    """Seed the cache with last-known quotes, e.g. from the durable store when a worker starts.
+
+    Warmed quotes are served as they are, even once stale, while a background
+    refresh fetches fresh ones, so the first requests don't wait for the
+    provider. Symbols already cached, and quotes older than QUOTE_WARM_MAX_AGE,
+    are left alone. Returns the number added. Warmed quotes are versioned by
+    when they were fetched, as every worker warming from the store sees the
+    same time.
+    """
+    global _quote_version
+    added = 0
+    now = time.time()
+    with _quote_cache_lock:
+        for symbol, quote in quotes.items():
+            if symbol in _quote_cache or now - quote['as_of'] >= QUOTE_WARM_MAX_AGE:
+                continue
+            _quote_cache[symbol] = dict(quote, version=quote['as_of'], updated_at=quote['as_of'], warmed=True)
+            _quote_version = max(_quote_version, quote['as_of'])
+            added += 1
+    return added
+
+def _ticker_symbol(symbol):
+    """Map a plain symbol to its NSE ticker, leaving explicit .NS/.BO tickers alone"""
+    if symbol.endswith('.NS') or symbol.endswith('.BO'):
+        return symbol
+    return f"{symbol}.NS"
+
+def _quote_from_history(symbol, data, source='yfinance'):
+    """Build a quote dict from a price history frame with at least one Close value"""
+    if data is None or data.empty or 'Close' not in data.columns:
+        return None
+
+    closes = data['Close'].dropna()
+    if len(closes) == 0:
+        return None
+
+    price = float(closes.iloc[-1])
+    previous_close = float(closes.iloc[-2]) if len(closes) >= 2 else None
+    change = price - previous_close if previous_close is not None else 0.0
+    change_percent = (change / previous_close) * 100 if previous_close else 0.0
+
+    return {
+        'symbol': symbol,
+        'price': price,
+        'previous_close': previous_close,
+        'change': float(change),
+        'change_percent': float(change_percent),
+        'as_of': time.time(),
+        'source': source
+    }
+
+def _download_quotes(symbols):
+    """Fetch quotes for many symbols with one yfinance download, falling back to BSE per symbol"""
+    quotes = {}
+    if not symbols:
+        return quotes
+
+    tickers = {_ticker_symbol(symbol): symbol for symbol in symbols}
+    try:
+        logger.info(f"Fetching batch quotes for {len(tickers)} symbols")
+        data = _provider_call(
+            'refresh_quotes',
+            yf.download,
+            tickers=list(tickers.keys()),
+            period="2d",
+            group_by='ticker',
+            progress=False,
+            threads=True,
+            span_attributes={'symbols': len(tickers), 'attempt': 1}
+        )
+        for ticker_symbol, symbol in tickers.items():
+            if isinstance(data.columns, pd.MultiIndex):
+                if ticker_symbol not in data.columns.get_level_values(0):
+                    continue
+                frame = data[ticker_symbol]
+            else:
+                frame = data
+            quote = _quote_from_history(symbol, frame)
+            if quote is not None:
+                quotes[symbol] = quote
+    except Exception as e:
+        logger.error(f"Error fetching batch quotes: {str(e)}")
+
+    # If NSE returned nothing for a symbol, try BSE individually
+    for ticker_symbol, symbol in tickers.items():
+        if symbol in quotes or not ticker_symbol.endswith('.NS'):
+            continue
+        try:
+            logger.warning(f"No batch data returned for {ticker_symbol}, trying fallback")
+            data = _provider_call(
+                'refresh_quotes', yf.Ticker(symbol + '.BO').history, period="2d",
+                span_attributes={'symbol': symbol, 'ticker': symbol + '.BO', 'attempt': 2}
+            )
+            quote = _quote_from_history(symbol, data, source='yfinance-bse')
+            if quote is not None:
+                quotes[symbol] = quote
+        except Exception as e:
+            logger.error(f"Error fetching fallback quote for {symbol}: {str(e)}")
+
+    return quotes
+
+def _is_stale(symbol, now):
+    """Whether a symbol's cached quote is missing or older than the TTL (lock must be held)"""
+    return symbol not in _quote_cache or now - _quote_cache[symbol]['as_of'] >= QUOTE_CACHE_TTL
+
+def _load_stored_quotes(symbols, now):
+    """Get quotes for symbols from the durable store that are still within the TTL"""
+    try:
+        stored = _quote_store.load(symbols)
+    except Exception as e:
+        logger.error(f"Error loading stored quotes: {str(e)}")
+        return {}
+    return {s: quote for s, quote in stored.items() if now - quote['as_of'] < QUOTE_CACHE_TTL}
+
+def refresh_quotes(symbols, force=False, serve_warmed=True):
+    """Refresh stale quotes for the given symbols in one batch.
+
+    Listeners registered with register_quote_listener() are called once with
+    the quotes whose price or change moved. Returns that same dict. Symbols
+    another request is already fetching are waited for rather than fetched
+    again, and are not included in the result. Stale warmed quotes are
+    left in place and refreshed in the background unless serve_warmed is false
+    or they are older than QUOTE_WARM_MAX_AGE.
+    """
+    now = time.time()
+    lookup = start_span('cache.lookup', cache='quote', symbols=len(set(symbols)))
+    with _quote_cache_lock:
+        stale = [s for s in set(symbols) if force or _is_stale(s, now)]
+        warmed = [s for s in stale if serve_warmed and not force and _quote_cache.get(s, {}).get('warmed')
+                  and now - _quote_cache[s]['as_of'] < QUOTE_WARM_MAX_AGE]
+        stale = [s for s in stale if s not in warmed]
+        revalidate = [s for s in warmed if s not in _quote_inflight]
+    # Warmed quotes count as hits: they are served while refreshed in the background
+    record_cache_lookup('quote', hits=len(set(symbols)) - len(stale), misses=len(stale))
+    lookup.set_attribute('misses', len(stale))
+    lookup.end()
+
+    if revalidate:
+        threading.Thread(
+            target=refresh_quotes, args=(revalidate,), kwargs={'serve_warmed': False}, daemon=True
+        ).start()
+
+    changed = {}
+    if stale and not force and _quote_store is not None:
+        with start_span('cache.lookup', cache='quote_store', symbols=len(stale)) as lookup:
+            stored = _load_stored_quotes(stale, now)
+            lookup.set_attribute('misses', len(stale) - len(stored))
+        record_cache_lookup('quote_store', hits=len(stored), misses=len(stale) - len(stored))
+        changed = _store_quotes(stored)
+        stale = [s for s in stale if s not in stored]
+
+    with _quote_cache_lock:
+        stale = [s for s in stale if force or _is_stale(s, now)]
+        # Symbols another request is already fetching are waited for, not fetched twice
+        pending = {s: _quote_inflight[s] for s in stale if s in _quote_inflight}
+        stale = [s for s in stale if s not in pending]
+        done = threading.Event()
+        for s in stale:
+            _quote_inflight[s] = done
+
+    fetched = {}
+    try:
+        if stale:
+            fetched = _download_quotes(stale)
+            changed.update(_store_quotes(fetched))
+    finally:
+        with _quote_cache_lock:
+            for s in stale:
+                _quote_inflight.pop(s, None)
+        done.set()
+
+    # The store and listeners run after waiting requests are released, since
+    # they may need resources (like database connections) those requests are holding
+    if fetched and _quote_store is not None:
+        try:
+            _quote_store.save(fetched)
+        except Exception as e:
+            logger.error(f"Error saving quotes to store: {str(e)}")
+
+    if changed:
+        for listener in list(_quote_listeners):
+            try:
+                listener(dict(changed))
+            except Exception as e:
+                logger.error(f"Error in quote listener {getattr(listener, '__name__', listener)}: {str(e)}")
+
+    if pending:
+        with start_span('quote.wait', symbols=len(pending)):
+            for event in set(pending.values()):
+                event.wait(QUOTE_FETCH_WAIT)
+
+    return changed
+
+def _store_quotes(fetched):
+    """Store fetched quotes in the cache and return the ones whose price or change moved"""
+    changed = {}
+    with _quote_cache_lock:
+        for symbol, quote in fetched.items():
+            previous = _quote_cache.get(symbol)
+            if (previous is None or previous['price'] != quote['price']
+                    or previous['change_percent'] != quote['change_percent']):
+                quote['version'] = _next_quote_version()
+                quote['updated_at'] = quote['as_of']
+                changed[symbol] = quote
+            else:
+                # Unchanged quotes keep their version and change time but are marked fresh
+                quote['version'] = previous['version']
+                quote['updated_at'] = previous['updated_at']
+            _quote_cache[symbol] = quote
+
+    return changed
+
+def get_quotes(symbols, serve_warmed=True):
+    """Get price and daily change for many symbols, refreshing stale entries in one batch
+
+    With serve_warmed false, stale quotes warmed from the store are fetched
+    first, and any the provider could not refresh are left out, so only
+    current prices are returned (e.g. for reports).
+    """
+    symbols = [s for s in symbols if s]
+    refresh_quotes(symbols, serve_warmed=serve_warmed)
+    now = time.time()
+    with _quote_cache_lock:
+        return {
+            s: dict(_quote_cache[s]) for s in symbols
+            if s in _quote_cache and (serve_warmed or not _is_stale_warmed(s, now))
+        }
+
+def _is_stale_warmed(symbol, now):
+    """Whether a cached quote is one warmed from the store and not yet refreshed past the TTL (lock must be held)"""
+    return _quote_cache[symbol].get('warmed', False) and _is_stale(symbol, now)
+
+def has_stale_warmed_quotes(symbols):
+    """Whether any of the symbols is still priced from a stale quote warmed from the store"""
+    now = time.time()
+    with _quote_cache_lock:
+        return any(s in _quote_cache and _is_stale_warmed(s, now) for s in symbols)
+
+def get_quote_version():
+    """Return the version of the most recent quote update"""
+    with _quote_cache_lock:
+        return _quote_version
+
+def make_quote_cursor(version=None):
+    """Encode a quote version (default: the current one) as an opaque client cursor"""
+    if version is None:
+        version = get_quote_version()
+    # repr round-trips the float exactly, so no update at the boundary is lost
+    return repr(float(version))
+
+def parse_quote_cursor(cursor):
+    """Decode a client cursor into a quote version.
+    
+    Cursors from any worker are accepted. Returns 0 (meaning "send
+    everything") for missing or malformed cursors and ones from the future,
+    e.g. issued by a node whose clock is ahead.
+    """
+    try:
+        version = float(cursor or '')
+    except ValueError:
+        return 0
+    if not math.isfinite(version) or version < 0 or version > time.time():
+        return 0
+    return version
+
+def get_quotes_since(version, symbols=None):
+    """Return cached quotes updated after the given version, optionally limited to symbols"""
+    with _quote_cache_lock:
+        candidates = _quote_cache.keys() if symbols is None else [s for s in symbols if s in _quote_cache]
+        return {
+            s: dict(_quote_cache[s]) for s in candidates
+            if _quote_cache[s]['version'] > version
+        }
+
+def get_cached_quote(symbol):
+    """Return the last cached quote for a symbol without fetching, or None"""
+    with _quote_cache_lock:
+        quote = _quote_cache.get(symbol)
+        return dict(quote) if quote else None
+
+# Optional local instrument list (e.g. NSE's EQUITY_L.csv) with a SYMBOL column
+INSTRUMENTS_FILE = os.environ.get("INSTRUMENTS_FILE")
+
+def _load_instrument_file(path):
+    """Read the symbols from an instrument list CSV"""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        columns = {name.strip().lower(): name for name in reader.fieldnames or []}
+        column = columns.get('symbol') or columns.get('tradingsymbol')
+        if column is None:
+            raise ValueError(f"No SYMBOL column in {path}")
+        return [row[column].strip().upper() for row in reader if row[column] and row[column].strip()]
+
 @lru_cache(maxsize=1)
 def get_all_stock_symbols_cached(timestamp=None):
     """Get a list of all stock symbols with caching"""
@@ -163,6 +561,11 @@ def get_all_stock_symbols_cached(timestamp=None):
         timestamp = int(datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
     
     try:
+        if INSTRUMENTS_FILE:
+            symbols = _load_instrument_file(INSTRUMENTS_FILE)
+            logger.info(f"Loaded {len(symbols)} symbols from {INSTRUMENTS_FILE}")
+            return symbols
+        
         # Common Indian stocks (fallback list)
         common_symbols = [
             "RELIANCE", "TCS", "HDFCBANK", "INFY", "HINDUNILVR", "ICICIBANK", "HDFC", 
@@ -179,10 +582,18 @@ def get_all_stock_symbols_cached(timestamp=None):
         # Return a small default list as fallback
         return ["RELIANCE", "TCS", "HDFCBANK", "INFY", "HINDUNILVR"]
 
+def get_symbol_list_timestamp():
+    """Timestamp identifying the current symbol list (refreshed daily at midnight)"""
+    return int(datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+
+def get_instrument_symbols():
+    """Get the set of known symbols, for validating symbols without a price fetch"""
+    return frozenset(get_all_stock_symbols_cached(get_symbol_list_timestamp()))
+
 def get_stock_symbols(query):
     """Search for stock symbols matching the query"""
     # Get cached list of symbols (cached for 24 hours)
-    timestamp = int(datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+    timestamp = get_symbol_list_timestamp()
     all_symbols = get_all_stock_symbols_cached(timestamp)
     
     # Filter symbols based on the query
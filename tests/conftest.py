@@ -0,0 +1,28 @@
+"""
+Shared test setup: a migrated SQLite database and the simulated market-data provider.
+
+The app is a process-wide singleton, so it is configured once per test session.
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ.setdefault("SIM_PROVIDER_LATENCY", "0")
+
+import pytest  # noqa: E402
+
+from benchmarks import simulated_provider  # noqa: E402
+
+simulated_provider.install()
+
+from app import create_app, upgrade_database  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    app = create_app({"WTF_CSRF_ENABLED": False, "QUOTE_STREAM_ENABLED": True})
+    with app.app_context():
+        upgrade_database()
+    return app
@@ -0,0 +1,113 @@
+"""Price alerts fire at their thresholds, once, and stay indexed only while active"""
+import pytest
+
+import alerts
+from alerts import AlertIndex, alert_index, evaluate_alerts, reload_alert_index
+from app import db
+from models import PriceAlert, User, WatchlistItem
+
+
+def _indexed(symbol, alert_type):
+    return list(alert_index._alert_ids.get((symbol, alert_type), []))
+
+
+@pytest.fixture(scope="module")
+def client(app):
+    client = app.test_client()
+    client.post("/register", data=dict(username="alertuser", email="alertuser@example.com", password="alertpass", confirm_password="alertpass"))
+    client.post("/login", data=dict(username="alertuser", password="alertpass"))
+    return client
+
+
+@pytest.fixture
+def make_alert(app, client):
+    """Create an active alert on a watchlist item of the logged-in user, indexed; returns its ID"""
+    def make(symbol, alert_type, threshold):
+        with app.app_context():
+            user = User.query.filter_by(username="alertuser").one()
+            item = WatchlistItem(user_id=user.id, symbol=symbol, exchange="NSE")
+            db.session.add(item)
+            db.session.flush()
+            alert = PriceAlert(user_id=user.id, watchlist_item_id=item.id, symbol=symbol,
+                               alert_type=alert_type, threshold=threshold)
+            db.session.add(alert)
+            db.session.commit()
+            reload_alert_index()
+            return alert.id
+    return make
+
+
+@pytest.fixture(params=[True, False], ids=["returning", "reselect"])
+def update_returning(app, request, monkeypatch):
+    """Run with and without UPDATE ... RETURNING support in the dialect"""
+    with app.app_context():
+        monkeypatch.setattr(db.engine.dialect, "update_returning", request.param)
+
+
+@pytest.mark.parametrize("alert_type, threshold, price, change_percent, fires", [
+    ("above", 100.0, 99.99, 0.0, False),
+    ("above", 100.0, 100.0, 0.0, True),
+    ("below", 100.0, 100.01, 0.0, False),
+    ("below", 100.0, 100.0, 0.0, True),
+    ("percent_move", 5.0, 100.0, 4.99, False),
+    ("percent_move", 5.0, 100.0, 5.0, True),
+    ("percent_move", 5.0, 100.0, -5.0, True),
+    ("percent_move", 5.0, 100.0, None, False),
+])
+def test_threshold_boundaries(alert_type, threshold, price, change_percent, fires):
+    index = AlertIndex()
+    index.load([(1, "BND", alert_type, threshold)])
+    triggered = index.pop_triggered("BND", price, change_percent)
+    assert triggered == ([(1, alert_type, threshold)] if fires else [])
+    # A fired alert leaves the index; one that didn't stays for the next quote
+    assert index.pop_triggered("BND", price, change_percent) == []
+    assert bool(index.pop_triggered("BND", 1e9 if alert_type == "above" else 0.0, 1e9)) != fires
+
+
+def test_fired_alert_is_recorded(app, make_alert, update_returning):
+    alert_id = make_alert("ALRTFIRE", "above", 50.0)
+    assert evaluate_alerts({"ALRTFIRE": {"price": 60.0, "change_percent": 1.5}}) == [alert_id]
+
+    with app.app_context():
+        alert = db.session.get(PriceAlert, alert_id)
+        assert not alert.is_active
+        assert alert.triggered_price == 60.0
+        assert alert.triggered_change_percent == 1.5
+    assert alert_id not in _indexed("ALRTFIRE", "above")
+
+
+def test_alert_fired_elsewhere_is_not_reported(app, make_alert, update_returning):
+    alert_id = make_alert("ALRTTWICE", "below", 50.0)
+    # Another worker records the trigger while this one still has the alert indexed
+    with app.app_context():
+        db.session.get(PriceAlert, alert_id).is_active = False
+        db.session.commit()
+
+    assert evaluate_alerts({"ALRTTWICE": {"price": 40.0, "change_percent": -2.0}}) == []
+    with app.app_context():
+        assert db.session.get(PriceAlert, alert_id).triggered_at is None
+
+
+def test_alert_is_put_back_when_recording_fails(app, make_alert, monkeypatch):
+    alert_id = make_alert("ALRTFAIL", "above", 50.0)
+
+    def fail(*args):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(alerts, "_mark_triggered", fail)
+    assert evaluate_alerts({"ALRTFAIL": {"price": 60.0, "change_percent": 0.0}}) == []
+    assert _indexed("ALRTFAIL", "above") == [alert_id]
+
+    monkeypatch.undo()
+    assert evaluate_alerts({"ALRTFAIL": {"price": 60.0, "change_percent": 0.0}}) == [alert_id]
+
+
+def test_deleted_alert_leaves_the_index(app, client, make_alert):
+    alert_id = make_alert("ALRTDEL", "above", 1e6)
+    assert _indexed("ALRTDEL", "above") == [alert_id]
+
+    response = client.post(f"/watchlist/alert/delete/{alert_id}")
+    assert response.status_code == 302
+    assert _indexed("ALRTDEL", "above") == []
+    with app.app_context():
+        assert db.session.get(PriceAlert, alert_id) is None
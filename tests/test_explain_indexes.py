@@ -0,0 +1,22 @@
+"""The hot queries search the composite indexes (see benchmarks/explain_indexes.py)"""
+import pytest
+
+from benchmarks.explain_indexes import explain, hot_queries, plan_uses_indexes, seed
+
+# Enough rows per user that SQLite's planner prefers the indexes after ANALYZE
+ROWS = 20000
+USERS = 200
+
+
+@pytest.fixture(scope="module")
+def user_id(app):
+    with app.app_context():
+        user_ids = seed(ROWS, USERS)
+    return user_ids[len(user_ids) // 2]
+
+
+def test_hot_queries_use_indexes(app, user_id):
+    with app.app_context():
+        plans = {name: explain(query) for name, query in hot_queries(user_id).items()}
+    failing = {name: plan for name, plan in plans.items() if not plan_uses_indexes(plan)}
+    assert not failing, "\n".join(f"{name}: {'; '.join(plan)}" for name, plan in failing.items())
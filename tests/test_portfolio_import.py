@@ -0,0 +1,88 @@
+"""CSV imports add valid rows as lots and report the rest"""
+import io
+
+import pytest
+
+from app import db
+from models import PortfolioItem, User
+
+
+def _lots(app, user_id):
+    with app.app_context():
+        return sorted(
+            (item.symbol, item.exchange, item.buy_price, item.quantity)
+            for item in PortfolioItem.query.filter_by(user_id=user_id)
+        )
+
+
+@pytest.fixture(scope="module")
+def client(app):
+    client = app.test_client()
+    client.post("/register", data=dict(username="importuser", email="importuser@example.com", password="importpass", confirm_password="importpass"))
+    client.post("/login", data=dict(username="importuser", password="importpass"))
+    return client
+
+
+@pytest.fixture
+def upload(app, client):
+    """Upload CSV text to the import page for a user with no lots; returns (response, user ID)"""
+    with app.app_context():
+        user_id = User.query.filter_by(username="importuser").one().id
+        PortfolioItem.query.filter_by(user_id=user_id).delete()
+        db.session.commit()
+
+    def post(text):
+        data = {"csv_file": (io.BytesIO(text.encode()), "holdings.csv")}
+        return client.post("/portfolio/import", data=data, content_type="multipart/form-data"), user_id
+    return post
+
+
+def test_holdings_rows_are_imported(app, upload):
+    response, user_id = upload(
+        "Instrument,Qty.,Avg. cost\n"
+        "TCS,10,3000.5\n"
+        "INFY.NS,5,1500\n"
+        "WIPRO-EQ,\"1,000\",400\n"
+    )
+    assert response.status_code == 200
+    assert b"Imported 3 lots" in response.data
+    assert _lots(app, user_id) == [
+        ("INFY", "NSE", 1500.0, 5.0),
+        ("TCS", "NSE", 3000.5, 10.0),
+        ("WIPRO", "NSE", 400.0, 1000.0),
+    ]
+
+
+def test_invalid_rows_are_skipped_and_reported(app, upload):
+    response, user_id = upload(
+        "symbol,quantity,buy_price,exchange\n"
+        "TCS,10,3000,NSE\n"
+        "NOSUCHSYMBOL,1,10,NSE\n"
+        "INFY,-5,1500,NSE\n"
+        "ITC,abc,450,NSE\n"
+        "HDFCBANK,2,1600,NYSE\n"
+    )
+    assert response.status_code == 200
+    assert b"Skipped 4 rows" in response.data
+    for message in (b"Unknown symbol", b"Quantity must be greater than zero", b"must be numbers", b"Unknown exchange"):
+        assert message in response.data
+    assert _lots(app, user_id) == [("TCS", "NSE", 3000.0, 10.0)]
+
+
+def test_duplicate_rows_are_separate_lots(app, upload):
+    # Two buys at the same price are two lots, as in a tradebook
+    response, user_id = upload(
+        "symbol,trade_type,quantity,price,trade_date\n"
+        "TCS,buy,10,3000,2024-01-02\n"
+        "TCS,buy,10,3000,2024-01-02\n"
+        "TCS,sell,5,3100,2024-02-01\n"
+    )
+    assert b"Imported 2 lots" in response.data
+    assert b"Sell trade skipped" in response.data
+    assert _lots(app, user_id) == [("TCS", "NSE", 3000.0, 10.0), ("TCS", "NSE", 3000.0, 10.0)]
+
+
+def test_file_without_required_columns_imports_nothing(app, upload):
+    response, user_id = upload("symbol,notes\nTCS,long term\n")
+    assert b"Missing required column(s): quantity, buy_price" in response.data
+    assert _lots(app, user_id) == []
@@ -0,0 +1,123 @@
+"""The sync API makes a user's lots match a snapshot, for API-token and session callers"""
+import pytest
+
+from app import db
+from models import PortfolioItem, User
+
+SYNC_URL = "/api/portfolio/sync"
+
+
+def _lots(app, user_id):
+    with app.app_context():
+        return sorted(
+            (item.symbol, item.exchange, item.buy_price, item.quantity)
+            for item in PortfolioItem.query.filter_by(user_id=user_id)
+        )
+
+
+@pytest.fixture(scope="module")
+def user(app):
+    """The sync test user's ID and API token, issued with the CLI command"""
+    client = app.test_client()
+    client.post("/register", data=dict(username="syncuser", email="syncuser@example.com", password="syncpass", confirm_password="syncpass"))
+    result = app.test_cli_runner().invoke(args=["create-api-token", "syncuser"])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        user_id = User.query.filter_by(username="syncuser").one().id
+    return user_id, result.output.strip()
+
+
+@pytest.fixture
+def sync(app, user):
+    """POST a snapshot with the user's API token from a client without a session"""
+    user_id, token = user
+    with app.app_context():
+        PortfolioItem.query.filter_by(user_id=user_id).delete()
+        db.session.commit()
+    client = app.test_client()
+
+    def post(lots, **payload):
+        return client.post(SYNC_URL, json=dict(payload, lots=lots), headers={"Authorization": f"Bearer {token}"})
+    return post
+
+
+def test_sync_inserts_updates_and_deletes(app, user, sync):
+    user_id, _ = user
+    response = sync([
+        {"symbol": "TCS", "quantity": 10, "buy_price": 3000},
+        {"symbol": "INFY.NS", "quantity": 5, "buy_price": 1500},
+        {"symbol": "WIPRO", "quantity": 8, "buy_price": 400, "exchange": "BSE"},
+    ])
+    assert response.status_code == 200
+    assert response.get_json() == {"inserted": 3, "updated": 0, "deleted": 0, "unchanged": 0, "dry_run": False}
+
+    response = sync([
+        {"symbol": "TCS", "quantity": 12, "buy_price": 3000},
+        {"symbol": "INFY", "quantity": 5, "buy_price": 1500},
+        {"symbol": "ITC", "quantity": 100, "buy_price": 450},
+    ])
+    assert response.get_json() == {"inserted": 1, "updated": 1, "deleted": 1, "unchanged": 1, "dry_run": False}
+    assert _lots(app, user_id) == [
+        ("INFY", "NSE", 1500.0, 5.0),
+        ("ITC", "NSE", 450.0, 100.0),
+        ("TCS", "NSE", 3000.0, 12.0),
+    ]
+
+
+def test_dry_run_changes_nothing(app, user, sync):
+    user_id, _ = user
+    sync([{"symbol": "TCS", "quantity": 10, "buy_price": 3000}])
+
+    response = sync([{"symbol": "INFY", "quantity": 5, "buy_price": 1500}], dry_run=True)
+    assert response.get_json() == {"inserted": 1, "updated": 0, "deleted": 1, "unchanged": 0, "dry_run": True}
+    assert _lots(app, user_id) == [("TCS", "NSE", 3000.0, 10.0)]
+
+
+def test_invalid_lot_rejects_the_whole_snapshot(app, user, sync):
+    user_id, _ = user
+    sync([{"symbol": "TCS", "quantity": 10, "buy_price": 3000}])
+
+    response = sync([
+        {"symbol": "INFY", "quantity": 5, "buy_price": 1500},
+        {"symbol": "NOSUCHSYMBOL", "quantity": 5, "buy_price": 10},
+        {"symbol": "ITC", "quantity": 0, "buy_price": 450},
+    ])
+    assert response.status_code == 400
+    assert [lot["index"] for lot in response.get_json()["lots"]] == [1, 2]
+    assert _lots(app, user_id) == [("TCS", "NSE", 3000.0, 10.0)]
+
+
+@pytest.mark.parametrize("authorization", [None, "Bearer not-a-token", "Basic c3luY3VzZXI6c3luY3Bhc3M="])
+def test_unauthenticated_request_is_refused(app, user, sync, authorization):
+    user_id, _ = user
+    headers = {"Authorization": authorization} if authorization else {}
+    response = app.test_client().post(
+        SYNC_URL, json={"lots": [{"symbol": "TCS", "quantity": 1, "buy_price": 1}]}, headers=headers
+    )
+    assert response.status_code == 401
+    assert response.headers["WWW-Authenticate"] == "Bearer"
+    assert _lots(app, user_id) == []
+
+
+def test_token_requests_skip_csrf_but_session_requests_do_not(app, user, sync, monkeypatch):
+    user_id, _ = user
+    monkeypatch.setitem(app.config, "WTF_CSRF_ENABLED", True)
+
+    response = sync([{"symbol": "TCS", "quantity": 10, "buy_price": 3000}])
+    assert response.status_code == 200
+    assert _lots(app, user_id) == [("TCS", "NSE", 3000.0, 10.0)]
+
+    browser = app.test_client()
+    # The login form needs the CSRF check off; the session is what's under test
+    monkeypatch.setitem(app.config, "WTF_CSRF_ENABLED", False)
+    browser.post("/login", data=dict(username="syncuser", password="syncpass"))
+    monkeypatch.setitem(app.config, "WTF_CSRF_ENABLED", True)
+
+    response = browser.post(SYNC_URL, json={"lots": []})
+    assert response.status_code == 400
+    assert _lots(app, user_id) == [("TCS", "NSE", 3000.0, 10.0)]
+
+    monkeypatch.setitem(app.config, "WTF_CSRF_ENABLED", False)
+    response = browser.post(SYNC_URL, json={"lots": []})
+    assert response.get_json()["deleted"] == 1
+    assert _lots(app, user_id) == []
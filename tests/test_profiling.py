@@ -0,0 +1,45 @@
+"""A request's profile leaves out greenlets that ran while it was switched out"""
+import pstats
+import time
+
+import greenlet
+import pytest
+
+import profiling
+
+
+def _other_request():
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+
+
+def _profiled_request(other):
+    other.switch()
+    return sum(range(1000))
+
+
+@pytest.fixture
+def traced():
+    profiling._trace_greenlet_switches()
+    yield
+    profiling._active = None
+
+
+def test_switched_out_time_is_not_profiled(traced):
+    def run():
+        # Created here so it switches back to this greenlet when done
+        other = greenlet.greenlet(_other_request)
+        active = profiling._active = profiling._ActiveProfile()
+        active.profile.enable()
+        _profiled_request(other)
+        active.profile.disable()
+        return active
+
+    active = greenlet.greenlet(run).switch()
+
+    functions = {name for _, _, name in pstats.Stats(active.profile).stats}
+    assert '_profiled_request' in functions
+    assert '_other_request' not in functions
+    assert active.switched_out >= 0.05
+    assert active.seconds() < 0.05
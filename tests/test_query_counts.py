@@ -0,0 +1,34 @@
+"""Each route stays within its SQL statement budget (see benchmarks/query_counts.py)"""
+import pytest
+
+from benchmarks.query_counts import BUDGETS, SYMBOLS, WRITE_BUDGETS, count_queries, count_write, seed
+from stock_utils import refresh_quotes
+
+
+def _describe(statements):
+    return "\n".join(" ".join(statement.split()) for statement in statements)
+
+
+@pytest.fixture(scope="module")
+def seeded(app):
+    # Warm quotes so provider calls don't add alert checks to the counts
+    refresh_quotes(SYMBOLS)
+    client = app.test_client()
+    user_id = seed(client)
+    return client, user_id
+
+
+@pytest.mark.parametrize("path, budget", BUDGETS.items())
+def test_route_within_statement_budget(seeded, path, budget):
+    client, _ = seeded
+    counts, statements = count_queries(client, path)
+    assert max(counts) <= budget, f"{path} executed {counts} statements, budget {budget}:\n{_describe(statements)}"
+
+
+# Runs after the read-only routes, in WRITE_BUDGETS order (the deletes remove what the adds created)
+@pytest.mark.parametrize("label", WRITE_BUDGETS)
+def test_write_within_statement_budget(seeded, label):
+    client, user_id = seeded
+    budget = WRITE_BUDGETS[label][3]
+    count, statements = count_write(client, user_id, label)
+    assert count <= budget, f"{label} executed {count} statements, budget {budget}:\n{_describe(statements)}"
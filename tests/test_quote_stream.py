@@ -0,0 +1,27 @@
+"""Quote streams are woken only by changes to their own symbols"""
+from quote_stream import QuoteStreamHub
+
+
+def test_only_subscribers_of_a_changed_symbol_are_woken():
+    hub = QuoteStreamHub()
+    tcs = hub.subscribe(["TCS"])
+    infy = hub.subscribe(["INFY", "WIPRO"])
+    try:
+        hub.notify({"WIPRO": {"price": 400.0}})
+        assert hub.wait_for_change(infy, 0)
+        assert not hub.wait_for_change(tcs, 0)
+        # Each change wakes a stream once
+        assert not hub.wait_for_change(infy, 0)
+    finally:
+        hub.unsubscribe(tcs)
+        hub.unsubscribe(infy)
+
+
+def test_change_before_waiting_is_not_missed():
+    hub = QuoteStreamHub()
+    subscription_id = hub.subscribe(["TCS"])
+    try:
+        hub.notify({"TCS": {"price": 3000.0}})
+        assert hub.wait_for_change(subscription_id, 0)
+    finally:
+        hub.unsubscribe(subscription_id)
@@ -0,0 +1,28 @@
+"""Small portfolios' reports are returned by the request itself, even if their cached file goes away"""
+import pytest
+
+import report_jobs
+
+
+@pytest.fixture(scope="module")
+def client(app):
+    client = app.test_client()
+    client.post("/register", data=dict(username="reportuser", email="reportuser@example.com", password="reportpass", confirm_password="reportpass"))
+    client.post("/login", data=dict(username="reportuser", password="reportpass"))
+    client.post("/portfolio/add", data=dict(symbol="TCS", quantity="10", buy_price="3000", exchange="NSE"))
+    return client
+
+
+def test_inline_report_is_downloaded(client):
+    response = client.post("/reports/generate", data=dict(report_type="excel"))
+    assert response.status_code == 200
+    assert response.headers["Content-Disposition"].startswith("attachment")
+    assert response.data[:2] == b"PK"
+
+
+def test_evicted_cached_report_is_rendered_again(client, tmp_path, monkeypatch):
+    # The cache hands out a path whose file is evicted before it is read
+    monkeypatch.setattr(report_jobs, "get_cached_report_file", lambda *args: str(tmp_path / "evicted.xlsx"))
+    response = client.post("/reports/generate", data=dict(report_type="excel"))
+    assert response.status_code == 200
+    assert response.data[:2] == b"PK"
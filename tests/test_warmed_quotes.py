@@ -0,0 +1,44 @@
+"""Quotes warmed from the store are only served while recent, and never priced into reports once stale"""
+import time
+
+import stock_utils
+from stock_utils import QUOTE_CACHE_TTL, QUOTE_WARM_MAX_AGE, get_quotes, has_stale_warmed_quotes, warm_quotes
+
+
+def _stored_quote(symbol, age):
+    return {
+        'symbol': symbol,
+        'price': 1.0,
+        'previous_close': 1.0,
+        'change': 0.0,
+        'change_percent': 0.0,
+        'as_of': time.time() - age,
+        'source': 'NSE'
+    }
+
+
+def test_quotes_older_than_the_cap_are_not_warmed():
+    assert warm_quotes({'WARMOLD': _stored_quote('WARMOLD', QUOTE_WARM_MAX_AGE + 1)}) == 0
+    assert 'WARMOLD' not in stock_utils._quote_cache
+
+
+def test_recent_stale_quote_is_served_warmed():
+    assert warm_quotes({'WARMSERVE': _stored_quote('WARMSERVE', QUOTE_CACHE_TTL + 1)}) == 1
+    assert has_stale_warmed_quotes(['WARMSERVE'])
+    assert get_quotes(['WARMSERVE'])['WARMSERVE']['price'] == 1.0
+
+
+def test_fresh_only_quotes_refresh_warmed_ones_first():
+    warm_quotes({'WARMFRESH': _stored_quote('WARMFRESH', QUOTE_CACHE_TTL + 1)})
+    quote = get_quotes(['WARMFRESH'], serve_warmed=False)['WARMFRESH']
+    assert not quote.get('warmed')
+    assert quote['price'] != 1.0
+    assert not has_stale_warmed_quotes(['WARMFRESH'])
+
+
+def test_warmed_quote_past_the_cap_is_fetched_before_use():
+    warm_quotes({'WARMAGED': _stored_quote('WARMAGED', QUOTE_CACHE_TTL + 1)})
+    # Age it past the cap while cached, as a long-lived worker would
+    with stock_utils._quote_cache_lock:
+        stock_utils._quote_cache['WARMAGED']['as_of'] -= QUOTE_WARM_MAX_AGE
+    assert not get_quotes(['WARMAGED'])['WARMAGED'].get('warmed')
@@ -0,0 +1,378 @@
+"""
+Lightweight request tracing.
+
+Tracing is off unless TRACE_FILE is set. Each sampled request
+(TRACE_SAMPLE_RATE, default all of them) becomes a trace: a root span for
+the request with a child span for every market-data provider call
+(carrying symbol, ticker, attempt and outcome), cache lookup and database
+statement. The response carries the trace's ID in X-Trace-Id.
+
+When the request finishes its trace is appended to TRACE_FILE as one line
+of OTLP/JSON (an ExportTraceServiceRequest), the format the OpenTelemetry
+Collector's otlpjsonfile receiver reads, so the file can be forwarded to
+any OTLP backend. Locally,
+
+    flask --app main trace-critical-path --min-ms 500
+
+prints the critical path of the slowest requests: the chain of spans that
+decided when each one finished.
+
+Spans follow the request through a context variable, so they nest the
+same way under gevent greenlets and threads. Work handed to another thread
+(the report pool, background quote revalidation) is not part of the
+request's trace.
+"""
+import contextvars
+import heapq
+import json
+import logging
+import os
+import random
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import click
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TRACE_FILE = os.environ.get("TRACE_FILE", "")
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "1"))
+TRACE_SERVICE_NAME = os.environ.get("TRACE_SERVICE_NAME", "investment-dashboard")
+
+# Longer SQL statements are truncated in span attributes
+STATEMENT_MAX_LENGTH = 500
+
+# OTLP span kinds
+SPAN_KINDS = {'internal': 1, 'server': 2, 'client': 3}
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """A timed operation in a request's trace"""
+
+    def __init__(self, trace_id, spans, name, parent_id=None, kind='internal', attributes=None):
+        self.trace_id = trace_id
+        self.spans = spans
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+        self._token = None
+        spans.append(self)
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def end(self, error=None):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.error = error
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        self.end(None if exc is None else f"{exc_type.__name__}: {exc}")
+        return False
+
+
+class _NoopSpan:
+    """Returned outside a traced request, so instrumented code needn't check"""
+
+    def set_attribute(self, key, value):
+        pass
+
+    def end(self, error=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def start_span(name, kind='internal', **attributes):
+    """
+    Start a child of the current span; use it as a context manager to make it current while it runs.
+
+    Args:
+        name: Span name
+        kind: 'internal', or 'client' for calls to other services
+        **attributes: Span attributes
+
+    Returns:
+        Span: The span, or a no-op stand-in outside a traced request
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return _NOOP_SPAN
+    return Span(parent.trace_id, parent.spans, name, parent.span_id, kind, attributes)
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_attributes(attributes):
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def _otlp_span(span, end_ns):
+    otlp = {
+        'traceId': span.trace_id,
+        'spanId': span.span_id,
+        'name': span.name,
+        'kind': SPAN_KINDS[span.kind],
+        'startTimeUnixNano': str(span.start_ns),
+        # A span left open (e.g. a statement whose error wasn't reported) ends with the request
+        'endTimeUnixNano': str(span.end_ns or end_ns),
+        'attributes': _otlp_attributes(span.attributes),
+        'status': {'code': 2, 'message': span.error} if span.error else {},
+    }
+    if span.parent_id:
+        otlp['parentSpanId'] = span.parent_id
+    return otlp
+
+
+def export_trace(root):
+    """Append a finished request's trace to TRACE_FILE as one OTLP/JSON line"""
+    line = json.dumps({'resourceSpans': [{
+        'resource': {'attributes': _otlp_attributes({'service.name': TRACE_SERVICE_NAME, 'process.pid': os.getpid()})},
+        'scopeSpans': [{'scope': {'name': __name__}, 'spans': [_otlp_span(span, root.end_ns) for span in root.spans]}],
+    }]}, separators=(',', ':')) + '\n'
+    # One O_APPEND write per trace, so lines from several workers don't interleave
+    fd = os.open(TRACE_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line.encode())
+    finally:
+        os.close(fd)
+
+
+def _start_trace():
+    if random.random() >= TRACE_SAMPLE_RATE:
+        return
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    span = Span(os.urandom(16).hex(), [], f"{request.method} {route}", kind='server', attributes={
+        'http.method': request.method,
+        'http.route': route,
+        'http.target': request.path,
+        'endpoint': request.endpoint or 'unmatched',
+    })
+    g.trace_span = span
+    g.trace_token = _current_span.set(span)
+
+
+def _end_trace(error=None, response=None):
+    span = g.pop('trace_span', None)
+    if span is None:
+        return None
+    _current_span.reset(g.pop('trace_token'))
+    if response is not None:
+        span.set_attribute('http.status_code', response.status_code)
+        if response.status_code >= 500:
+            error = error or f"HTTP {response.status_code}"
+    # Set by Flask-Login once the request has loaded the user
+    user = g.get('_login_user')
+    if user is not None and user.is_authenticated:
+        span.set_attribute('user.id', user.id)
+    span.end(error)
+    try:
+        export_trace(span)
+    except Exception as e:
+        logger.error(f"Error exporting trace {span.trace_id}: {str(e)}")
+    return span
+
+
+def _finish_trace(response):
+    span = _end_trace(response=response)
+    if span is not None:
+        response.headers['X-Trace-Id'] = span.trace_id
+    return response
+
+
+def _abandon_trace(exc):
+    # Normally ended in _finish_trace; this only runs if that was skipped
+    _end_trace(error=None if exc is None else f"{type(exc).__name__}: {exc}")
+
+
+def _start_query_span(conn, cursor, statement, parameters, context, executemany):
+    span = start_span('db.query', kind='client', **{
+        'db.statement': statement[:STATEMENT_MAX_LENGTH],
+        'db.executemany': executemany or None,
+    })
+    if context is not None:
+        context._trace_span = span
+
+
+def _end_query_span(conn, cursor, statement, parameters, context, executemany):
+    getattr(context, '_trace_span', _NOOP_SPAN).end()
+
+
+def _fail_query_span(exception_context):
+    span = getattr(exception_context.execution_context, '_trace_span', _NOOP_SPAN)
+    span.end(str(exception_context.original_exception))
+
+
+def _read_traces(path):
+    """Yield each trace in an OTLP/JSON lines file as a list of spans"""
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            export = json.loads(line)
+            yield [
+                span
+                for resource_spans in export.get('resourceSpans', [])
+                for scope_spans in resource_spans.get('scopeSpans', [])
+                for span in scope_spans.get('spans', [])
+            ]
+
+
+def _span_times(span):
+    return int(span['startTimeUnixNano']), int(span['endTimeUnixNano'])
+
+
+def critical_path(spans):
+    """
+    Find the critical path of a trace: the spans its request was waiting on at each moment.
+
+    Walks back from the end of each span, taking the child that finished
+    last, then the one that finished last before that child started, and
+    so on; time not covered by a child is the span's own.
+
+    Args:
+        spans: The trace's spans, as exported
+
+    Returns:
+        list: (depth, span, nanoseconds on the path, own nanoseconds), in start order
+    """
+    children = defaultdict(list)
+    for span in spans:
+        children[span.get('parentSpanId')].append(span)
+    roots = children[None]
+    if not roots:
+        return []
+
+    path = []
+
+    def walk(span, depth, until):
+        start, end = _span_times(span)
+        end = min(end, until)
+        cursor = end
+        covered = 0
+        for child in sorted(children[span['spanId']], key=lambda c: _span_times(c)[1], reverse=True):
+            child_start, child_end = _span_times(child)
+            if child_start >= cursor:
+                continue
+            child_start = max(child_start, start)
+            walk(child, depth + 1, min(child_end, cursor))
+            covered += min(child_end, cursor) - child_start
+            cursor = child_start
+            if cursor <= start:
+                break
+        path.append((depth, span, end - start, end - start - covered))
+
+    root = roots[0]
+    walk(root, 0, _span_times(root)[1])
+    return sorted(path, key=lambda entry: (_span_times(entry[1])[0], entry[0]))
+
+
+def _describe(span):
+    attributes = {a['key']: next(iter(a['value'].values())) for a in span.get('attributes', [])}
+    statement = attributes.pop('db.statement', None)
+    parts = [span['name']]
+    parts += [f"{key}={value}" for key, value in attributes.items() if key not in ('http.method', 'http.route')]
+    if statement:
+        parts.append(' '.join(statement.split())[:80])
+    error = span.get('status', {}).get('message')
+    if error:
+        parts.append(f"ERROR {error}")
+    return ' '.join(parts)
+
+
+@click.command('trace-critical-path')
+@click.option('--file', 'path', default=lambda: TRACE_FILE or None, help='Trace file (default: TRACE_FILE).')
+@click.option('--min-ms', type=float, default=500, help='Only show requests at least this slow.')
+@click.option('--limit', type=int, default=10, help='Show at most this many requests, slowest first.')
+@click.option('--min-span-ms', type=float, default=1, help='Fold shorter spans on the path into one line.')
+def trace_critical_path_command(path, min_ms, limit, min_span_ms):
+    """Print the critical path of the slowest traced requests."""
+    if not path:
+        raise click.UsageError("Set TRACE_FILE or pass --file")
+
+    slowest = []
+    for index, spans in enumerate(_read_traces(path)):
+        root = next((span for span in spans if not span.get('parentSpanId')), None)
+        if root is None:
+            continue
+        start, end = _span_times(root)
+        if (end - start) / 1e6 >= min_ms:
+            # The index breaks ties, so the spans themselves are never compared
+            entry = (end - start, index, spans)
+            if len(slowest) < limit:
+                heapq.heappush(slowest, entry)
+            else:
+                heapq.heappushpop(slowest, entry)
+
+    if not slowest:
+        click.echo(f"No requests of {min_ms:.0f} ms or more in {path}")
+        return
+
+    for duration, _, spans in sorted(slowest, reverse=True):
+        root = next(span for span in spans if not span.get('parentSpanId'))
+        started = datetime.utcfromtimestamp(_span_times(root)[0] / 1e9).isoformat(timespec='seconds')
+        click.echo(f"\n{started}Z  {duration / 1e6:.1f} ms  {len(spans)} spans  trace {root['traceId']}")
+        click.echo(f"{'path ms':>9} {'own ms':>8}  span")
+        folded, folded_ns = 0, 0
+        for depth, span, on_path, own in critical_path(spans):
+            if depth and on_path / 1e6 < min_span_ms:
+                folded += 1
+                folded_ns += own
+                continue
+            click.echo(f"{on_path / 1e6:>9.1f} {own / 1e6:>8.1f}  {'  ' * depth}{_describe(span)}")
+        if folded:
+            click.echo(f"{'':>9} {folded_ns / 1e6:>8.1f}  ({folded} span{'s' if folded > 1 else ''} under {min_span_ms:g} ms)")
+
+
+def init_app(app):
+    """
+    Trace requests to TRACE_FILE, and register the trace-critical-path command.
+
+    Registers no request hooks or database listeners when TRACE_FILE is unset.
+
+    Args:
+        app: The Flask application
+    """
+    app.cli.add_command(trace_critical_path_command)
+    if not TRACE_FILE:
+        return
+    app.before_request(_start_trace)
+    app.after_request(_finish_trace)
+    app.teardown_request(_abandon_trace)
+    event.listen(Engine, "before_cursor_execute", _start_query_span)
+    event.listen(Engine, "after_cursor_execute", _end_query_span)
+    event.listen(Engine, "handle_error", _fail_query_span)
+    logger.info(f"Tracing {TRACE_SAMPLE_RATE:.0%} of requests to {TRACE_FILE}")
@@ -0,0 +1,118 @@
+"""
+Request-scoped loader for a user's portfolio, watchlist and history rows.
+
+The dashboard helpers each used to query their own slice of the same tables:
+today's snapshot, yesterday's snapshot and then the whole history, or the
+watchlist items and then their alerts. UserData loads each of these at most
+once per request, in as few statements as possible, and get_user_data()
+keeps it on flask.g so every helper called during the request shares it.
+"""
+from bisect import insort
+from collections import namedtuple
+
+from flask import g
+from sqlalchemy import and_
+
+from app import db
+from models import PortfolioItem, WatchlistItem, PortfolioHistory, PriceAlert
+
+# A daily snapshot as plain values, so rows stay readable after the session commits and expires ORM objects
+HistoryPoint = namedtuple('HistoryPoint', ['date', 'total_value', 'daily_change', 'daily_change_percent'])
+
+
+class UserData:
+    """Lazily loaded, memoized rows for one user"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._loaded = {}
+
+    def _memoize(self, name, load):
+        if name not in self._loaded:
+            self._loaded[name] = load()
+        return self._loaded[name]
+
+    def portfolio_items(self):
+        """The user's portfolio lots"""
+        return self._memoize('portfolio_items', lambda: PortfolioItem.query.filter_by(user_id=self.user_id).all())
+
+    def history(self):
+        """The user's daily portfolio snapshots as HistoryPoints, oldest first"""
+        return self._memoize('history', lambda: [HistoryPoint(*row) for row in db.session.query(
+            PortfolioHistory.date, PortfolioHistory.total_value,
+            PortfolioHistory.daily_change, PortfolioHistory.daily_change_percent
+        ).filter_by(user_id=self.user_id).order_by(PortfolioHistory.date)])
+
+    def history_on(self, day):
+        """The snapshot for a date, or None"""
+        for snapshot in reversed(self.history()):
+            if snapshot.date == day:
+                return snapshot
+            if snapshot.date < day:
+                return None
+        return None
+
+    def add_history(self, point):
+        """Record a HistoryPoint saved during this request, keeping history() in date order"""
+        if 'history' in self._loaded:
+            insort(self._loaded['history'], point, key=lambda h: h.date)
+
+    def invalidate(self, *names):
+        """Drop memoized rows (e.g. 'history') so the next call reloads them"""
+        for name in names:
+            self._loaded.pop(name, None)
+
+    def watchlist(self):
+        """
+        The user's watchlist items with their active alerts, in one query.
+
+        Returns:
+            list: (WatchlistItem, list of active PriceAlerts ordered by threshold) pairs
+        """
+        def load():
+            # WatchlistItem.alerts is a dynamic relationship, so join the active alerts explicitly;
+            # matching on user_id too lets the join use the price_alert user index
+            rows = db.session.query(WatchlistItem, PriceAlert).outerjoin(PriceAlert, and_(
+                PriceAlert.watchlist_item_id == WatchlistItem.id,
+                PriceAlert.user_id == WatchlistItem.user_id,
+                PriceAlert.is_active.is_(True)
+            )).filter(WatchlistItem.user_id == self.user_id)\
+                .order_by(WatchlistItem.id, PriceAlert.threshold).all()
+
+            items = {}
+            for item, alert in rows:
+                alerts = items.setdefault(item, [])
+                if alert is not None:
+                    alerts.append(alert)
+            return list(items.items())
+
+        return self._memoize('watchlist', load)
+
+    def symbols(self):
+        """The sorted, distinct symbols in the user's portfolio and watchlist"""
+        def load():
+            if 'portfolio_items' in self._loaded and 'watchlist' in self._loaded:
+                symbols = {item.symbol for item in self.portfolio_items()}
+                return sorted(symbols | {item.symbol for item, _ in self.watchlist()})
+            query = db.session.query(PortfolioItem.symbol).filter_by(user_id=self.user_id).union(
+                db.session.query(WatchlistItem.symbol).filter_by(user_id=self.user_id)
+            )
+            return sorted(row.symbol for row in query)
+
+        return self._memoize('symbols', load)
+
+
+def get_user_data(user_id):
+    """
+    Get the memoized loader for a user in the current request.
+
+    Args:
+        user_id: ID of the user
+
+    Returns:
+        UserData: Loader shared by every caller in this request
+    """
+    loaders = g.setdefault('user_data', {})
+    if user_id not in loaders:
+        loaders[user_id] = UserData(user_id)
+    return loaders[user_id]